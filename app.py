@@ -1,9 +1,160 @@
-from flask import Flask, request, jsonify
+import os
+import json
+import queue
+import threading
+import time as std_time
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from main_workflow import app as agent_app
+from job_queue import JobQueue, QueueFullError
+from telemetry import trace_run, render_prometheus
+from coalesce import analysis_coalescer, request_key, COMPUTED, JOINED
 app = Flask(__name__)
 CORS(app)
 
+# 流式接口在没有新事件时发送心跳注释的间隔（秒），防止前端与反向代理因空闲断开
+SSE_HEARTBEAT_SECONDS = 15
+# 单次请求允许设置的辩论轮数上限
+MAX_DEBATE_ROUNDS_LIMIT = 10
+
+_agent_app = None
+_agent_app_lock = threading.Lock()
+
+
+def get_agent_app():
+    """
+    编译好的多智能体工作流。首次使用时才导入 main_workflow（langgraph、langchain、pandas 等合计 1 秒以上），
+    API 进程可以先启动、先响应 /metrics 等轻量接口；gunicorn 预加载模式下由 warm_up() 在 fork 前提前完成
+    """
+    global _agent_app
+    if _agent_app is None:
+        with _agent_app_lock:
+            if _agent_app is None:
+                from main_workflow import app as compiled
+                _agent_app = compiled
+    return _agent_app
+
+
+def warm_up():
+    """
+    预热：编译工作流、导入大模型与搜索客户端、加载股票简称表。
+    gunicorn 在 master 进程里调用一次（见 gunicorn.conf.py），之后 fork 出的工作进程直接共享这些内存
+    """
+    import baostock  # noqa: F401  bs_session 首次登录时才导入，这里提前放进 master 的内存
+    import llm_client
+    from sentiment_agent import ddgs_class
+    from news_store import news_store
+
+    timings = {}
+    for step, func in [
+        ("工作流", get_agent_app),
+        ("大模型客户端", llm_client.warm_up),
+        ("搜索客户端", ddgs_class),
+        ("股票简称表", news_store.warm_up),
+    ]:
+        start = std_time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            print(f"[预热] ⚠️ {step}预热失败（首次请求时再加载）: {e}")
+        timings[step] = round(std_time.perf_counter() - start, 3)
+    print("[预热] 完成：" + "，".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    return timings
+
+
+def reset_after_fork():
+    """fork 出的工作进程丢弃从 master 继承来的 baostock socket、HTTP 连接池与 SQLite 连接，首次使用时各自重建"""
+    import llm_client
+    from bs_session import bs_session
+    from http_pool import http_pool
+    from news_store import news_store
+
+    bs_session.reset_after_fork()
+    http_pool.reset_after_fork()
+    llm_client.reset_after_fork()
+    news_store.reset_after_fork()
+
+
+def build_result_payload(result, trace=None):
+    """
+    把工作流最终状态整理成前端需要的数据结构（解决隐患二：缺失字段赋予默认值）；
+    trace 为本次分析的链路追踪，附带各环节耗时与 Token
+    """
+    payload = {
+        "decision": result.get('final_decision', '未生成最终决议'),
+        "debate_history": result.get('debate_history', '未获取到辩论记录'),
+        "chart_data": result.get('chart_data', []),
+        "reports": {
+            "technical": result.get('tech_signal', '技术面分析失败'),
+            "fundamental": result.get('fund_signal', '基本面分析失败'),
+            "sentiment": result.get('sentiment_signal', '情绪面分析失败'),
+            "risk": result.get('risk_signal', '风控分析失败')
+        },
+        # 提取我们在 sentiment_agent 中新增的新闻链接列表
+        "news_links": result.get('news_links', []),
+        "debate_rounds": result.get('debate_round', 0),
+        "debate_stop_reason": result.get('debate_stop_reason', '')
+    }
+    if trace is not None:
+        payload["trace"] = trace.to_dict()
+    return payload
+
+
+def parse_workflow_options(data):
+    """解析请求中可选的工作流参数，返回 (参数字典, 错误信息)"""
+    options = {}
+    if data.get('max_debate_rounds') is not None:
+        try:
+            rounds = int(data['max_debate_rounds'])
+        except (TypeError, ValueError):
+            return None, "max_debate_rounds 必须是整数"
+        if not 1 <= rounds <= MAX_DEBATE_ROUNDS_LIMIT:
+            return None, f"max_debate_rounds 必须在 1 到 {MAX_DEBATE_ROUNDS_LIMIT} 之间"
+        options['max_debate_rounds'] = rounds
+    return options, None
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def coalesce_key(inputs):
+    """请求合并 key：股票代码 + 工作流参数，不含 api_key"""
+    return request_key(inputs['ticker'], {k: v for k, v in inputs.items() if k not in ("ticker", "api_key")})
+
+
+def log_coalesced(ticker, how):
+    if how != COMPUTED:
+        print(f"[请求合并] {ticker} 复用{'正在进行的' if how == JOINED else '刚完成的'}分析结果，跳过重复计算")
+
+
+def run_analysis_job(inputs, is_cancelled):
+    """
+    任务队列的执行函数：逐节点推进工作流，每个节点结束后检查是否被取消；
+    与 /api/analyze 共用请求合并表，同一标的同参数的任务只计算一次
+    """
+    def compute():
+        final_state = {}
+        with trace_run(inputs['ticker']) as trace:
+            for state in get_agent_app().stream(inputs, stream_mode="values"):
+                final_state = state
+                if is_cancelled():
+                    # 后台情绪任务不随工作流停止，需要单独通知它中止
+                    from main_workflow import cancel_sentiment
+                    cancel_sentiment(final_state.get("sentiment_job"))
+                    return None
+        return build_result_payload(final_state, trace)
+
+    payload, how = analysis_coalescer.run(coalesce_key(inputs), compute, is_cancelled)
+    if payload is None:
+        print(f"[任务队列] {inputs['ticker']} 的任务已被取消")
+        return None
+    log_coalesced(inputs['ticker'], how)
+    return dict(payload, result_source=how)
+
+
+# 后台任务队列：/api/jobs 提交的任务由固定数量的工作线程依次消费
+job_queue = JobQueue(run_analysis_job)
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_stock():
     data = request.get_json()
@@ -12,40 +163,29 @@ def analyze_stock():
 
     ticker = data['ticker']
     api_key = data['api_key']
+    options, error = parse_workflow_options(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
 
     print(f"\n[API 接收请求] 开始为 {ticker} 执行多智能体分析...")
 
     try:
-        inputs = {"ticker": ticker, "api_key": api_key}
-        result = agent_app.invoke(inputs)
-        debate_history = result.get('debate_history', '未获取到辩论记录')
-        # 解决隐患二：使用 .get() 安全读取，缺失时赋予默认值
-        final_decision = result.get('final_decision', '未生成最终决议')
-        tech_signal = result.get('tech_signal', '技术面分析失败')
-        fund_signal = result.get('fund_signal', '基本面分析失败')
-        sentiment_signal = result.get('sentiment_signal', '情绪面分析失败')
-        risk_signal = result.get('risk_signal', '风控分析失败')
-        chart_data = result.get('chart_data', [])
+        inputs = {"ticker": ticker, "api_key": api_key, **options}
 
-        # 提取我们在 sentiment_agent 中新增的新闻链接列表
-        news_links = result.get('news_links', [])
+        def compute():
+            with trace_run(ticker) as trace:
+                result = get_agent_app().invoke(inputs)
+            return build_result_payload(result, trace)
+
+        # 同一标的同参数的并发请求合并成一次计算，短时间内的重复请求直接复用结果
+        payload, how = analysis_coalescer.run(coalesce_key(inputs), compute)
+        log_coalesced(ticker, how)
 
         # 将整理好的安全数据以 JSON 格式返回给前端
         return jsonify({
             "status": "success",
             "ticker": ticker,
-            "data": {
-                "decision": final_decision,
-                "debate_history":debate_history,
-                "chart_data":chart_data,
-                "reports": {
-                    "technical": tech_signal,
-                    "fundamental": fund_signal,
-                    "sentiment": sentiment_signal,
-                    "risk": risk_signal
-                },
-                "news_links": news_links
-            }
+            "data": dict(payload, result_source=how)
         })
 
     except Exception as e:
@@ -55,7 +195,116 @@ def analyze_stock():
             "status": "error",
             "message": f"后端分析过程中发生错误：{str(e)}"
         }), 500
+
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_stock_stream():
+    """
+    流式版本的分析接口 (Server-Sent Events)：
+    每个部门的结论、K 线图数据、每一轮辩论和 CIO 决议一产生就推送给前端，最后推送 done 事件携带完整结果。
+    """
+    data = request.get_json()
+    if not data or 'ticker' not in data or 'api_key' not in data:
+        return jsonify({"status": "error", "message": "缺少股票代码或 API Key"}), 400
+
+    options, error = parse_workflow_options(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+
+    ticker = data['ticker']
+    inputs = {"ticker": ticker, "api_key": data['api_key'], **options}
+    print(f"\n[API 接收请求] 开始为 {ticker} 执行多智能体流式分析...")
+
+    events = queue.Queue()
+    run_trace = trace_run(ticker)
+
+    def run_workflow():
+        try:
+            with run_trace:
+                for mode, chunk in get_agent_app().stream(inputs, stream_mode=["custom", "values"]):
+                    events.put((mode, chunk))
+        except Exception as e:
+            print(f"[API 异常] 流式分析 {ticker} 时发生错误: {str(e)}")
+            events.put(("error", str(e)))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run_workflow, daemon=True).start()
+
+    def generate():
+        final_state = {}
+        yield format_sse("start", {"ticker": ticker})
+        while True:
+            try:
+                item = events.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            mode, chunk = item
+            if mode == "custom":
+                yield format_sse(chunk["event"], chunk["data"])
+            elif mode == "values":
+                final_state = chunk
+            elif mode == "error":
+                yield format_sse("error", {"message": f"后端分析过程中发生错误：{chunk}"})
+                return
+        yield format_sse("done", {"ticker": ticker, "data": build_result_payload(final_state, run_trace.trace)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 抓取端点：各环节耗时直方图、错误数、Token 用量与缓存命中"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """异步提交分析任务，立即返回 job_id，之后通过 GET /api/jobs/<job_id> 轮询结果"""
+    data = request.get_json()
+    if not data or 'ticker' not in data or 'api_key' not in data:
+        return jsonify({"status": "error", "message": "缺少股票代码或 API Key"}), 400
+
+    options, error = parse_workflow_options(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+
+    try:
+        job_id = job_queue.submit(data['ticker'], data['api_key'], **options)
+    except QueueFullError as e:
+        return jsonify({"status": "error", "message": str(e)}), 429
+
+    print(f"\n[API 接收请求] {data['ticker']} 的分析任务已入队: {job_id}")
+    return jsonify({"status": "success", "job": job_queue.get(job_id)}), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "任务不存在"}), 404
+    return jsonify({"status": "success", "job": job})
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "任务不存在"}), 404
+    return jsonify({"status": "success", "job": job})
 if __name__ == '__main__':
     # 启动 Flask 服务，开启 debug 模式方便你在开发时查看日志
     print("🚀 正在启动多智能体交易 API 服务...")
+    # 设置 NEWS_INGESTOR=1 时在本进程内后台采集宏观快讯，情绪组直接查本地新闻库
+    # （debug 模式下只在重载器拉起的工作进程里启动，避免监控进程重复采集）
+    if os.environ.get("NEWS_INGESTOR") == "1" and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from news_ingestor import start_background_ingestor
+        start_background_ingestor()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,180 @@
+import os
+import threading
+import datetime
+import time as std_time
+import numpy as np
+import pandas as pd
+import bs_session
+
+# ==========================================
+# 1. 本地 K 线仓库 (按股票代码分文件的列式存储)
+# ==========================================
+# 每只股票一个 .npz 文件，每个字段一列（date + 数值列），另外记录已覆盖的日期区间。
+# 读取时只向 baostock 补拉缺失的日期段：历史区间拉一次落盘，之后每天只追加最新的几根 K 线。
+# 统一使用不复权(adjustflag=3)数据，历史 K 线不会因为除权被改写，可以安全地增量追加；
+# 涨跌幅 pctChg 由交易所按除权后的昨收计算，收益率类指标应优先使用 pctChg。
+
+BAR_FIELDS = ["open", "high", "low", "close", "volume", "pctChg", "turn"]
+BAR_STORE_DIR = os.environ.get(
+    "BAR_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bars")
+)
+# 同一交易日内，距离上次向 baostock 同步不足该秒数时直接使用本地数据（当日 K 线收盘后才会出现）
+SYNC_INTERVAL = 10 * 60
+
+
+def _to_day(value):
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[D]")
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.strftime("%Y-%m-%d")
+    return np.datetime64(value, "D")
+
+
+def _empty_columns():
+    cols = {"date": np.array([], dtype="datetime64[D]")}
+    for f in BAR_FIELDS:
+        cols[f] = np.array([], dtype="f8")
+    return cols
+
+
+def _rows_to_columns(fields, rows):
+    """把 baostock 返回的字符串行转成列数组，空字符串记为 NaN"""
+    if not rows:
+        return _empty_columns()
+    idx = {name: i for i, name in enumerate(fields)}
+    cols = {"date": np.array([r[idx["date"]] for r in rows], dtype="datetime64[D]")}
+    for f in BAR_FIELDS:
+        i = idx[f]
+        cols[f] = np.array([float(r[i]) if r[i] not in ("", None) else np.nan for r in rows], dtype="f8")
+    return cols
+
+
+class BarStore:
+    def __init__(self, root=BAR_STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # 内存中的热数据: code -> {"cols": 列字典, "covered_from": 日期, "synced_to": 日期, "synced_at": 时间戳}
+        self._mem = {}
+
+    def _lock_for(self, code):
+        with self._locks_guard:
+            if code not in self._locks:
+                self._locks[code] = threading.Lock()
+            return self._locks[code]
+
+    def _path(self, code):
+        return os.path.join(self.root, f"{code}.npz")
+
+    def _read(self, code):
+        if code in self._mem:
+            return self._mem[code]
+        entry = {"cols": _empty_columns(), "covered_from": None, "synced_to": None, "synced_at": 0.0}
+        path = self._path(code)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as z:
+                    entry["cols"] = {"date": z["date"].astype("datetime64[D]")}
+                    for f in BAR_FIELDS:
+                        entry["cols"][f] = z[f].astype("f8")
+                    entry["covered_from"] = z["covered_from"][0].astype("datetime64[D]")
+                    entry["synced_to"] = z["synced_to"][0].astype("datetime64[D]")
+            except Exception as e:
+                print(f"   [K线仓库] 读取 {path} 失败，将重新下载: {e}")
+        self._mem[code] = entry
+        return entry
+
+    def _write(self, code, entry):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(code)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            covered_from=np.array([entry["covered_from"]], dtype="datetime64[D]"),
+            synced_to=np.array([entry["synced_to"]], dtype="datetime64[D]"),
+            **entry["cols"]
+        )
+        os.replace(tmp_path, path)
+
+    def _fetch(self, code, start_day, end_day):
+        """返回 (是否查询成功, 列字典)；登录或查询失败时 baostock 没有返回字段，区间不能记为已覆盖"""
+        fields, rows = bs_session.query(
+            "query_history_k_data_plus",
+            code,
+            "date," + ",".join(BAR_FIELDS),
+            start_date=str(start_day),
+            end_date=str(end_day),
+            frequency="d",
+            adjustflag="3"
+        )
+        return bool(fields), _rows_to_columns(fields, rows)
+
+    def sync(self, code, start_date, end_date=None):
+        """保证本地仓库覆盖 [start_date, end_date]，只向 baostock 请求缺失的部分"""
+        start_day = _to_day(start_date)
+        end_day = _to_day(end_date or datetime.datetime.now())
+        with self._lock_for(code):
+            entry = self._read(code)
+            cols = entry["cols"]
+            parts = []
+            changed = False
+
+            # 1. 向前回补：请求的起点早于已覆盖的起点
+            covered_from = entry["covered_from"]
+            if covered_from is None or start_day < covered_from:
+                back_end = end_day if covered_from is None else covered_from - np.timedelta64(1, "D")
+                ok, part = self._fetch(code, start_day, back_end)
+                # 查询失败时保持原样，下次调用重新回补（与 FundStore.sync 对登录 / 查询失败的处理一致）
+                if ok:
+                    parts.append(part)
+                    entry["covered_from"] = start_day
+                    if covered_from is None:
+                        entry["synced_to"] = end_day
+                        entry["synced_at"] = std_time.time()
+                    changed = True
+
+            # 2. 向后追加：只拉最后一根 K 线之后的日期
+            synced_to = entry["synced_to"]
+            today = _to_day(datetime.datetime.now())
+            stale = end_day >= today and std_time.time() - entry["synced_at"] > SYNC_INTERVAL
+            if synced_to is not None and (end_day > synced_to or (end_day == synced_to and stale)):
+                fetch_from = cols["date"][-1] + np.timedelta64(1, "D") if len(cols["date"]) else entry["covered_from"]
+                ok = True
+                if fetch_from <= end_day:
+                    ok, part = self._fetch(code, fetch_from, end_day)
+                    if ok:
+                        parts.append(part)
+                if ok:
+                    entry["synced_to"] = max(synced_to, end_day)
+                    entry["synced_at"] = std_time.time()
+                    changed = True
+
+            if not changed:
+                return entry
+            if parts:
+                merged = {k: np.concatenate([cols[k]] + [p[k] for p in parts]) for k in cols}
+                # 按日期排序并去重，保证回补与追加后的顺序正确
+                _, uniq_idx = np.unique(merged["date"], return_index=True)
+                entry["cols"] = {k: v[uniq_idx] for k, v in merged.items()}
+            self._write(code, entry)
+            return entry
+
+    def load(self, code, start_date, end_date=None):
+        """返回 [start_date, end_date] 区间的日 K 线 DataFrame，date 列为 YYYY-MM-DD 字符串"""
+        start_day = _to_day(start_date)
+        end_day = _to_day(end_date or datetime.datetime.now())
+        entry = self.sync(code, start_day, end_day)
+        cols = entry["cols"]
+        mask = (cols["date"] >= start_day) & (cols["date"] <= end_day)
+        data = {"date": cols["date"][mask].astype(str)}
+        for f in BAR_FIELDS:
+            data[f] = cols[f][mask]
+        return pd.DataFrame(data, columns=["date"] + BAR_FIELDS)
+
+
+# 进程内共享的仓库实例，技术组与风控组都从这里读 K 线
+bar_store = BarStore()
+
+
+def load_bars(code, start_date, end_date=None):
+    return bar_store.load(code, start_date, end_date)
@@ -0,0 +1,232 @@
+import os
+import re
+import csv
+import json
+import argparse
+import datetime
+import concurrent.futures
+import numpy as np
+from bar_store import bar_store, load_bars
+from indicators import build_panel, compute_indicators
+from fund_store import fund_store
+from risk_agent import get_index_bars
+from risk_engine import RISK_LOOKBACK_DAYS
+from sentiment_agent import fetch_macro_news
+from tech_agent import KLINE_DAYS, INDICATOR_WARMUP_DAYS
+from main_workflow import app as agent_app
+from telemetry import submit_in_context
+
+# ==========================================
+# 1. 批量 / 自选股模式
+# ==========================================
+# 一次分析成百上千只股票时，与标的无关的数据（大盘指数、宏观快讯）只拉取一次，
+# K 线和财报先通过同一个 baostock 会话批量预取到本地仓库与缓存，
+# 之后各标的的大模型环节按有限并发执行，最后输出按决议排序的汇总表。
+
+# 批量预热数据的缓存时长（秒）：覆盖整批分析的耗时，保证整批共用同一轮宏观抓取与指数数据
+BATCH_SHARED_TTL = 3 * 3600
+DEFAULT_BATCH_WORKERS = 4
+# 与 tech_agent 的 K 线窗口（含指标预热段）保持一致（风控组的 20 天窗口包含在内）
+KLINE_PREFETCH_DAYS = KLINE_DAYS + INDICATOR_WARMUP_DAYS
+# 汇总表附带的指标快照：(输出字段, 指标名, 小数位)
+SNAPSHOT_FIELDS = (("rsi14", "RSI14", 1), ("macd_hist", "MACD", 3), ("atr14", "ATR14", 2))
+
+# CIO 决议从积极到保守的排序
+ACTION_RANK = {"强力买入": 0, "逢低分批建仓": 1, "观望": 2, "减仓": 3, "清仓": 4}
+RISK_LIGHTS = ("红灯", "黄灯", "绿灯")
+
+
+def load_watchlist(path):
+    """读取自选股文件：每行一个代码，支持逗号分隔，# 开头为注释"""
+    tickers = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            tickers += [t.strip() for t in line.split(",") if t.strip()]
+    # 去重并保持顺序
+    return list(dict.fromkeys(tickers))
+
+
+def prefetch_shared_data(tickers):
+    """预取整批共享的数据：宏观快讯、大盘指数各一次，K 线与财报逐只走同一个 baostock 会话"""
+    print(f"\n[批量模式] 正在预取共享数据：宏观快讯 + 上证指数...")
+    fetch_macro_news(ttl=BATCH_SHARED_TTL)
+    get_index_bars(ttl=BATCH_SHARED_TTL)
+
+    print(f"[批量模式] 正在批量预取 {len(tickers)} 只股票的 K 线与财报...")
+    # 风控组需要多年日线，一并预取（首次下载后只做增量追加）
+    start_date = datetime.datetime.now() - datetime.timedelta(days=max(KLINE_PREFETCH_DAYS, RISK_LOOKBACK_DAYS))
+    for i, ticker in enumerate(tickers, 1):
+        try:
+            bar_store.sync(ticker, start_date)
+            fund_store.sync(ticker)
+        except Exception as e:
+            print(f"   ⚠️ 预取 {ticker} 失败: {e}")
+        if i % 50 == 0 or i == len(tickers):
+            print(f"   [批量预取] {i}/{len(tickers)}")
+
+
+def indicator_snapshot(tickers):
+    """
+    把整批股票的 K 线对齐成一个 (股票数 × 交易日数) 面板，一次向量化计算全部指标，
+    返回 {代码: {"rsi14": .., "macd_hist": .., "atr14": .., "boll_pos": ..}}
+    """
+    start_date = datetime.datetime.now() - datetime.timedelta(days=KLINE_PREFETCH_DAYS)
+    frames = {}
+    for ticker in tickers:
+        try:
+            df = load_bars(ticker, start_date)
+        except Exception as e:
+            print(f"   ⚠️ 读取 {ticker} K 线失败: {e}")
+            continue
+        if not df.empty:
+            frames[ticker] = df
+    if not frames:
+        return {}
+
+    codes, _, panel = build_panel(frames)
+    # 停牌股票的面板末列为 NaN，各指标取该股票最后一个有交易的日期上的值
+    close = panel["close"]
+    rows = np.arange(len(codes))
+    last_valid = close.shape[1] - 1 - np.argmax(~np.isnan(close[:, ::-1]), axis=1)
+    latest = {name: values[rows, last_valid] for name, values in compute_indicators(panel).items()}
+    last_close = close[rows, last_valid]
+    width = latest["BOLL_UP"] - latest["BOLL_LOW"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        boll_pos = np.where(width > 0, (last_close - latest["BOLL_LOW"]) / width, np.nan)
+
+    columns = [(field, latest[name], digits) for field, name, digits in SNAPSHOT_FIELDS] + [("boll_pos", boll_pos, 2)]
+    return {
+        code: {field: (None if np.isnan(values[i]) else round(float(values[i]), digits)) for field, values, digits in columns}
+        for i, code in enumerate(codes)
+    }
+
+
+def parse_decision(text):
+    """从 CIO 决议中解析出操作建议与建议仓位"""
+    action, position = "未知", None
+    m = re.search(r"最终决议[^:：\n]*[:：]\s*\**\s*[（(]?\s*([^\n()（）*]+)", text or "")
+    if m:
+        raw = m.group(1).strip()
+        for name in ACTION_RANK:
+            if name in raw:
+                action = name
+                break
+        else:
+            action = raw[:10]
+    m = re.search(r"建议仓位暴露[^:：\n]*[:：][^\d\n]*(\d+(?:\.\d+)?)\s*%", text or "")
+    if m:
+        position = float(m.group(1))
+    return action, position
+
+
+def parse_risk_light(text):
+    for light in RISK_LIGHTS:
+        if light in (text or ""):
+            return light
+    return "未知"
+
+
+def analyze_one(ticker, api_key):
+    try:
+        result = agent_app.invoke({"ticker": ticker, "api_key": api_key})
+    except Exception as e:
+        print(f"[批量模式] 分析 {ticker} 时发生错误: {str(e)}")
+        return {"ticker": ticker, "action": "失败", "position": None, "risk": "未知", "error": str(e)}
+    action, position = parse_decision(result.get("final_decision", ""))
+    return {
+        "ticker": ticker,
+        "action": action,
+        "position": position,
+        "risk": parse_risk_light(result.get("risk_signal", "")),
+        "decision": result.get("final_decision", ""),
+    }
+
+
+def rank_results(rows):
+    """按决议从积极到保守排序，同一决议内建议仓位高的在前，失败的排在最后"""
+    def key(row):
+        return (ACTION_RANK.get(row["action"], len(ACTION_RANK)), -(row["position"] or 0), row["ticker"])
+    return sorted(rows, key=key)
+
+
+def run_batch(tickers, api_key, max_workers=DEFAULT_BATCH_WORKERS, prefetch=True):
+    """
+    批量分析入口：返回按决议排序后的结果列表，
+    每项包含 ticker / action / position / risk / decision（失败时为 error），
+    以及整批一次计算出的指标快照 rsi14 / macd_hist / atr14 / boll_pos。
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if prefetch:
+        prefetch_shared_data(tickers)
+
+    print(f"\n[批量模式] 开始以 {max_workers} 路并发分析 {len(tickers)} 只股票...")
+    rows = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {submit_in_context(executor, analyze_one, t, api_key): t for t in tickers}
+        for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            row = future.result()
+            rows.append(row)
+            print(f"[批量模式] ({i}/{len(tickers)}) {row['ticker']} -> {row['action']}")
+
+    snapshot = indicator_snapshot(tickers)
+    for row in rows:
+        row.update(snapshot.get(row["ticker"], {}))
+    return rank_results(rows)
+
+
+def format_table(rows):
+    lines = [f"{'排名':<4}{'代码':<12}{'决议':<10}{'仓位':>6}  风控  {'RSI14':>6}{'MACD柱':>9}"]
+    for i, row in enumerate(rows, 1):
+        position = f"{row['position']:g}%" if row["position"] is not None else "-"
+        rsi = f"{row['rsi14']:.1f}" if row.get("rsi14") is not None else "-"
+        hist = f"{row['macd_hist']:.3f}" if row.get("macd_hist") is not None else "-"
+        lines.append(f"{i:<4}{row['ticker']:<12}{row['action']:<10}{position:>6}  {row['risk']}  {rsi:>6}{hist:>9}")
+    return "\n".join(lines)
+
+
+def save_results(rows, path):
+    """按扩展名保存为 CSV 或 JSON"""
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        return
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["rank", "ticker", "action", "position", "risk",
+                                               "rsi14", "macd_hist", "atr14", "boll_pos", "decision", "error"])
+        writer.writeheader()
+        for i, row in enumerate(rows, 1):
+            writer.writerow(dict(row, rank=i))
+
+
+# ==========================================
+# 2. 命令行入口
+# ==========================================
+# 用法示例：
+#   python batch_runner.py --watchlist watchlist.txt --workers 4 --output ranked.csv
+#   python batch_runner.py sh.600519 sz.000858 --api-key sk-xxxx
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量分析自选股并输出排序后的决议表")
+    parser.add_argument("tickers", nargs="*", help="股票代码，如 sh.600519")
+    parser.add_argument("--watchlist", help="自选股文件，每行一个代码")
+    parser.add_argument("--api-key", default=os.environ.get("DEEPSEEK_API_KEY"), help="DeepSeek API Key")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS, help="大模型环节的并发数")
+    parser.add_argument("--output", help="结果保存路径 (.csv 或 .json)")
+    args = parser.parse_args()
+
+    batch_tickers = list(args.tickers)
+    if args.watchlist:
+        batch_tickers += load_watchlist(args.watchlist)
+    if not batch_tickers:
+        parser.error("请提供股票代码或 --watchlist 文件")
+    if not args.api_key:
+        parser.error("请通过 --api-key 或环境变量 DEEPSEEK_API_KEY 提供 API Key")
+
+    ranked = run_batch(batch_tickers, args.api_key, max_workers=args.workers)
+
+    print("\n" + "★" * 60)
+    print(format_table(ranked))
+    print("★" * 60)
+    if args.output:
+        save_results(ranked, args.output)
+        print(f"结果已保存至 {args.output}")
@@ -0,0 +1,212 @@
+import os
+import re
+import sys
+import time as std_time
+import argparse
+import threading
+import hashlib
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("NO_PROXY", "127.0.0.1,localhost")
+
+from news_parsers import parse_html, fetch_parsed, parse_stats
+from http_pool import connection_stats
+
+# ==========================================
+# 1. 快讯解析基准测试
+# ==========================================
+# 用保存在 fixtures/ 下的合成 HTML（结构与东财要闻、新浪滚动、生意社页面一致）对比：
+#   - 旧实现：函数内 re.compile、生意社逐条切片二次 re.search、未编译的 clean_html
+#   - 新实现：预编译正则 + 注册表 + 生意社单遍扫描
+# 并在本地起一个支持 ETag 的 HTTP 服务，测量首次抓取与页面未变化（304 + 解析缓存命中）时的耗时。
+# 用法：python benchmarks/bench_news_parsers.py [--iterations 200] [--regen]
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = {
+    "eastmoney": ("eastmoney_yaowen.html", "utf-8"),
+    "sina_roll": ("sina_roll.html", "gbk"),
+    "100ppi": ("100ppi_qb.html", "utf-8"),
+}
+
+
+def generate_fixtures(count=300):
+    """生成与真实页面结构一致的合成 HTML（固定内容，保证多次运行可比）"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    filler = '<div class="ad"><span>广告位</span><img src="/a.png"/></div>\n'
+
+    rows = []
+    for i in range(count):
+        rows.append(
+            f'<li><div class="text"><p class="title"><a href="https://finance.eastmoney.com/a/20261018{i:06d}.html" '
+            f'target="_blank">央行公开市场操作第{i}期 <em>净投放</em> 资金面保持平稳</a></p>'
+            f'<p class="info">摘要：本周资金面整体宽松，第{i}条要闻……</p>'
+            f'<p class="time">10月18日 {i % 24:02d}:{i % 60:02d}</p></div></li>\n' + (filler if i % 5 == 0 else "")
+        )
+    pages = {"eastmoney": "<html><body><ul>\n" + "".join(rows) + "</ul></body></html>"}
+
+    rows = []
+    for i in range(count):
+        rows.append(
+            f'<li><a href="https://finance.sina.com.cn/money/future/2026-10-18/doc-{i:08d}.shtml" '
+            f'target="_blank">螺纹钢期货第{i}条滚动资讯：库存继续回落</a>'
+            f'<span>({10 if i % 2 else 9:02d}月18日 {i % 24:02d}:{i % 60:02d})</span></li>\n'
+        )
+    pages["sina_roll"] = "<html><body><ul class=\"list_009\">\n" + "".join(rows) + "</ul></body></html>"
+
+    rows = []
+    for i in range(count):
+        detail = f'<a href="/news/detail-{i}.html" target="_blank">点击详情</a>' if i % 3 else ""
+        rows.append(
+            f'<div class="news-item"><span class="time">{i % 24:02d}:{i % 60:02d}</span>'
+            f'<a href="/news/list-{i}.html" class="title"><b>生意社：第{i}号大宗商品价格快讯</b></a>'
+            f'<p>今日 <span>PTA</span> 现货价格小幅上涨，市场成交一般，下游采购谨慎观望，第{i}条。{detail}</p></div>\n'
+            + (filler if i % 4 == 0 else "")
+        )
+    pages["100ppi"] = "<html><body>\n" + "".join(rows) + "</body></html>"
+
+    for name, (filename, encoding) in FIXTURES.items():
+        with open(os.path.join(FIXTURE_DIR, filename), "w", encoding=encoding, newline="\n") as f:
+            f.write(pages[name])
+
+
+def load_fixture(name):
+    filename, encoding = FIXTURES[name]
+    with open(os.path.join(FIXTURE_DIR, filename), "rb") as f:
+        raw = f.read()
+    return raw, raw.decode(encoding)
+
+
+# ==========================================
+# 2. 旧实现（保留原有写法作为对照组）
+# ==========================================
+def legacy_clean_html(text):
+    if not text: return ""
+    return re.sub(r'<[^>]+>', '', text).strip()
+
+
+def legacy_eastmoney(html, now):
+    pattern = re.compile(
+        r'<p class="title"[^>]*>.*?<a\s+[^>]*href="(https?://finance\.eastmoney\.com/a/[^"]+)"[^>]*>(.*?)</a>.*?<p class="time">\s*(\d{1,2}月\d{1,2}日\s+\d{2}:\d{2})\s*</p>',
+        re.S
+    )
+    res = []
+    for match in list(pattern.finditer(html)):
+        title = legacy_clean_html(match.group(2)).strip()
+        ts = int(datetime.strptime(f"{now.year}年{match.group(3)}", "%Y年%m月%d日 %H:%M").timestamp())
+        res.append({"title": title, "intro": title, "url": match.group(1), "time_ts": ts, "source": "东财要闻"})
+    return res[:30]
+
+
+def legacy_sina_roll(html, now, source_name="新浪期货"):
+    pattern = re.compile(
+        r'<a\s+href="([^"]+)"[^>]*target="_blank">([^<]+)</a>.*?\((\d{2}月\d{2}日\s+\d{2}:\d{2})\)', re.S)
+    res = []
+    for url_path, title, time_str in pattern.findall(html)[:30]:
+        ts = int(datetime.strptime(f"{now.year}年{time_str}", "%Y年%m月%d日 %H:%M").timestamp())
+        res.append({"title": title.strip(), "intro": title.strip(), "url": url_path, "time_ts": ts,
+                    "source": source_name})
+    return res
+
+
+def legacy_100ppi(html, now):
+    item_pattern = re.compile(r'(\d{2}:\d{2}).*?<a[^>]+href="([^"]+)"[^>]*>(.*?)</a>', re.S)
+    matches = list(item_pattern.finditer(html))
+    res = []
+    today_str = now.strftime("%Y-%m-%d")
+    for i, match in enumerate(matches):
+        start_pos = match.end()
+        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(html)
+        content_block = html[start_pos:end_pos]
+        detail_match = re.search(r'href="([^"]+)"[^>]*>\s*点击详情', content_block)
+        final_url = detail_match.group(1) if detail_match else match.group(2)
+        if not final_url.startswith("http"):
+            final_url = f"https://www.100ppi.com{final_url}" if final_url.startswith(
+                "/") else f"https://www.100ppi.com/{final_url}"
+        title_text = legacy_clean_html(match.group(3)).strip()
+        summary_text = legacy_clean_html(content_block).replace("点击详情", "").strip()
+        intro = summary_text if len(summary_text) > 5 else title_text
+        ts = int(datetime.strptime(f"{today_str} {match.group(1)}:00", "%Y-%m-%d %H:%M:%S").timestamp())
+        res.append({"title": title_text, "intro": intro, "url": final_url, "time_ts": ts, "source": "生意社"})
+    return res
+
+
+LEGACY = {"eastmoney": legacy_eastmoney, "sina_roll": legacy_sina_roll, "100ppi": legacy_100ppi}
+
+
+def _timeit(func, iterations):
+    start = std_time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (std_time.perf_counter() - start) / iterations * 1000
+
+
+# ==========================================
+# 3. 本地条件请求服务
+# ==========================================
+def start_fixture_server():
+    pages = {f"/{name}": load_fixture(name)[0] for name in FIXTURES}
+    etags = {path: '"%s"' % hashlib.md5(body).hexdigest() for path, body in pages.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etags[self.path]:
+                self.send_response(304)
+                self.send_header("ETag", etags[self.path])
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etags[self.path])
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="快讯解析与条件请求基准测试")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--regen", action="store_true", help="重新生成合成 HTML fixtures")
+    args = parser.parse_args()
+
+    if args.regen or not all(os.path.exists(os.path.join(FIXTURE_DIR, f)) for f, _ in FIXTURES.values()):
+        generate_fixtures()
+
+    now = datetime.now()
+    print(f"{'数据源':<12}{'旧实现(ms)':>12}{'新实现(ms)':>12}{'加速比':>8}  结果一致")
+    for name in FIXTURES:
+        html = load_fixture(name)[1]
+        legacy = LEGACY[name]
+        old_ms = _timeit(lambda: legacy(html, now), args.iterations)
+        new_ms = _timeit(lambda: parse_html(name, html, now), args.iterations)
+        same = legacy(html, now) == parse_html(name, html, now)
+        print(f"{name:<12}{old_ms:>12.3f}{new_ms:>12.3f}{old_ms / new_ms:>7.1f}x  {same}")
+
+    server = start_fixture_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"\n{'数据源':<12}{'首次抓取(ms)':>14}{'未变化(ms)':>12}")
+    for name in FIXTURES:
+        url = f"{base}/{name}"
+        cold = _timeit(lambda: fetch_parsed(name, url), 1)
+        warm = _timeit(lambda: fetch_parsed(name, url), args.iterations)
+        print(f"{name:<12}{cold:>14.3f}{warm:>12.3f}")
+    server.shutdown()
+    print(f"\n解析统计: {parse_stats}")
+    print(f"连接统计: {connection_stats().get(base.split('//', 1)[1], {})}")
+
+
+if __name__ == "__main__":
+    main()
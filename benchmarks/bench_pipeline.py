@@ -0,0 +1,284 @@
+import os
+import io
+import sys
+import json
+import argparse
+import tempfile
+import threading
+import contextlib
+import time as std_time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+# 本地仓库与缓存全部放进临时目录，不碰 data/ 下的真实数据（必须在导入业务模块之前设置）
+_DATA_DIR = tempfile.mkdtemp(prefix="quant-bench-")
+for _name, _value in {
+    "BAR_STORE_DIR": os.path.join(_DATA_DIR, "bars"),
+    "FUND_STORE_PATH": os.path.join(_DATA_DIR, "fundamentals.sqlite3"),
+    "NEWS_STORE_PATH": os.path.join(_DATA_DIR, "news.sqlite3"),
+    "LLM_CACHE_PATH": os.path.join(_DATA_DIR, "llm_cache.sqlite3"),
+    "JOB_DB_PATH": os.path.join(_DATA_DIR, "jobs.sqlite3"),
+    "PORTFOLIO_PATH": os.path.join(_DATA_DIR, "portfolio.json"),
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import numpy as np
+from replay import FixtureSet, LatencyProfile, Replayer, Recorder, synthesize, LATENCY_PROFILES
+
+# ==========================================
+# 1. 投委会全流程基准测试
+# ==========================================
+# 在离线环境里复现整条流水线：baostock、八个快讯站点、DuckDuckGo、DeepSeek 全部走录制 / 合成夹具，
+# 按延迟画像注入耗时，统计 main_workflow.app.invoke 与批量模式的端到端 p50/p95，
+# 并借助 telemetry 的链路追踪拆出每个环节（爬虫、baostock、大模型、工作流节点）的耗时分布。
+# 用法：
+#   python benchmarks/bench_pipeline.py                                   # 合成夹具 + zero 画像（只测本地开销）
+#   python benchmarks/bench_pipeline.py --profile live --scale 0.1        # 按线上延迟的 1/10 注入
+#   python benchmarks/bench_pipeline.py --batch-size 8                    # 追加批量模式
+#   python benchmarks/bench_pipeline.py --record fixtures/pipeline.json.gz --api-key sk-xxx sh.600519
+#   python benchmarks/bench_pipeline.py --fixtures fixtures/pipeline.json.gz sh.600519
+#   python benchmarks/bench_pipeline.py --json baseline.json              # 保存报告，便于前后对比
+# 计时之前先做一次并发检查：几只股票同时跑完整工作流，任何一路抛异常都直接失败退出
+# （共享的后台情绪任务登记表、请求合并表等只有并发时才会暴露问题）。
+
+DEFAULT_TICKERS = ["sh.600519", "sz.000858", "sh.601318", "sz.300750"]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def reset_caches():
+    """清空进程内的 TTL 缓存、条件请求缓存、快讯解析缓存和大模型响应缓存，让每次运行都从冷缓存开始"""
+    from market_cache import market_cache
+    from http_pool import validator_cache
+    from llm_cache import llm_cache
+    import news_parsers
+
+    market_cache.invalidate()
+    with validator_cache._lock:
+        validator_cache._entries.clear()
+    with news_parsers._parsed_lock:
+        news_parsers._parsed.clear()
+    with llm_cache._lock:
+        llm_cache._db().execute("DELETE FROM llm_cache")
+        llm_cache._db().commit()
+
+
+def stage_totals(trace):
+    """把一次运行的 span 按 (类型:名称) 汇总：{阶段: (总耗时 ms, 次数)}"""
+    totals = {}
+    for sp in trace["spans"]:
+        key = f"{sp['kind']}:{sp['name']}"
+        ms, n = totals.get(key, (0.0, 0))
+        totals[key] = (ms + sp["duration_ms"], n + 1)
+    return totals
+
+
+def summarize(label, walls, traces, failures=()):
+    """
+    端到端与分阶段的 p50 / p95（单位 ms）；分阶段按每次运行内的累计耗时统计。
+    failures 为失败的运行 [(运行标识, 错误信息), ...]，失败的运行不计入 walls / traces
+    """
+    stages = {}
+    for trace in traces:
+        for key, (ms, n) in stage_totals(trace).items():
+            stages.setdefault(key, {"ms": [], "calls": []})
+            stages[key]["ms"].append(ms)
+            stages[key]["calls"].append(n)
+    return {
+        "label": label,
+        "runs": len(walls),
+        "failures": [{"run": run, "error": error} for run, error in failures],
+        "end_to_end_ms": {"p50": percentile(walls, 50), "p95": percentile(walls, 95),
+                          "mean": float(np.mean(walls)) if walls else 0.0},
+        "stages": {
+            key: {"p50": percentile(v["ms"], 50), "p95": percentile(v["ms"], 95),
+                  "calls_per_run": float(np.mean(v["calls"]))}
+            for key, v in sorted(stages.items())
+        },
+    }
+
+
+def print_report(report):
+    e2e = report["end_to_end_ms"]
+    failed = f"，失败 {len(report['failures'])} 次（不计入统计）" if report["failures"] else ""
+    print(f"\n== {report['label']}（成功 {report['runs']} 次{failed}）==")
+    for failure in report["failures"]:
+        print(f"   ❌ {failure['run']}: {failure['error']}")
+    print(f"端到端  p50 {e2e['p50']:.1f} ms   p95 {e2e['p95']:.1f} ms   均值 {e2e['mean']:.1f} ms")
+    print(f"{'阶段':<36}{'p50(ms)':>10}{'p95(ms)':>10}{'次/运行':>9}")
+    for key, s in sorted(report["stages"].items(), key=lambda kv: -kv[1]["p50"]):
+        print(f"{key:<36}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['calls_per_run']:>9.1f}")
+
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """屏蔽流水线自身的 print 日志（包括后台线程），只保留基准报告"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def check_concurrent(tickers, api_key, verbose):
+    """同时发起多路 main_workflow.app.invoke，返回失败列表 [(股票代码, 错误信息), ...]"""
+    from main_workflow import app as agent_app
+
+    barrier = threading.Barrier(len(tickers))
+    failures = []
+
+    def run(ticker):
+        barrier.wait()
+        try:
+            result = agent_app.invoke({"ticker": ticker, "api_key": api_key})
+            if not result.get("final_decision"):
+                failures.append((ticker, "没有生成最终决议"))
+        except Exception as e:
+            failures.append((ticker, f"{type(e).__name__}: {e}"))
+
+    reset_caches()
+    with quiet(not verbose):
+        threads = [threading.Thread(target=run, args=(t,)) for t in tickers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return failures
+
+
+def run_single(tickers, api_key, iterations, warmup, keep_cache, verbose):
+    from main_workflow import app as agent_app
+    from telemetry import trace_run
+
+    walls, traces, failures = [], [], []
+    for i in range(warmup + iterations):
+        ticker = tickers[i % len(tickers)]
+        if not keep_cache:
+            reset_caches()
+        error = None
+        with quiet(not verbose), trace_run(ticker) as trace:
+            start = std_time.perf_counter()
+            try:
+                if not agent_app.invoke({"ticker": ticker, "api_key": api_key}).get("final_decision"):
+                    error = "没有生成最终决议"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            wall = (std_time.perf_counter() - start) * 1000
+        if i >= warmup:
+            if error:
+                failures.append((f"第 {i + 1} 次 {ticker}", error))
+            else:
+                walls.append(wall)
+                traces.append(trace.to_dict())
+        status = f"失败：{error}" if error else f"{wall:.1f} ms"
+        print(f"   [单票] 第 {i + 1}/{warmup + iterations} 次 {ticker} {status}{'（预热）' if i < warmup else ''}")
+    return summarize("单票 main_workflow.app.invoke", walls, traces, failures)
+
+
+def run_batches(tickers, api_key, iterations, workers, keep_cache, verbose):
+    from batch_runner import run_batch
+    from telemetry import trace_run
+
+    walls, traces, failures = [], [], []
+    for i in range(iterations):
+        if not keep_cache:
+            reset_caches()
+        with quiet(not verbose), trace_run(f"batch-{len(tickers)}") as trace:
+            start = std_time.perf_counter()
+            rows = run_batch(tickers, api_key, max_workers=workers)
+            wall = (std_time.perf_counter() - start) * 1000
+        # analyze_one 吞掉异常返回“失败”行：有任何一只失败，这一轮就不能当作有效样本（失败的股票会让耗时偏低）
+        failed = [row for row in rows if row.get("error") or row.get("action") == "失败"]
+        if failed:
+            for row in failed:
+                failures.append((f"第 {i + 1} 轮 {row['ticker']}", row.get("error") or "分析失败"))
+            print(f"   [批量] 第 {i + 1}/{iterations} 次 {len(tickers)} 只 {wall:.1f} ms，失败 {len(failed)} 只（不计入统计）")
+            continue
+        walls.append(wall)
+        traces.append(trace.to_dict())
+        print(f"   [批量] 第 {i + 1}/{iterations} 次 {len(tickers)} 只 {wall:.1f} ms")
+    return summarize(f"批量 run_batch（{len(tickers)} 只, {workers} 并发）", walls, traces, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="投委会全流程离线基准测试（录制 / 回放）")
+    parser.add_argument("tickers", nargs="*", help="股票代码，如 sh.600519")
+    parser.add_argument("--fixtures", help="回放使用的夹具文件（.json / .json.gz），不指定时按今天的日期生成合成夹具")
+    parser.add_argument("--record", metavar="PATH", help="录制模式：访问线上服务跑一遍并把结果写入夹具文件")
+    parser.add_argument("--api-key", default="bench", help="录制模式需要真实的 DeepSeek API Key")
+    parser.add_argument("--profile", default="zero",
+                        help=f"延迟画像：{' / '.join(LATENCY_PROFILES)} 或 JSON 文件路径")
+    parser.add_argument("--scale", type=float, default=1.0, help="注入延迟的缩放系数")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="预热次数（不计入统计，用于填充本地 K 线 / 财报仓库）")
+    parser.add_argument("--batch-size", type=int, default=0, help="追加批量模式基准的股票数，0 表示不跑")
+    parser.add_argument("--batch-iterations", type=int, default=3)
+    parser.add_argument("--batch-workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=2,
+                        help="计时前同时分析的股票数（并发检查），小于 2 时跳过")
+    parser.add_argument("--keep-cache", action="store_true", help="各次运行之间保留进程内缓存（测热缓存路径）")
+    parser.add_argument("--verbose", action="store_true", help="显示流水线自身的日志")
+    parser.add_argument("--json", metavar="PATH", help="把报告写入 JSON 文件")
+    args = parser.parse_args()
+    tickers = args.tickers or DEFAULT_TICKERS
+    # 合成夹具时批量模式另外生成一组股票；回放录制夹具时只能用录制过的股票
+    batch_tickers = tickers if args.fixtures else [f"sz.{300001 + i:06d}" for i in range(args.batch_size)]
+
+    if args.record:
+        fixtures = FixtureSet()
+        recorder = Recorder(fixtures).install()
+        try:
+            from main_workflow import app as agent_app
+            for ticker in tickers:
+                print(f"[录制] 正在线上运行 {ticker} ...")
+                agent_app.invoke({"ticker": ticker, "api_key": args.api_key})
+        finally:
+            recorder.restore()
+        fixtures.save(args.record)
+        print(f"[录制] 夹具已写入 {args.record}："
+              f"baostock {len(fixtures.data['baostock'])} 条，HTTP {len(fixtures.data['http'])} 条，"
+              f"搜索 {len(fixtures.data['search'])} 条，大模型 {len(fixtures.data['llm']['exact'])} 条")
+        return
+
+    if args.fixtures:
+        fixtures = FixtureSet.load(args.fixtures)
+    else:
+        fixtures = synthesize(list(dict.fromkeys(tickers + batch_tickers)))
+    profile = LatencyProfile.resolve(args.profile, args.scale)
+    Replayer(fixtures, profile).install()
+    print(f"[基准] 延迟画像 {args.profile} ×{args.scale}，数据目录 {_DATA_DIR}")
+
+    concurrent_tickers = list(dict.fromkeys(tickers))[:args.concurrency]
+    if len(concurrent_tickers) >= 2:
+        failures = check_concurrent(concurrent_tickers, args.api_key, args.verbose)
+        for ticker, error in failures:
+            print(f"   [并发检查] ❌ {ticker}: {error}")
+        if failures:
+            sys.exit(f"[并发检查] {len(failures)}/{len(concurrent_tickers)} 路并发分析失败，终止基准测试")
+        print(f"[并发检查] {len(concurrent_tickers)} 路同时分析全部成功")
+
+    reports = [run_single(tickers, args.api_key, args.iterations, args.warmup, args.keep_cache, args.verbose)]
+    if args.batch_size:
+        reports.append(run_batches(batch_tickers[:args.batch_size], args.api_key, args.batch_iterations,
+                                   args.batch_workers, args.keep_cache, args.verbose))
+    for report in reports:
+        print_report(report)
+
+    if args.json:
+        meta = {"profile": args.profile, "scale": args.scale, "tickers": tickers,
+                "fixtures": args.fixtures or "synthetic", "keep_cache": args.keep_cache}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "reports": reports}, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入 {args.json}")
+
+    failed = sum(len(report["failures"]) for report in reports)
+    if failed:
+        sys.exit(f"\n[基准] 共有 {failed} 次分析失败，结果不能作为基线")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 1. 启动耗时基准测试
+# ==========================================
+# 每个场景在全新的 Python 子进程里运行（模块缓存为空，和自动扩容拉起的容器、命令行批量任务的冷启动一致），
+# 统计 p50 / p95 以及场景结束时已经加载了哪些重量级依赖：
+#   - 各入口模块的导入耗时（app、新闻采集器、批量任务、情绪组）
+#   - API 进程从导入到工作流可用（首个分析请求要额外等待的编译时间）
+#   - 预启动模式：master 预热后 fork，工作进程从 fork 到工作流可用的耗时
+# 同时检查导入情绪组后进程的代理环境变量没有被改写。
+# 用法：python benchmarks/bench_startup.py [--runs 5] [--json startup.json]
+
+HEAVY_MODULES = ["langgraph", "langchain_openai", "openai", "pandas", "baostock", "duckduckgo_search"]
+PROXY_VARS = ["HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY"]
+
+# 子进程里执行的计时模板：setup 不计时，stmt 计时；fork 场景由 stmt 自己写入 elapsed
+_RUNNER = """
+import os, sys, json, time
+sys.path.insert(0, {root!r})
+{setup}
+elapsed = None
+start = time.perf_counter()
+{stmt}
+if elapsed is None:
+    elapsed = time.perf_counter() - start
+print("@@" + json.dumps({{
+    "seconds": elapsed,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+    "proxy_env": {{k: os.environ[k] for k in {proxy!r} if k in os.environ}},
+}}))
+"""
+
+# master 预热完成后 fork，子进程丢弃继承的连接、取到工作流后通过管道回报耗时
+_FORK_STMT = """
+r, w = os.pipe()
+forked = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    app.reset_after_fork()
+    app.get_agent_app()
+    os.write(w, repr(time.perf_counter() - forked).encode())
+    os._exit(0)
+os.close(w)
+os.waitpid(pid, 0)
+elapsed = float(os.read(r, 64).decode())
+"""
+
+SCENARIOS = [
+    ("import app", "", "import app"),
+    ("import news_ingestor", "", "import news_ingestor"),
+    ("import sentiment_agent", "", "import sentiment_agent"),
+    ("import batch_runner", "", "import batch_runner"),
+    ("app 导入 + 编译工作流", "", "import app; app.get_agent_app()"),
+    ("预热后 fork → 工作流可用", "import app, gc, llm_client; app.get_agent_app(); llm_client.warm_up(); gc.freeze()",
+     _FORK_STMT),
+]
+
+
+def run_scenario(setup, stmt, env):
+    code = _RUNNER.format(root=ROOT, setup=setup, stmt=stmt, heavy=HEAVY_MODULES, proxy=PROXY_VARS)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("@@"):
+            return json.loads(line[2:])
+    raise RuntimeError(f"场景运行失败：\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试（冷启动导入 / 工作流编译 / 预启动 fork）")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景运行的子进程数")
+    parser.add_argument("--json", metavar="PATH", help="把报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    # 本地仓库放进临时目录；去掉外部代理变量，便于检查导入过程有没有改写它们
+    data_dir = tempfile.mkdtemp(prefix="quant-startup-")
+    env = {k: v for k, v in os.environ.items() if k not in PROXY_VARS}
+    env.update({
+        "NEWS_STORE_PATH": os.path.join(data_dir, "news.sqlite3"),
+        "LLM_CACHE_PATH": os.path.join(data_dir, "llm_cache.sqlite3"),
+        "JOB_DB_PATH": os.path.join(data_dir, "jobs.sqlite3"),
+        "FUND_STORE_PATH": os.path.join(data_dir, "fundamentals.sqlite3"),
+        "BAR_STORE_DIR": os.path.join(data_dir, "bars"),
+    })
+
+    reports = []
+    print(f"{'场景':<28}{'p50(ms)':>10}{'p95(ms)':>10}   已加载的重量级依赖")
+    for label, setup, stmt in SCENARIOS:
+        results = [run_scenario(setup, stmt, env) for _ in range(args.runs)]
+        ms = [r["seconds"] * 1000 for r in results]
+        report = {
+            "scenario": label,
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "heavy_modules": results[-1]["heavy"],
+            "proxy_env": results[-1]["proxy_env"],
+        }
+        reports.append(report)
+        print(f"{label:<28}{report['p50_ms']:>10.1f}{report['p95_ms']:>10.1f}   {', '.join(report['heavy_modules']) or '-'}")
+        if report["proxy_env"]:
+            print(f"   ⚠️ 导入后出现了代理环境变量: {report['proxy_env']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "python": sys.version.split()[0], "reports": reports},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
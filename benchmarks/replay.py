@@ -0,0 +1,559 @@
+import os
+import re
+import json
+import gzip
+import base64
+import random
+import hashlib
+import datetime
+import threading
+import time as std_time
+from urllib.parse import urlencode, urlsplit
+
+# ==========================================
+# 1. 录制 / 回放夹具 (baostock / HTTP / DuckDuckGo / 大模型)
+# ==========================================
+# 基准测试不能依赖线上的 baostock、八个快讯站点、DuckDuckGo 和 DeepSeek：
+# - 录制模式：照常访问线上服务，同时把 baostock 结果集、抓到的 HTML/JSON、搜索结果和大模型回答存成夹具文件
+# - 回放模式：在最底层替换这四类外部调用，直接返回夹具内容，并按延迟画像注入可复现的耗时
+# 替换点都在最底层（BaostockSession._run_query、requests.Session.get、DDGS、ChatOpenAI），
+# 之上的会话锁、连接池并发限制、缓存、限流和 telemetry span 全部照常运行，测到的是真实的调度开销。
+# 录制的 K 线按“录制日期 → 今天”整体平移日期，季度财报按季度平移，夹具过一段时间仍然可用。
+
+FIXTURE_VERSION = 1
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 延迟画像：层 -> (中位数秒, 对数正态 sigma)；llm_per_token 为每个输出 Token 额外的秒数，hosts 可按站点覆盖 http
+LATENCY_PROFILES = {
+    "zero": {},
+    "lan": {
+        "baostock": (0.02, 0.3), "http": (0.05, 0.3), "search": (0.3, 0.3), "llm": (0.3, 0.3),
+        "llm_per_token": 0.001,
+    },
+    "live": {
+        "baostock": (0.15, 0.5), "http": (0.4, 0.6), "search": (2.0, 0.5), "llm": (2.5, 0.4),
+        "llm_per_token": 0.02,
+        "hosts": {"www.100ppi.com": (1.5, 0.5), "openapi.mysteel.com": (0.8, 0.5)},
+    },
+}
+
+# 大模型夹具缺失时的兜底回答：各部门结论行齐全，风控绿灯、其余中性，保证会进入完整的多轮辩论
+DEFAULT_LLM_RESPONSE = (
+    "【观点】震荡中性\n【情绪观点】震荡中性\n【风控决议】绿灯\n"
+    "【核心逻辑】均线粘合、量能平稳，基本面与资金面暂无明显边际变化，短期以区间震荡看待；"
+    "若放量突破前高可转为偏多，跌破中轨则需减仓防守。\n"
+    "【潜在风险】宏观数据不及预期、行业政策扰动、流动性阶段性收紧。\n"
+    "【新增质疑】1"
+)
+
+
+def _today():
+    return datetime.date.today()
+
+
+def _bs_key(func_name, args, kwargs):
+    """K 线按 (接口, 代码) 归档，季度财报按 (接口, 代码, 年, 季度)，其余按完整参数"""
+    if func_name == "query_history_k_data_plus":
+        return json.dumps([func_name, args[0] if args else kwargs.get("code")])
+    if "year" in kwargs and "quarter" in kwargs:
+        return json.dumps([func_name, kwargs.get("code"), int(kwargs["year"]), int(kwargs["quarter"])])
+    return json.dumps([func_name, list(args), sorted(kwargs.items())], ensure_ascii=False)
+
+
+def _http_key(url, params=None):
+    if params:
+        return url + ("&" if "?" in url else "?") + urlencode(sorted(params.items()))
+    return url
+
+
+def _prompt_keys(prompt):
+    """精确 key 与去掉数字后的模糊 key（日期、价格变化时仍能匹配到同一类提示词）"""
+    exact = hashlib.md5(prompt.encode("utf-8")).hexdigest()
+    coarse = hashlib.md5(re.sub(r"\d+", "", prompt).encode("utf-8")).hexdigest()
+    return exact, coarse
+
+
+def _shift_quarter(year, quarter, delta):
+    index = year * 4 + (quarter - 1) + delta
+    return index // 4, index % 4 + 1
+
+
+class FixtureSet:
+    def __init__(self, data=None):
+        self.data = data or {
+            "version": FIXTURE_VERSION,
+            "recorded_on": _today().isoformat(),
+            "baostock": {},
+            "http": {},
+            "search": {},
+            "llm": {"exact": {}, "coarse": {}},
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"夹具版本不匹配: {data.get('version')} != {FIXTURE_VERSION}")
+        return cls(data)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        opener = gzip.open if path.endswith(".gz") else open
+        with self._lock, opener(path, "wt", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+
+    @property
+    def day_shift(self):
+        """录制日期到今天的天数"""
+        return (_today() - datetime.date.fromisoformat(self.data["recorded_on"])).days
+
+    @property
+    def quarter_shift(self):
+        recorded = datetime.date.fromisoformat(self.data["recorded_on"])
+        today = _today()
+        return (today.year * 4 + (today.month - 1) // 3) - (recorded.year * 4 + (recorded.month - 1) // 3)
+
+    # ---------- 写入 ----------
+    def put_baostock(self, func_name, args, kwargs, error_code, error_msg, fields, rows):
+        key = _bs_key(func_name, args, kwargs)
+        with self._lock:
+            entry = self.data["baostock"].get(key)
+            if entry is not None and func_name == "query_history_k_data_plus" and fields:
+                # 同一只股票的多段 K 线按日期合并
+                merged = {r[0]: r for r in entry["rows"]}
+                merged.update({r[0]: r for r in rows})
+                entry["rows"] = [merged[d] for d in sorted(merged)]
+                return
+            self.data["baostock"][key] = {
+                "func": func_name, "error_code": error_code, "error_msg": error_msg,
+                "fields": list(fields), "rows": [list(r) for r in rows],
+            }
+
+    def put_http(self, url, params, status_code, headers, content, apparent_encoding):
+        keep = {k: v for k, v in headers.items() if k.lower() in ("etag", "last-modified", "content-type")}
+        with self._lock:
+            self.data["http"][_http_key(url, params)] = {
+                "status": status_code, "headers": keep, "apparent_encoding": apparent_encoding,
+                "body": base64.b64encode(content).decode("ascii"),
+            }
+
+    def put_search(self, query, results):
+        with self._lock:
+            self.data["search"][query] = list(results)
+
+    def put_llm(self, prompt, content):
+        exact, coarse = _prompt_keys(prompt)
+        with self._lock:
+            self.data["llm"]["exact"][exact] = content
+            self.data["llm"]["coarse"][coarse] = content
+
+    # ---------- 读取 ----------
+    def get_baostock(self, func_name, args, kwargs):
+        """返回 (error_code, error_msg, fields, rows)；按日期 / 季度把录制数据平移到今天"""
+        if "year" in kwargs and "quarter" in kwargs:
+            year, quarter = _shift_quarter(int(kwargs["year"]), int(kwargs["quarter"]), -self.quarter_shift)
+            kwargs = dict(kwargs, year=year, quarter=quarter)
+        entry = self.data["baostock"].get(_bs_key(func_name, args, kwargs))
+        if entry is None:
+            # 没录到的查询按“无数据”处理；字段列表取同一接口的任意一条录制结果
+            fields = next((e["fields"] for e in self.data["baostock"].values() if e["func"] == func_name), [])
+            return "0", "success", fields, []
+        rows = entry["rows"]
+        if func_name == "query_history_k_data_plus" and rows:
+            shift = datetime.timedelta(days=self.day_shift)
+            start = kwargs.get("start_date") or "1900-01-01"
+            end = kwargs.get("end_date") or "2999-12-31"
+            out = []
+            for r in rows:
+                day = (datetime.date.fromisoformat(r[0]) + shift).isoformat()
+                if start <= day <= end:
+                    out.append([day] + r[1:])
+            rows = out
+        return entry["error_code"], entry["error_msg"], entry["fields"], [list(r) for r in rows]
+
+    def get_http(self, url, params=None):
+        return self.data["http"].get(_http_key(url, params)) or self.data["http"].get(url)
+
+    def get_search(self, query):
+        return self.data["search"].get(query, [])
+
+    def get_llm(self, prompt):
+        exact, coarse = _prompt_keys(prompt)
+        llm = self.data["llm"]
+        return llm["exact"].get(exact) or llm["coarse"].get(coarse)
+
+
+# ==========================================
+# 2. 延迟画像
+# ==========================================
+class LatencyProfile:
+    def __init__(self, spec=None, scale=1.0, seed=20240601):
+        self.spec = dict(spec or {})
+        self.scale = scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def resolve(cls, name_or_path, scale=1.0):
+        if name_or_path in LATENCY_PROFILES:
+            return cls(LATENCY_PROFILES[name_or_path], scale)
+        with open(name_or_path, encoding="utf-8") as f:
+            return cls(json.load(f), scale)
+
+    def sample(self, layer, host=None, tokens=0):
+        dist = (self.spec.get("hosts") or {}).get(host) if host else None
+        dist = dist or self.spec.get(layer)
+        seconds = 0.0
+        if dist:
+            median, sigma = dist
+            with self._lock:
+                seconds = median * self._rng.lognormvariate(0, sigma)
+        if layer == "llm":
+            seconds += tokens * self.spec.get("llm_per_token", 0.0)
+        return seconds * self.scale
+
+    def sleep(self, layer, host=None, tokens=0):
+        seconds = self.sample(layer, host, tokens)
+        if seconds > 0:
+            std_time.sleep(seconds)
+
+
+# ==========================================
+# 3. 回放 / 录制用的替身对象
+# ==========================================
+class _ResultSet:
+    def __init__(self, error_code, error_msg, fields):
+        self.error_code = error_code
+        self.error_msg = error_msg
+        self.fields = fields
+
+
+class ReplayResponse:
+    """requests.Response 的最小替身，覆盖爬虫用到的属性"""
+
+    def __init__(self, url, status_code, content=b"", headers=None, apparent_encoding="utf-8"):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = _CaseInsensitive(headers or {})
+        self.apparent_encoding = apparent_encoding
+        self.encoding = None
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or self.apparent_encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _CaseInsensitive(dict):
+    def __init__(self, data):
+        super().__init__({k.lower(): v for k, v in data.items()})
+
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+
+class ReplayMessage:
+    def __init__(self, content, input_tokens, output_tokens):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens
+        }
+
+
+def _make_replay_ddgs(fixtures, profile):
+    class ReplayDDGS:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def text(self, query, max_results=None, **kwargs):
+            profile.sleep("search")
+            results = fixtures.get_search(query)
+            return results[:max_results] if max_results else list(results)
+
+    return ReplayDDGS
+
+
+def _make_recording_ddgs(fixtures, real_ddgs):
+    class RecordingDDGS:
+        def __init__(self, *args, **kwargs):
+            self._inner = real_ddgs(*args, **kwargs)
+
+        def __enter__(self):
+            self._inner.__enter__()
+            return self
+
+        def __exit__(self, *exc):
+            return self._inner.__exit__(*exc)
+
+        def text(self, query, *args, **kwargs):
+            results = list(self._inner.text(query, *args, **kwargs))
+            fixtures.put_search(query, results)
+            return results
+
+    return RecordingDDGS
+
+
+def _make_replay_llm(fixtures, profile):
+    from llm_client import estimate_tokens
+
+    class ReplayLLM:
+        def __init__(self, **kwargs):
+            self.model_name = kwargs.get("model", "")
+            self.temperature = kwargs.get("temperature")
+
+        def invoke(self, prompt):
+            content = fixtures.get_llm(prompt) or DEFAULT_LLM_RESPONSE
+            output_tokens = estimate_tokens(content)
+            profile.sleep("llm", tokens=output_tokens)
+            return ReplayMessage(content, estimate_tokens(prompt), output_tokens)
+
+    return ReplayLLM
+
+
+def _make_recording_llm(fixtures, real_cls):
+    class RecordingLLM:
+        def __init__(self, **kwargs):
+            self._inner = real_cls(**kwargs)
+            self.model_name = kwargs.get("model", "")
+            self.temperature = kwargs.get("temperature")
+
+        def invoke(self, prompt):
+            response = self._inner.invoke(prompt)
+            fixtures.put_llm(prompt, response.content)
+            return response
+
+    return RecordingLLM
+
+
+# ==========================================
+# 4. 安装 / 卸载替身
+# ==========================================
+class _Patcher:
+    def __init__(self):
+        self._undo = []
+
+    def set(self, obj, name, value):
+        self._undo.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def restore(self):
+        while self._undo:
+            obj, name, value = self._undo.pop()
+            setattr(obj, name, value)
+
+
+class Replayer(_Patcher):
+    """回放模式：所有外部调用都从夹具返回，并按延迟画像注入耗时"""
+
+    def __init__(self, fixtures, profile=None):
+        super().__init__()
+        self.fixtures = fixtures
+        self.profile = profile or LatencyProfile()
+
+    def install(self):
+        import requests
+        import bs_session
+        import llm_client
+        import sentiment_agent
+        fixtures, profile = self.fixtures, self.profile
+
+        def fake_login(session):
+            # 不标记为已登录：进程退出时 close() 不会去调用真实的 bs.logout()
+            session._last_used = std_time.time()
+            return True
+
+        def fake_run_query(session, func_name, args, kwargs):
+            profile.sleep("baostock")
+            error_code, error_msg, fields, rows = fixtures.get_baostock(func_name, args, kwargs)
+            return _ResultSet(error_code, error_msg, fields), rows
+
+        def fake_get(session, url, params=None, headers=None, **kwargs):
+            profile.sleep("http", host=urlsplit(url).netloc)
+            entry = fixtures.get_http(url, params)
+            if entry is None:
+                return ReplayResponse(url, 404)
+            etag = entry["headers"].get("ETag") or entry["headers"].get("etag")
+            if etag and (headers or {}).get("If-None-Match") == etag:
+                return ReplayResponse(url, 304, headers=entry["headers"])
+            return ReplayResponse(url, entry["status"], base64.b64decode(entry["body"]), entry["headers"],
+                                  entry.get("apparent_encoding") or "utf-8")
+
+        self.set(bs_session.BaostockSession, "_login", fake_login)
+        self.set(bs_session.BaostockSession, "_run_query", fake_run_query)
+        self.set(requests.Session, "get", fake_get)
+        self.set(sentiment_agent, "DDGS", _make_replay_ddgs(fixtures, profile))
+        self.set(llm_client, "ChatOpenAI", _make_replay_llm(fixtures, profile))
+        llm_client._registry.clear()
+        return self
+
+
+class Recorder(_Patcher):
+    """录制模式：照常访问线上服务，同时把结果写入夹具"""
+
+    def __init__(self, fixtures):
+        super().__init__()
+        self.fixtures = fixtures
+
+    def install(self):
+        import requests
+        import bs_session
+        import llm_client
+        import sentiment_agent
+        fixtures = self.fixtures
+        real_run_query = bs_session.BaostockSession._run_query
+        real_get = requests.Session.get
+
+        def recording_run_query(session, func_name, args, kwargs):
+            rs, rows = real_run_query(session, func_name, args, kwargs)
+            fields = rs.fields if isinstance(rs.fields, list) else []
+            fixtures.put_baostock(func_name, args, kwargs, rs.error_code, rs.error_msg, fields, rows)
+            return rs, rows
+
+        def recording_get(session, url, params=None, **kwargs):
+            resp = real_get(session, url, params=params, **kwargs)
+            if resp.status_code == 200:
+                fixtures.put_http(url, params, resp.status_code, resp.headers, resp.content, resp.apparent_encoding)
+            return resp
+
+        self.set(bs_session.BaostockSession, "_run_query", recording_run_query)
+        self.set(requests.Session, "get", recording_get)
+        self.set(sentiment_agent, "DDGS", _make_recording_ddgs(fixtures, sentiment_agent.ddgs_class()))
+        self.set(llm_client, "ChatOpenAI", _make_recording_llm(fixtures, llm_client.chat_model_class()))
+        llm_client._registry.clear()
+        return self
+
+
+# ==========================================
+# 5. 合成夹具（没有录制文件时使用，内容固定、日期相对今天生成）
+# ==========================================
+KDATA_FIELDS = ["date", "open", "high", "low", "close", "volume", "pctChg", "turn"]
+# 财报接口 -> {字段: (下限, 上限)}
+FUND_FIELDS = {
+    "query_profit_data": {"roeAvg": (0.02, 0.3), "npMargin": (0.05, 0.5), "gpMargin": (0.1, 0.9),
+                          "netProfit": (1e8, 5e10), "epsTTM": (0.2, 50)},
+    "query_growth_data": {"YOYNI": (-0.3, 0.5), "YOYEquity": (-0.1, 0.3), "YOYAsset": (-0.1, 0.3)},
+    "query_balance_data": {"liabilityToAsset": (0.1, 0.8), "currentRatio": (0.8, 4), "quickRatio": (0.5, 3)},
+    "query_cash_flow_data": {"CFOToNP": (0.3, 2), "CFOToOR": (0.05, 0.5)},
+    "query_dupont_data": {"dupontAssetTurn": (0.2, 1.5), "dupontAssetStoEquity": (1.1, 4)},
+}
+
+
+def _business_days(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += datetime.timedelta(days=1)
+
+
+def _synthetic_bars(rng, start, end, price):
+    rows = []
+    for day in _business_days(start, end):
+        pct = rng.gauss(0.0003, 0.018)
+        prev, price = price, max(price * (1 + pct), 1.0)
+        high = max(prev, price) * (1 + abs(rng.gauss(0, 0.006)))
+        low = min(prev, price) * (1 - abs(rng.gauss(0, 0.006)))
+        rows.append([day.isoformat(), f"{prev:.2f}", f"{high:.2f}", f"{low:.2f}", f"{price:.2f}",
+                     str(int(rng.uniform(2e6, 2e7))), f"{(price / prev - 1) * 100:.4f}", f"{rng.uniform(0.3, 3):.4f}"])
+    return rows
+
+
+def _feed_payloads(now):
+    """四个 JSON 快讯接口的合成响应，结构与线上接口一致"""
+    import sentiment_agent
+    ts = int(now.timestamp())
+    topics = ["央行公开市场净投放", "统计局公布CPI数据", "北向资金净流入", "新能源车销量创新高", "原油价格震荡回落",
+              "螺纹钢库存继续下降", "半导体板块午后拉升", "美联储议息会议纪要", "地产政策再度优化", "白酒板块集体走强"]
+    pages = {}
+    pages[sentiment_agent.URL_SINA_GLOBAL] = {"result": {"data": {"feed": {"list": [
+        {"rich_text": f"【{topics[i % 10]}】第{i}条全球快讯，市场关注后续政策落地节奏。",
+         "create_time": datetime.datetime.fromtimestamp(ts - i * 120).strftime("%Y-%m-%d %H:%M:%S"),
+         "doc_url": f"https://finance.sina.com.cn/7x24/{i}"} for i in range(30)]}}}}
+    pages[sentiment_agent.URL_10JQKA_REALTIME] = {"data": {"list": [
+        {"title": f"{topics[(i + 3) % 10]}（同花顺第{i}条）", "digest": f"{topics[(i + 3) % 10]}，机构认为影响有限。",
+         "ctime": str(ts - i * 90), "url": f"https://news.10jqka.com.cn/{i}.shtml"} for i in range(100)]}}
+    pages[sentiment_agent.URL_WSCN] = {"data": {"items": [
+        {"title": "", "content_text": f"{topics[(i + 5) % 10]}，华尔街见闻第{i}条实时快讯。", "uri": f"/livenews/{i}",
+         "display_time": ts - i * 150, "id": i} for i in range(20)]}}
+    pages[sentiment_agent.URL_MYSTEEL] = {"data": {"list": [
+        {"title": f"钢材现货第{i}条：{topics[(i + 7) % 10]}", "content": "<p>今日主流城市螺纹钢价格持稳。</p>",
+         "publishTime": (ts - i * 200) * 1000, "id": 1000 + i} for i in range(30)]}}
+    return pages
+
+
+def synthesize(tickers, lookback_days=3 * 365 + 240, seed=20240601):
+    """按今天的日期生成一套完整的合成夹具"""
+    import sentiment_agent
+    from fund_store import recent_quarters
+    from risk_engine import INDEX_CODE
+
+    rng = random.Random(seed)
+    fixtures = FixtureSet()
+    today = _today()
+    start = today - datetime.timedelta(days=lookback_days)
+    names = {code: f"样本股份{i:02d}" for i, code in enumerate(tickers)}
+
+    basic_rows = [[code, name, "2001-08-27", "", "1", "1"] for code, name in names.items()]
+    basic_rows.append([INDEX_CODE, "上证综合指数", "1991-07-15", "", "2", "1"])
+    fixtures.put_baostock("query_stock_basic", (), {}, "0", "success",
+                          ["code", "code_name", "ipoDate", "outDate", "type", "status"], basic_rows)
+
+    for code in list(tickers) + [INDEX_CODE]:
+        rows = _synthetic_bars(rng, start, today, rng.uniform(8, 200) if code != INDEX_CODE else 3000.0)
+        fixtures.put_baostock("query_history_k_data_plus", (code,), {}, "0", "success", KDATA_FIELDS, rows)
+        if code == INDEX_CODE:
+            continue
+        for year, quarter in recent_quarters():
+            stat = datetime.date(year, quarter * 3, 28)
+            for func_name, metrics in FUND_FIELDS.items():
+                values = [f"{rng.uniform(low, high):.6f}" for low, high in metrics.values()]
+                fixtures.put_baostock(
+                    func_name, (), {"code": code, "year": year, "quarter": quarter}, "0", "success",
+                    ["code", "pubDate", "statDate"] + list(metrics),
+                    [[code, (stat + datetime.timedelta(days=30)).isoformat(), stat.isoformat()] + values]
+                )
+
+    now = datetime.datetime.now()
+    for url, payload in _feed_payloads(now).items():
+        fixtures.put_http(url, None, 200, {"Content-Type": "application/json"},
+                          json.dumps(payload, ensure_ascii=False).encode("utf-8"), "utf-8")
+    html_pages = [
+        (sentiment_agent.URL_EASTMONEY_NEWS, "eastmoney_yaowen.html", "utf-8"),
+        (sentiment_agent.URL_SINA_ROLL_FUTURES, "sina_roll.html", "GB2312"),
+        (sentiment_agent.URL_SINA_HIGHLIGHTS, "sina_roll.html", "GB2312"),
+        (sentiment_agent.URL_100PPI, "100ppi_qb.html", "utf-8"),
+    ]
+    for url, filename, encoding in html_pages:
+        path = os.path.join(FIXTURE_DIR, filename)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                body = f.read()
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            fixtures.put_http(url, None, 200, {"ETag": etag, "Content-Type": "text/html"}, body, encoding)
+
+    for code, name in names.items():
+        for key, query in sentiment_agent.search_query_variants(code, name):
+            results = []
+            for i in range(sentiment_agent.SEARCH_MAX_RESULTS):
+                url = f"https://stock.example.com/{code}/{key}/{i}.html"
+                results.append({"title": f"{name}{['经营动态', '机构调研', '公告解读'][i % 3]}第{i}篇（{key}）",
+                                "href": url, "body": f"{name}近期经营情况平稳，第{i}篇报道关注订单与毛利率变化。",
+                                "published": now.strftime("%Y-%m-%d")})
+                article = "".join(f"<p>{name}第{i}篇正文第{j}段：公司披露最新经营数据，订单饱满，"
+                                  f"原材料成本小幅回落，管理层对下半年保持谨慎乐观。</p>" for j in range(8))
+                fixtures.put_http(url, None, 200, {"Content-Type": "text/html"},
+                                  f"<html><body>{article}</body></html>".encode("utf-8"), "utf-8")
+            fixtures.put_search(query, results)
+    return fixtures
@@ -0,0 +1,118 @@
+import sys
+import threading
+import time as std_time
+import atexit
+from telemetry import span
+
+# ==========================================
+# 1. Baostock 全局会话管理
+# ==========================================
+# baostock 底层是一条进程级的全局 socket 连接，并且不是线程安全的：
+# 多个线程同时 login/logout 或交错读取分页结果，会互相打断对方的查询。
+# 这里统一由一个会话对象负责：只登录一次、串行化所有查询、会话过期时自动重登。
+# baostock 本身（连带 pandas）导入约 0.25 秒，推迟到第一次登录时再导入。
+
+# 会话空闲超过该秒数后，下一次查询前主动重新登录（服务端会回收长时间空闲的会话）
+SESSION_IDLE_TIMEOUT = 20 * 60
+
+
+def _bs():
+    import baostock
+    return baostock
+
+
+class BaostockSession:
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self._lock = threading.RLock()
+        self._logged_in = False
+        self._last_used = 0.0
+        self.idle_timeout = idle_timeout
+
+    def _login(self):
+        lg = _bs().login()
+        self._logged_in = lg.error_code == '0'
+        if not self._logged_in:
+            print(f"   [Baostock] 登录失败: {lg.error_code} {lg.error_msg}")
+        self._last_used = std_time.time()
+        return self._logged_in
+
+    def _ensure_login(self):
+        expired = std_time.time() - self._last_used > self.idle_timeout
+        if not self._logged_in or expired:
+            if self._logged_in:
+                try:
+                    _bs().logout()
+                except Exception:
+                    pass
+            return self._login()
+        return True
+
+    def _run_query(self, func_name, args, kwargs):
+        rs = getattr(_bs(), func_name)(*args, **kwargs)
+        rows = []
+        while (rs.error_code == '0') & rs.next():
+            rows.append(rs.get_row_data())
+        return rs, rows
+
+    def query(self, func_name, *args, **kwargs):
+        """
+        执行任意 baostock 查询接口（如 query_history_k_data_plus / query_profit_data），
+        返回 (字段列表, 行数据列表)。分页读取也在锁内完成，保证不会被其他线程打断。
+        """
+        # 耗时包含排队等锁的时间：baostock 查询是串行的，排队本身就是瓶颈的一部分
+        with span("baostock", func_name) as sp, self._lock:
+            if not self._ensure_login():
+                sp.fail("login failed")
+                return [], []
+            rs, rows = self._run_query(func_name, args, kwargs)
+            if rs.error_code != '0':
+                # 会话可能已被服务端回收（如 10001001 用户未登录），重登后重试一次
+                print(f"   [Baostock] 查询 {func_name} 失败({rs.error_code} {rs.error_msg})，正在重新登录重试...")
+                sp.set(relogin=True)
+                if not self._login():
+                    sp.fail("relogin failed")
+                    return [], []
+                rs, rows = self._run_query(func_name, args, kwargs)
+            self._last_used = std_time.time()
+            if rs.error_code != '0':
+                sp.fail(f"{rs.error_code} {rs.error_msg}")
+            sp.set(rows=len(rows))
+            fields = rs.fields if isinstance(rs.fields, list) else []
+            return fields, rows
+
+    def close(self):
+        with self._lock:
+            if self._logged_in:
+                try:
+                    _bs().logout()
+                except Exception:
+                    pass
+                self._logged_in = False
+
+    def reset_after_fork(self):
+        """
+        fork 出的子进程会继承父进程的 baostock socket，几个子进程共用同一条连接会读走彼此的响应。
+        这里只丢弃继承来的连接和登录状态（不发 logout，以免注销父进程的会话），下一次查询时在子进程里重新登录
+        """
+        self._lock = threading.RLock()
+        self._logged_in = False
+        self._last_used = 0.0
+        if "baostock" in sys.modules:
+            import baostock.common.context as context
+            inherited = getattr(context, "default_socket", None)
+            context.default_socket = None
+            if inherited is not None:
+                try:
+                    inherited.close()  # 只关闭子进程里的文件描述符，父进程的连接不受影响
+                except Exception:
+                    pass
+
+
+# 进程内唯一的共享会话，三个数据智能体都通过它访问 baostock
+bs_session = BaostockSession()
+atexit.register(bs_session.close)
+
+
+def query(func_name, *args, **kwargs):
+    """统一查询入口，等价于 bs_session.query(...)"""
+    return bs_session.query(func_name, *args, **kwargs)
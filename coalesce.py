@@ -0,0 +1,110 @@
+import os
+import json
+import threading
+import time as std_time
+from collections import OrderedDict
+from telemetry import record_cache
+
+# ==========================================
+# 1. 同标的分析请求合并 (in-flight 合并 + 短时结果缓存)
+# ==========================================
+# 热门股票异动时，几秒内会有大量用户对同一只股票发起分析，每个请求都跑一遍完整的工作流
+# （四个部门 + 多轮辩论 + CIO）。这里按 股票代码 + 工作流参数（不含 api_key）合并：
+# - 同一 key 正在计算时，后到的请求挂到这次计算上，等它结束后拿同一份结果
+# - 计算完成后结果在一个短窗口内继续有效，窗口内的后续请求直接复用
+# - 计算失败不缓存，也不把异常转给等待者：key 不含 api_key，失败可能只是发起者自己的 Key 无效或额度用尽，
+#   等待者和计算被取消（返回 None）时一样，用自己的请求参数重新发起计算
+# 注意：合并后的结果由最先到达的请求使用自己的 API Key 计算，后到的请求不会再消耗各自的 Token。
+
+COALESCE_RESULT_TTL = int(os.environ.get("COALESCE_RESULT_TTL", "60"))  # 0 表示只合并进行中的请求，不缓存结果
+COALESCE_MAX_RESULTS = 256
+# 等待者检查自身是否被取消的间隔（秒）
+WAIT_POLL_SECONDS = 1.0
+
+# 结果来源
+COMPUTED = "computed"
+JOINED = "joined"
+CACHED = "cached"
+
+
+def request_key(ticker, params=None):
+    """合并 key：标准化后的股票代码 + 排序后的工作流参数（调用方不要把 api_key 放进 params）"""
+    return json.dumps([ticker.strip().lower(), params or {}], sort_keys=True, ensure_ascii=False)
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Coalescer:
+    def __init__(self, ttl=COALESCE_RESULT_TTL, max_entries=COALESCE_MAX_RESULTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results = OrderedDict()  # key -> (过期时间, 结果)
+        self._inflight = {}
+        self.stats = {COMPUTED: 0, JOINED: 0, CACHED: 0}
+
+    def _count(self, how):
+        self.stats[how] += 1
+        record_cache("analysis", "coalesce", {COMPUTED: "miss", JOINED: "shared", CACHED: "hit"}[how])
+
+    def run(self, key, compute, is_cancelled=None):
+        """
+        返回 (结果, 来源)，来源为 computed / joined / cached。
+        compute() 返回 None 表示计算被取消，不写缓存；is_cancelled() 为真时等待者放弃等待并返回 (None, joined)。
+        发起者的 compute() 抛出异常时只有发起者收到该异常，等待者改用自己的 compute 重新计算。
+        """
+        while True:
+            with self._lock:
+                item = self._results.get(key)
+                if item is not None and item[0] > std_time.monotonic():
+                    self._results.move_to_end(key)
+                    self._count(CACHED)
+                    return item[1], CACHED
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = _Flight()
+                    self._count(COMPUTED)
+                else:
+                    self._count(JOINED)
+            if leader:
+                break
+
+            while not flight.event.wait(WAIT_POLL_SECONDS):
+                if is_cancelled is not None and is_cancelled():
+                    return None, JOINED
+            if flight.value is not None:
+                return flight.value, JOINED
+            # 被合并的那次计算失败或中途取消了，由当前请求用自己的参数（API Key）重新发起
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and flight.value is not None and self.ttl > 0:
+                    self._results[key] = (std_time.monotonic() + self.ttl, flight.value)
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.max_entries:
+                        self._results.popitem(last=False)
+            flight.event.set()
+        return flight.value, COMPUTED
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._results.clear()
+            else:
+                self._results.pop(key, None)
+
+
+# 进程级共享：/api/analyze 与任务队列的工作线程共用同一个合并表
+analysis_coalescer = Coalescer()
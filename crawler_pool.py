@@ -0,0 +1,53 @@
+import time as std_time
+import concurrent.futures
+from telemetry import submit_in_context
+
+# ==========================================
+# 1. 并发爬虫引擎 (有界线程池 + 单源截止时间 + 总预算)
+# ==========================================
+# 所有数据源同时发出请求，整体耗时取决于最慢的单个数据源，而不是所有数据源之和。
+# 超过截止时间的数据源直接放弃（线程会在各自的 requests 超时后自行结束），
+# 调用方拿到的是预算耗尽前已经完成的那部分结果。
+
+CRAWLER_MAX_WORKERS = 32
+DEFAULT_SOURCE_DEADLINE = 12  # 单个数据源最长等待秒数
+DEFAULT_BUDGET = 15  # 整轮抓取的总预算秒数
+
+# 进程级共享的有界线程池：不使用 with 语句，避免退出时被超时的慢请求拖住
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=CRAWLER_MAX_WORKERS, thread_name_prefix="crawler")
+
+
+def fan_out(tasks, budget=DEFAULT_BUDGET, deadlines=None, default_deadline=DEFAULT_SOURCE_DEADLINE):
+    """
+    并发执行一组抓取任务。
+    tasks: [(名称, 函数, 参数元组), ...]
+    deadlines: {名称: 秒数}，覆盖单个数据源的截止时间
+    返回 {名称: 结果}，只包含在截止时间内成功完成的任务。
+    """
+    deadlines = deadlines or {}
+    start = std_time.monotonic()
+    budget_end = start + budget
+    pending = {}
+    for name, func, args in tasks:
+        # 带上当前上下文，子任务里的 span 归入同一条链路
+        fut = submit_in_context(_executor, func, *args)
+        pending[fut] = (name, min(start + deadlines.get(name, default_deadline), budget_end))
+
+    results = {}
+    while pending:
+        now = std_time.monotonic()
+        for fut in [f for f, (_, end) in pending.items() if end <= now]:
+            name, _ = pending.pop(fut)
+            fut.cancel()
+            print(f"   [爬虫集群] {name} 超过截止时间 {now - start:.1f}s，已放弃")
+        if not pending:
+            break
+        timeout = min(end for _, end in pending.values()) - now
+        done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+        for fut in done:
+            name, _ = pending.pop(fut)
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                print(f"   [爬虫集群] {name} 抓取异常: {e}")
+    return results
@@ -1,30 +1,13 @@
-import os
-import baostock as bs
-import pandas as pd
-import datetime
-from langchain_openai import ChatOpenAI
+from llm_client import get_llm
+from llm_cache import cached_invoke
+from fund_store import format_fund_table
 
 def get_finance_data(code="sh.600000"):
     """
-    获取基本面数据：近期盈利能力
+    获取基本面数据：最近多个季度的盈利、成长、偿债、现金流与杜邦指标
+    （读本地基本面仓库的内存数据，仓库中没有该股票时才现场补拉）
     """
-    bs.login()
-
-    # 动态计算上一个年份，确保能稳定取到数据
-    current_year = datetime.datetime.now().year
-    target_year = current_year - 1
-    target_quarter = 3  # 默认取三季报演示
-
-    rs = bs.query_profit_data(code=code, year=target_year, quarter=target_quarter)
-    data = []
-    while (rs.error_code == '0') & rs.next():
-        data.append(rs.get_row_data())
-    bs.logout()
-
-    if not data:
-        return f"暂无 {code} {target_year}年Q{target_quarter} 财报数据"
-
-    return pd.DataFrame(data, columns=rs.fields).to_string()
+    return format_fund_table(code)
 
 
 # ==========================================
@@ -36,22 +19,17 @@ def run_fund_agent(ticker: str, api_key: str) -> dict:
     ...
     """
     print(f"[基本面组] 正在审计 {ticker} 的财务报表...")
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        api_key=api_key, # 使用参数传过来的 key
-        base_url="https://api.deepseek.com",
-        temperature=0.3  # （注意：各个agent原有的温度保留不变，比如risk是0.1）
-    )
+    llm = get_llm(api_key, temperature=0.3)  # （注意：各个agent原有的温度保留不变，比如risk是0.1）
 
-    # 1. 获取基础数据
+    # 1. 获取基础数据（财报按季度更新，读本地基本面仓库）
     f_data = get_finance_data(ticker)
 
     # 2. 构建给 DeepSeek 的提示词 (Prompt)
     prompt = f"""
-    你是资深行业研究员。根据以下财务数据（重点关注 ROE, 净利率等）：
+    你是资深行业研究员。根据以下最近多个季度的财务数据（重点关注 ROE, 净利率, 增速与现金流质量等）：
     {f_data}
 
-    请判断该公司的盈利能力和成长性。
+    请结合各项指标的多季度变化趋势，判断该公司的盈利能力和成长性。
     输出格式要求：
     【观点】看好/看空/中性
     【核心数据】(简述核心指标的表现)
@@ -59,12 +37,12 @@ def run_fund_agent(ticker: str, api_key: str) -> dict:
     """
 
     # 3. 调用大模型
-    response = llm.invoke(prompt)
+    response_text = cached_invoke(llm, prompt, node="fund")
 
     # 4. 返回结果字典
     return {
         "fundamental_data": f_data,
-        "fund_signal": response.content
+        "fund_signal": response_text
     }
 
 
@@ -0,0 +1,333 @@
+import os
+import json
+import sqlite3
+import argparse
+import datetime
+import threading
+import time as std_time
+import bs_session
+from prompt_codec import fit_lines, budget_for
+
+# ==========================================
+# 1. 本地基本面仓库 (多季度财报，SQLite 持久化 + 内存热数据)
+# ==========================================
+# 财报按季度更新，没有必要在每次分析时都去 baostock 现查。这里把盈利能力、成长能力、
+# 偿债能力、现金流量、杜邦分析五类季度数据落到本地 SQLite：
+# - 批量回补任务一次性拉齐全部股票最近 8~12 个季度（见文末命令行入口）
+# - 财报季之后增量刷新：只补查缺失的季度，尚未披露的最新季度每天最多重试一次
+# - 分析时直接读内存，热路径上没有网络请求；库里有更新的记录（其他进程刷新了新披露的季度）时重新读库
+# - 仓库里完全没有的股票才会现场补拉，且只补最近一个已披露季度（5 次查询），其余季度交给后台线程补齐，
+#   完整的 12 个季度留给命令行回补
+
+FUND_STORE_PATH = os.environ.get(
+    "FUND_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fundamentals.sqlite3")
+)
+# 仓库保留的季度数
+FUND_QUARTERS = int(os.environ.get("FUND_QUARTERS", "12"))
+# 喂给大模型的季度数
+FUND_PROMPT_QUARTERS = 8
+# 季度结束后多少天内视为“披露窗口”：窗口内查不到数据会在 RETRY_EMPTY_INTERVAL 后重试，
+# 窗口外仍为空（如上市前的季度）则不再重复查询
+DISCLOSURE_WINDOW_DAYS = 125
+RETRY_EMPTY_INTERVAL = 24 * 3600
+
+# 数据类别 -> baostock 查询接口
+FUND_KINDS = {
+    "profit": "query_profit_data",
+    "growth": "query_growth_data",
+    "balance": "query_balance_data",
+    "cash_flow": "query_cash_flow_data",
+    "dupont": "query_dupont_data",
+}
+
+# 喂给大模型的核心指标：(类别, baostock 字段, 中文名, 格式)；pct 表示比例按百分数展示
+PROMPT_METRICS = [
+    ("profit", "roeAvg", "ROE(平均)", "pct"),
+    ("profit", "npMargin", "销售净利率", "pct"),
+    ("profit", "gpMargin", "销售毛利率", "pct"),
+    ("profit", "netProfit", "净利润(亿元)", "yi"),
+    ("profit", "epsTTM", "EPS(TTM)", "num"),
+    ("growth", "YOYNI", "净利润同比", "pct"),
+    ("growth", "YOYEquity", "净资产同比", "pct"),
+    ("growth", "YOYAsset", "总资产同比", "pct"),
+    ("balance", "liabilityToAsset", "资产负债率", "pct"),
+    ("balance", "currentRatio", "流动比率", "num"),
+    ("balance", "quickRatio", "速动比率", "num"),
+    ("cash_flow", "CFOToNP", "经营现金流/净利润", "num"),
+    ("cash_flow", "CFOToOR", "经营现金流/营收", "pct"),
+    ("dupont", "dupontAssetTurn", "总资产周转率", "num"),
+    ("dupont", "dupontAssetStoEquity", "权益乘数", "num"),
+]
+# 提示词用到的数据类别（分析请求里现场补拉时只查这些）
+PROMPT_KINDS = list(dict.fromkeys(kind for kind, _, _, _ in PROMPT_METRICS))
+# 现场补拉时向前寻找最近一个已披露季度的范围（最新季度可能还在披露窗口内）
+LATEST_QUARTER_PROBES = 2
+
+
+def recent_quarters(n=FUND_QUARTERS, today=None):
+    """最近 n 个已经结束的季度，按时间从新到旧：[(年份, 季度), ...]"""
+    today = today or datetime.date.today()
+    year, quarter = today.year, (today.month - 1) // 3  # 当前季度尚未结束，从上一个季度开始
+    if quarter == 0:
+        year, quarter = year - 1, 4
+    out = []
+    for _ in range(n):
+        out.append((year, quarter))
+        year, quarter = (year - 1, 4) if quarter == 1 else (year, quarter - 1)
+    return out
+
+
+def quarter_end(year, quarter):
+    return datetime.date(year, quarter * 3, 31 if quarter in (1, 4) else 30)
+
+
+class FundStore:
+    def __init__(self, path=FUND_STORE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        # 内存热数据: code -> {(year, quarter): {kind: {字段: 值}}}
+        self._mem = {}
+        # 内存中每只股票已包含的最新入库时间，库里出现更新的记录时重新读库
+        self._mem_fetched_at = {}
+        # 正在后台补齐的股票
+        self._backfilling = set()
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fundamentals (
+                    code TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    quarter INTEGER NOT NULL,
+                    pub_date TEXT,
+                    data TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (code, kind, year, quarter)
+                );
+                -- 查询过但没有数据的季度，避免反复请求
+                CREATE TABLE IF NOT EXISTS fetch_misses (
+                    code TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    quarter INTEGER NOT NULL,
+                    tried_at REAL NOT NULL,
+                    PRIMARY KEY (code, kind, year, quarter)
+                );
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def _load(self, code):
+        """把某只股票的全部季度数据读入内存（只在首次访问或 _refresh_if_stale 丢弃旧数据后读库）"""
+        if code not in self._mem:
+            rows = self._db().execute(
+                "SELECT kind, year, quarter, data, fetched_at FROM fundamentals WHERE code=?", (code,)
+            ).fetchall()
+            quarters = {}
+            for kind, year, quarter, data, _ in rows:
+                quarters.setdefault((year, quarter), {})[kind] = json.loads(data)
+            self._mem[code] = quarters
+            self._mem_fetched_at[code] = max((r[4] for r in rows), default=0.0)
+        return self._mem[code]
+
+    def _refresh_if_stale(self, code):
+        """库里有比内存更新的记录（如另一个进程运行了 --refresh）时丢弃内存副本，下次 _load 重新读库"""
+        if code not in self._mem:
+            return
+        latest = self._db().execute(
+            "SELECT MAX(fetched_at) FROM fundamentals WHERE code=?", (code,)
+        ).fetchone()[0] or 0.0
+        if latest > self._mem_fetched_at.get(code, 0.0):
+            del self._mem[code]
+
+    def _missing(self, code, quarters, now, kinds=FUND_KINDS):
+        """返回需要向 baostock 查询的 (类别, 年份, 季度)"""
+        have = self._load(code)
+        misses = {
+            (kind, year, quarter): tried_at
+            for kind, year, quarter, tried_at in self._db().execute(
+                "SELECT kind, year, quarter, tried_at FROM fetch_misses WHERE code=?", (code,)
+            )
+        }
+        today = datetime.date.fromtimestamp(now)
+        todo = []
+        for year, quarter in quarters:
+            in_window = (today - quarter_end(year, quarter)).days <= DISCLOSURE_WINDOW_DAYS
+            for kind in kinds:
+                if kind in have.get((year, quarter), {}):
+                    continue
+                tried_at = misses.get((kind, year, quarter))
+                if tried_at is None or (in_window and now - tried_at > RETRY_EMPTY_INTERVAL):
+                    todo.append((kind, year, quarter))
+        return todo
+
+    def sync(self, code, quarters=None, kinds=FUND_KINDS):
+        """补齐某只股票缺失的季度数据（默认最近 FUND_QUARTERS 个季度的全部类别），返回本次新写入的条数"""
+        quarters = quarters or recent_quarters()
+        now = std_time.time()
+        written = 0
+        with self._lock:
+            todo = self._missing(code, quarters, now, kinds)
+        for kind, year, quarter in todo:
+            fields, rows = bs_session.query(FUND_KINDS[kind], code=code, year=year, quarter=quarter)
+            with self._lock:
+                db = self._db()
+                if not fields:
+                    # 登录或查询失败，不记录为“无数据”，下次再试
+                    continue
+                if not rows:
+                    db.execute(
+                        "INSERT OR REPLACE INTO fetch_misses (code, kind, year, quarter, tried_at) VALUES (?, ?, ?, ?, ?)",
+                        (code, kind, year, quarter, now)
+                    )
+                    db.commit()
+                    continue
+                record = dict(zip(fields, rows[-1]))
+                db.execute(
+                    "INSERT OR REPLACE INTO fundamentals (code, kind, year, quarter, pub_date, data, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (code, kind, year, quarter, record.get("pubDate"), json.dumps(record, ensure_ascii=False), now)
+                )
+                db.execute("DELETE FROM fetch_misses WHERE code=? AND kind=? AND year=? AND quarter=?",
+                           (code, kind, year, quarter))
+                db.commit()
+                self._load(code).setdefault((year, quarter), {})[kind] = record
+                self._mem_fetched_at[code] = max(self._mem_fetched_at.get(code, 0.0), now)
+                written += 1
+        return written
+
+    def _sync_latest(self, code, quarters):
+        """现场补拉：先用盈利能力数据找到最近一个已披露的季度，再只补这一个季度里提示词用到的其余类别"""
+        for year, quarter in quarters[:LATEST_QUARTER_PROBES]:
+            self.sync(code, [(year, quarter)], ["profit"])
+            with self._lock:
+                if "profit" in self._load(code).get((year, quarter), {}):
+                    break
+        else:
+            return
+        self.sync(code, [(year, quarter)], PROMPT_KINDS)
+
+    def _backfill_async(self, code, quarters, kinds):
+        """在后台线程里补齐其余季度（同一只股票只起一个线程），补到的数据直接写入内存供后续请求使用"""
+        with self._lock:
+            if code in self._backfilling:
+                return
+            self._backfilling.add(code)
+
+        def run():
+            try:
+                written = self.sync(code, quarters, kinds)
+                print(f"   [基本面仓库] {code} 后台补齐 {written} 条季度数据")
+            except Exception as e:
+                print(f"   ⚠️ [基本面仓库] {code} 后台补齐失败: {e}")
+            finally:
+                with self._lock:
+                    self._backfilling.discard(code)
+
+        threading.Thread(target=run, daemon=True, name=f"fund-backfill-{code}").start()
+
+    def get(self, code, n=FUND_PROMPT_QUARTERS, sync=True):
+        """
+        返回最近 n 个有数据的季度，按时间从新到旧：[((年份, 季度), {类别: {字段: 值}}), ...]
+        仓库里完全没有该股票时现场补拉：这一步在用户请求里执行并占用全局 baostock 会话，
+        所以只同步补最近一个已披露季度，最近 n 个季度的其余部分在后台补齐，完整回补交给命令行入口。
+        """
+        with self._lock:
+            self._refresh_if_stale(code)
+            empty = not self._load(code)
+        if empty and sync:
+            quarters = recent_quarters(n)
+            self._sync_latest(code, quarters)
+            self._backfill_async(code, quarters, PROMPT_KINDS)
+        with self._lock:
+            quarters = self._load(code)
+            return [(q, quarters[q]) for q in sorted(quarters, reverse=True)[:n]]
+
+    def codes(self):
+        with self._lock:
+            return [row[0] for row in self._db().execute("SELECT DISTINCT code FROM fundamentals")]
+
+
+# 进程内共享的基本面仓库
+fund_store = FundStore()
+
+
+def _format_value(raw, fmt):
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return ""
+    if fmt == "pct":
+        return f"{value * 100:.1f}%"
+    if fmt == "yi":
+        return f"{value / 1e8:.2f}"
+    return f"{value:.2f}"
+
+
+def format_fund_table(code, n=FUND_PROMPT_QUARTERS):
+    """把多季度核心指标整理成“指标 × 季度”的紧凑 TSV 表格，超出 Token 预算时保留靠前的核心指标"""
+    quarters = fund_store.get(code, n)
+    if not quarters:
+        return f"暂无 {code} 近 {n} 个季度的财报数据"
+    header = ["指标"] + [f"{y}Q{q}" for (y, q), _ in quarters]
+    lines = []
+    for kind, field, name, fmt in PROMPT_METRICS:
+        cells = [_format_value(data.get(kind, {}).get(field), fmt) for _, data in quarters]
+        if any(cells):
+            lines.append("\t".join([name] + cells))
+    return "\t".join(header) + "\n" + fit_lines(lines, budget_for("fund"), keep="head")
+
+
+# ==========================================
+# 2. 批量回补 / 增量刷新 命令行入口
+# ==========================================
+def list_all_stocks():
+    """baostock 全部在市 A 股代码（type=1 股票, status=1 上市）"""
+    fields, rows = bs_session.query("query_stock_basic")
+    if not fields:
+        return []
+    idx = {name: i for i, name in enumerate(fields)}
+    return [r[idx["code"]] for r in rows if r[idx["type"]] == "1" and r[idx["status"]] == "1"]
+
+
+def backfill(codes, quarters=None):
+    """逐只补齐缺失的季度数据（已入库的季度直接跳过，中断后重跑即可续传）"""
+    quarters = quarters or recent_quarters()
+    total = 0
+    for i, code in enumerate(codes, 1):
+        try:
+            total += fund_store.sync(code, quarters)
+        except Exception as e:
+            print(f"   ⚠️ 回补 {code} 失败: {e}")
+        if i % 50 == 0 or i == len(codes):
+            print(f"   [基本面仓库] {i}/{len(codes)}，本次新写入 {total} 条")
+    return total
+
+
+# 用法示例：
+#   python fund_store.py --all                    # 首次回补全部 A 股最近 12 个季度
+#   python fund_store.py --refresh --quarters 2   # 财报季后只刷新已入库股票的最新 2 个季度
+#   python fund_store.py sh.600519 sz.000858
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回补 / 增量刷新本地基本面仓库")
+    parser.add_argument("tickers", nargs="*", help="股票代码，如 sh.600519")
+    parser.add_argument("--all", action="store_true", help="回补全部在市 A 股")
+    parser.add_argument("--refresh", action="store_true", help="只刷新仓库中已有的股票")
+    parser.add_argument("--quarters", type=int, default=FUND_QUARTERS, help="处理最近多少个季度")
+    args = parser.parse_args()
+
+    targets = list(args.tickers)
+    if args.all:
+        targets += list_all_stocks()
+    if args.refresh:
+        targets += fund_store.codes()
+    targets = list(dict.fromkeys(targets))
+    if not targets:
+        parser.error("请提供股票代码，或使用 --all / --refresh")
+
+    print(f"[基本面仓库] 开始处理 {len(targets)} 只股票的最近 {args.quarters} 个季度...")
+    backfill(targets, recent_quarters(args.quarters))
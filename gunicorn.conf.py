@@ -0,0 +1,38 @@
+import gc
+import os
+
+# ==========================================
+# 1. gunicorn 预启动模式 (preload + 预热 + fork)
+# ==========================================
+# 运行方式：gunicorn -c gunicorn.conf.py app:app
+# master 进程先导入 app、编译工作流、导入大模型 / 搜索客户端并加载股票简称表，然后再 fork 工作进程：
+# 冷启动的导入与编译只做一次，工作进程重启（崩溃、max_requests 轮换）时直接从预热好的 master fork，几乎没有启动开销。
+# 继承自 master 的 baostock socket、HTTP 连接池和 SQLite 连接在 post_fork 里丢弃，由各工作进程首次使用时重建。
+# 注意：
+# - 异步任务队列的 API Key 只保存在进程内存里，且进程启动时会把库里未完成的任务标记为中断，
+#   因此默认只开 1 个工作进程，靠线程承接并发；横向扩容请增加容器实例
+# - gunicorn 模式下不要用 NEWS_INGESTOR=1 在工作进程里采集快讯，改为单独运行 python news_ingestor.py
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+# 同步分析与流式接口都会长时间占用一个线程
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+timeout = 300
+graceful_timeout = 60
+preload_app = True
+
+
+def when_ready(server):
+    """master 进程在 fork 工作进程之前执行：预热一次，所有工作进程通过写时复制共享"""
+    from app import warm_up
+
+    warm_up()
+    # 把预热产生的对象移出 GC 跟踪，避免子进程里的垃圾回收触碰这些页面、破坏写时复制
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import reset_after_fork
+
+    reset_after_fork()
@@ -0,0 +1,240 @@
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from telemetry import register_collector
+
+# ==========================================
+# 1. 共享 HTTP 连接池 (按目标站点划分)
+# ==========================================
+# 每个站点一个 requests.Session，复用 keep-alive 连接，省掉每个数据源每次请求的 TCP+TLS 握手。
+# 同时对每个站点限制并发数，并对 429/5xx 做带退避的重试，降低被新浪、同花顺限流的概率。
+# 需要走代理时设置 QUANT_PROXY（如 http://127.0.0.1:7890 或 socks5://127.0.0.1:7890），只作用于这里的会话，
+# 不改写进程环境变量，不影响 baostock、大模型客户端等其他连接。
+
+DEFAULT_HOST_CONCURRENCY = 4
+# 容易限流的站点单独收紧并发
+HOST_CONCURRENCY = {
+    "zhibo.sina.com.cn": 2,
+    "finance.sina.com.cn": 2,
+    "news.10jqka.com.cn": 2,
+}
+RETRY_POLICY = Retry(
+    total=2,
+    connect=2,
+    read=1,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+# 条件请求缓存最多保留的页面数
+VALIDATOR_CACHE_SIZE = 128
+# 最多保留会话的站点数：定向搜索会抓取任意站点的文章正文，超过后关闭最久未使用的站点会话
+MAX_HOST_SESSIONS = 64
+# 爬虫与定向搜索使用的代理，默认直连
+PROXY_URL = os.environ.get("QUANT_PROXY", "").strip() or None
+
+
+class _PooledAdapter(HTTPAdapter):
+    """在连接池上挂计数器，统计新建连接数，用来计算连接复用率"""
+
+    def __init__(self, stats, stats_lock, **kwargs):
+        self._stats = stats
+        self._stats_lock = stats_lock
+        super().__init__(**kwargs)
+
+    def _install_counters(self, manager):
+        stats, lock = self._stats, self._stats_lock
+
+        class _CountingHTTPPool(HTTPConnectionPool):
+            def _new_conn(self):
+                with lock:
+                    stats["new_connections"] += 1
+                return super()._new_conn()
+
+        class _CountingHTTPSPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                with lock:
+                    stats["new_connections"] += 1
+                return super()._new_conn()
+
+        manager.pool_classes_by_scheme = {"http": _CountingHTTPPool, "https": _CountingHTTPSPool}
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._install_counters(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        is_new = proxy not in self.proxy_manager
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        # SOCKS 代理使用自己的连接池类型，不做替换
+        if is_new and not proxy.lower().startswith("socks"):
+            self._install_counters(manager)
+        return manager
+
+
+class HostSessionPool:
+    def __init__(self, host_concurrency=None, default_concurrency=DEFAULT_HOST_CONCURRENCY, retry=RETRY_POLICY,
+                 proxy=PROXY_URL, max_hosts=MAX_HOST_SESSIONS):
+        self.host_concurrency = dict(host_concurrency or {})
+        self.default_concurrency = default_concurrency
+        self.retry = retry
+        self.proxy = proxy
+        self.max_hosts = max_hosts
+        self._lock = threading.Lock()
+        self._hosts = OrderedDict()  # host -> {"session", "semaphore", "stats", "stats_lock"}，按最近使用排序
+
+    def _host_entry(self, host):
+        evicted = []
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is not None:
+                self._hosts.move_to_end(host)
+            else:
+                limit = self.host_concurrency.get(host, self.default_concurrency)
+                stats = {"requests": 0, "new_connections": 0, "errors": 0, "not_modified": 0}
+                stats_lock = threading.Lock()
+                adapter = _PooledAdapter(
+                    stats, stats_lock, pool_connections=1, pool_maxsize=limit, max_retries=self.retry
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if self.proxy:
+                    session.proxies = {"http": self.proxy, "https": self.proxy}
+                entry = {
+                    "session": session,
+                    "semaphore": threading.BoundedSemaphore(limit),
+                    "stats": stats,
+                    "stats_lock": stats_lock,
+                }
+                self._hosts[host] = entry
+                while len(self._hosts) > self.max_hosts:
+                    evicted.append(self._hosts.popitem(last=False)[1])
+        # 被淘汰站点的会话在锁外关闭；仍在进行中的请求结束后连接直接丢弃，下次访问该站点时重建
+        for old in evicted:
+            old["session"].close()
+        return entry
+
+    def get(self, url, **kwargs):
+        entry = self._host_entry(urlsplit(url).netloc)
+        with entry["semaphore"]:
+            with entry["stats_lock"]:
+                entry["stats"]["requests"] += 1
+            try:
+                return entry["session"].get(url, **kwargs)
+            except Exception:
+                with entry["stats_lock"]:
+                    entry["stats"]["errors"] += 1
+                raise
+
+    def count(self, url, field):
+        entry = self._host_entry(urlsplit(url).netloc)
+        with entry["stats_lock"]:
+            entry["stats"][field] += 1
+
+    def reset_after_fork(self):
+        """fork 出的子进程丢弃继承来的会话与连接池（连接不能跨进程共用），下次请求时按站点重建"""
+        self._lock = threading.Lock()
+        self._hosts = OrderedDict()
+
+    def stats(self):
+        """按站点返回请求数、新建连接数与连接复用次数"""
+        with self._lock:
+            entries = list(self._hosts.items())
+        report = {}
+        for host, entry in entries:
+            with entry["stats_lock"]:
+                s = dict(entry["stats"])
+            s["reused_connections"] = max(s["requests"] - s["new_connections"], 0)
+            s["reuse_ratio"] = round(s["reused_connections"] / s["requests"], 3) if s["requests"] else 0.0
+            report[host] = s
+        return report
+
+
+# 进程级共享的连接池，所有爬虫都通过它发请求
+http_pool = HostSessionPool(host_concurrency=HOST_CONCURRENCY)
+
+
+def http_get(url, **kwargs):
+    """替代 requests.get：复用对应站点的长连接，参数与 requests.get 一致"""
+    return http_pool.get(url, **kwargs)
+
+
+def connection_stats():
+    return http_pool.stats()
+
+
+@register_collector
+def _connection_metrics():
+    """/metrics 导出各站点的请求数、新建 / 复用连接数与复用率（被 LRU 淘汰的站点计数会归零重新开始）"""
+    stats = connection_stats()
+    return [
+        ("http_requests_total", "counter", "爬虫 HTTP 请求数（按站点）",
+         [({"host": host}, s["requests"]) for host, s in sorted(stats.items())]),
+        ("http_connections_total", "counter", "爬虫 HTTP 连接数：new 为新建连接，reused 为复用已有长连接的请求",
+         [({"host": host, "type": kind}, s[f"{kind}_connections"])
+          for host, s in sorted(stats.items()) for kind in ("new", "reused")]),
+        ("http_connection_reuse_ratio", "gauge", "爬虫 HTTP 连接复用率（复用请求数 / 请求数）",
+         [({"host": host}, s["reuse_ratio"]) for host, s in sorted(stats.items())]),
+    ]
+
+
+# ==========================================
+# 2. 条件请求缓存 (ETag / Last-Modified)
+# ==========================================
+# 记住每个页面上次 200 响应的 ETag / Last-Modified，下次请求带上 If-None-Match / If-Modified-Since；
+# 服务端返回 304 时直接复用上次的响应体，页面没有变化就不必重新下载（解析层再据此跳过重复解析）。
+class ValidatorCache:
+    def __init__(self, max_entries=VALIDATOR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (etag, last_modified, response)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, last_modified, response):
+        with self._lock:
+            self._entries[key] = (etag, last_modified, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+validator_cache = ValidatorCache()
+
+
+def conditional_get(url, params=None, headers=None, **kwargs):
+    """
+    带条件请求的 http_get，返回 (response, not_modified)。
+    not_modified 为 True 时 response 是上次缓存的 200 响应（共享对象，调用方只读，不要修改 encoding 等属性）。
+    """
+    key = (url, tuple(sorted((params or {}).items())))
+    cached_entry = validator_cache.get(key)
+    headers = dict(headers or {})
+    if cached_entry is not None:
+        etag, last_modified, _ = cached_entry
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    resp = http_get(url, params=params, headers=headers, **kwargs)
+    if resp.status_code == 304 and cached_entry is not None:
+        http_pool.count(url, "not_modified")
+        return cached_entry[2], True
+    etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    if resp.status_code == 200 and (etag or last_modified):
+        validator_cache.put(key, etag, last_modified, resp)
+    return resp, False
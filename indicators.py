@@ -0,0 +1,148 @@
+import numpy as np
+
+# ==========================================
+# 1. 向量化技术指标引擎
+# ==========================================
+# 所有指标都在 (股票数 × 交易日数) 的二维数组上一次性计算，单只股票就是 1 × N 的特例；
+# 缺失值（未上市、停牌）用 NaN 表示。滚动类指标用前缀和 O(N) 计算，
+# 递推类指标（EMA / RSI / ATR）逐日推进但在股票维度上向量化，批量筛选时只需一轮计算。
+# 单只股票预热 + 展示窗口只有一两百根 K 线，每次在完整序列上重算即可（K 线图本身也需要整段 MA 序列）。
+
+MA_WINDOWS = (5, 20)
+VOLUME_MA_WINDOWS = (5, 20)
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+BOLL_PERIOD, BOLL_K = 20, 2
+ATR_PERIOD = 14
+PANEL_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def _as_2d(x):
+    x = np.asarray(x, dtype="f8")
+    return x[np.newaxis, :] if x.ndim == 1 else x
+
+
+def rolling_mean(x, n):
+    """滚动均值：窗口内存在 NaN 时结果为 NaN"""
+    x = _as_2d(x)
+    valid = ~np.isnan(x)
+    csum = np.cumsum(np.where(valid, x, 0.0), axis=1)
+    ccnt = np.cumsum(valid, axis=1)
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] < n:
+        return out
+    wsum = csum[:, n - 1:].copy()
+    wcnt = ccnt[:, n - 1:].copy()
+    wsum[:, 1:] -= csum[:, :-n]
+    wcnt[:, 1:] -= ccnt[:, :-n]
+    out[:, n - 1:] = np.where(wcnt == n, wsum / n, np.nan)
+    return out
+
+
+def rolling_std(x, n):
+    """滚动总体标准差 (ddof=0)，与通达信等行情软件的布林带口径一致"""
+    x = _as_2d(x)
+    mean = rolling_mean(x, n)
+    mean_sq = rolling_mean(x * x, n)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def ema(x, n, alpha=None):
+    """指数移动平均：以每只股票第一个有效值作为初值，遇到 NaN 沿用前值"""
+    x = _as_2d(x)
+    alpha = 2.0 / (n + 1) if alpha is None else alpha
+    out = np.full(x.shape, np.nan)
+    prev = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        cur = x[:, t]
+        prev = np.where(np.isnan(prev), cur, np.where(np.isnan(cur), prev, prev + alpha * (cur - prev)))
+        out[:, t] = prev
+    return out
+
+
+def wilder(x, n):
+    """Wilder 平滑 (RMA)，即 alpha = 1/n 的 EMA，用于 RSI 与 ATR"""
+    return ema(x, n, alpha=1.0 / n)
+
+
+def prev_values(x):
+    x = _as_2d(x)
+    out = np.full(x.shape, np.nan)
+    out[:, 1:] = x[:, :-1]
+    return out
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """返回 (DIF, DEA, MACD 柱)，柱值按国内习惯取 2 × (DIF - DEA)"""
+    dif = ema(close, fast) - ema(close, slow)
+    dea = ema(dif, signal)
+    return dif, dea, 2 * (dif - dea)
+
+
+def rsi(close, n=RSI_PERIOD):
+    delta = _as_2d(close) - prev_values(close)
+    gain = wilder(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), n)
+    loss = wilder(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + gain / loss)
+    return np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), out)
+
+
+def bollinger(close, n=BOLL_PERIOD, k=BOLL_K):
+    """返回 (上轨, 中轨, 下轨)"""
+    mid = rolling_mean(close, n)
+    std = rolling_std(close, n)
+    return mid + k * std, mid, mid - k * std
+
+
+def true_range(high, low, close):
+    high, low = _as_2d(high), _as_2d(low)
+    pc = prev_values(close)
+    return np.fmax(high - low, np.fmax(np.abs(high - pc), np.abs(low - pc)))
+
+
+def atr(high, low, close, n=ATR_PERIOD):
+    return wilder(true_range(high, low, close), n)
+
+
+def obv(close, volume):
+    """能量潮：按收盘价涨跌方向累加成交量，停牌日 (NaN) 不计"""
+    direction = np.sign(_as_2d(close) - prev_values(close))
+    flow = np.nan_to_num(direction * _as_2d(volume))
+    return np.cumsum(flow, axis=1)
+
+
+def compute_indicators(panel):
+    """
+    panel: {"open"/"high"/"low"/"close"/"volume": (股票数 × 交易日数) 数组}
+    返回 {指标名: 同形状数组}
+    """
+    close, volume = _as_2d(panel["close"]), _as_2d(panel["volume"])
+    out = {}
+    for n in MA_WINDOWS:
+        out[f"MA{n}"] = rolling_mean(close, n)
+    for n in VOLUME_MA_WINDOWS:
+        out[f"VOL_MA{n}"] = rolling_mean(volume, n)
+    out["DIF"], out["DEA"], out["MACD"] = macd(close)
+    out[f"RSI{RSI_PERIOD}"] = rsi(close)
+    out["BOLL_UP"], out["BOLL_MID"], out["BOLL_LOW"] = bollinger(close)
+    out[f"ATR{ATR_PERIOD}"] = atr(panel["high"], panel["low"], close)
+    out["OBV"] = obv(close, volume)
+    return out
+
+
+def build_panel(frames, fields=PANEL_FIELDS):
+    """
+    把 {代码: 日 K 线 DataFrame} 按日期并集对齐成二维面板，缺失日期填 NaN。
+    返回 (代码列表, 日期数组, {字段: 二维数组})
+    """
+    codes = list(frames)
+    dates = np.unique(np.concatenate([frames[c]["date"].to_numpy(dtype=str) for c in codes])) if codes else np.array([])
+    panel = {f: np.full((len(codes), len(dates)), np.nan) for f in fields}
+    for i, code in enumerate(codes):
+        df = frames[code]
+        idx = np.searchsorted(dates, df["date"].to_numpy(dtype=str))
+        for f in fields:
+            panel[f][i, idx] = df[f].to_numpy(dtype="f8")
+    return codes, dates, panel
+
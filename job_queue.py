@@ -0,0 +1,209 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+import time as std_time
+
+# ==========================================
+# 1. 异步任务队列 (SQLite 持久化 + 有界工作线程池)
+# ==========================================
+# Web 层只负责提交任务和查询状态，真正昂贵的多智能体工作流由固定数量的后台线程按队列顺序消费，
+# 这样 Web 层可以承接大量请求，而大模型调用以可控的速率排队执行。
+# - 排队深度超过上限时拒绝新任务（背压），由接口返回 429
+# - 排队中的任务可直接取消；运行中的任务在工作流的下一个节点边界处中止
+# - API Key 只保存在内存中，不落盘；进程重启后遗留的未完成任务会被标记为失败
+
+JOB_DB_PATH = os.environ.get(
+    "JOB_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite3")
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_QUEUE_DEPTH = int(os.environ.get("JOB_MAX_QUEUE_DEPTH", "200"))
+# 已结束任务的保留时长（秒），启动时清理
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, runner, db_path=JOB_DB_PATH, workers=JOB_WORKERS, max_depth=JOB_MAX_QUEUE_DEPTH):
+        """
+        runner(inputs, is_cancelled) -> 结果字典；被取消时返回 None。
+        inputs 为 {"ticker", "api_key", ...}，is_cancelled() 用于在节点之间检查是否已被取消。
+        """
+        self.runner = runner
+        self.db_path = db_path
+        self.workers = workers
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._secrets = {}  # job_id -> api_key，仅存内存
+        self._cancel_requested = set()
+        self._threads = []
+        self._conn = None
+
+    # ---------- 存储层 ----------
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    ticker TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    error TEXT,
+                    result TEXT
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+            # 上一个进程遗留的未完成任务：API Key 已随进程丢失，无法继续执行
+            now = std_time.time()
+            self._conn.execute(
+                "UPDATE jobs SET status=?, error=?, finished_at=? WHERE status IN (?, ?)",
+                (STATUS_FAILED, "服务重启，任务已中断，请重新提交", now, STATUS_QUEUED, STATUS_RUNNING)
+            )
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                FINISHED_STATUSES + (now - JOB_RETENTION_SECONDS,)
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _row_to_job(self, row):
+        job = {
+            "job_id": row["id"],
+            "ticker": row["ticker"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["error"]:
+            job["error"] = row["error"]
+        if row["result"]:
+            job["result"] = json.loads(row["result"])
+        if row["status"] == STATUS_QUEUED:
+            ahead = self._db().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status=? AND created_at < ?", (STATUS_QUEUED, row["created_at"])
+            ).fetchone()[0]
+            job["queue_position"] = ahead + 1
+        if row["id"] in self._cancel_requested:
+            job["cancel_requested"] = True
+        return job
+
+    # ---------- 对外接口 ----------
+    def submit(self, ticker, api_key, **params):
+        with self._lock:
+            db = self._db()
+            depth = db.execute("SELECT COUNT(*) FROM jobs WHERE status=?", (STATUS_QUEUED,)).fetchone()[0]
+            if depth >= self.max_depth:
+                raise QueueFullError(f"任务队列已满（{depth} 个任务排队中），请稍后重试")
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO jobs (id, ticker, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, ticker, json.dumps(params, ensure_ascii=False), STATUS_QUEUED, std_time.time())
+            )
+            db.commit()
+            self._secrets[job_id] = api_key
+            self._ensure_workers()
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+            return self._row_to_job(row) if row else None
+
+    def cancel(self, job_id):
+        """取消任务，返回取消后的任务状态；任务不存在返回 None"""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT status FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == STATUS_QUEUED:
+                db.execute(
+                    "UPDATE jobs SET status=?, finished_at=? WHERE id=?",
+                    (STATUS_CANCELLED, std_time.time(), job_id)
+                )
+                db.commit()
+                self._secrets.pop(job_id, None)
+            elif row["status"] == STATUS_RUNNING:
+                self._cancel_requested.add(job_id)
+        return self.get(job_id)
+
+    def depth(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM jobs WHERE status=?", (STATUS_QUEUED,)).fetchone()[0]
+
+    # ---------- 工作线程 ----------
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _claim_next(self):
+        """取出最早排队的任务并标记为运行中（调用方持有锁）"""
+        db = self._db()
+        row = db.execute(
+            "SELECT * FROM jobs WHERE status=? ORDER BY created_at LIMIT 1", (STATUS_QUEUED,)
+        ).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE jobs SET status=?, started_at=? WHERE id=?", (STATUS_RUNNING, std_time.time(), row["id"]))
+        db.commit()
+        return row
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "UPDATE jobs SET status=?, finished_at=?, result=?, error=? WHERE id=?",
+                (status, std_time.time(), json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, job_id)
+            )
+            db.commit()
+            self._secrets.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+
+    def _worker_loop(self):
+        while True:
+            with self._lock:
+                row = self._claim_next()
+                while row is None:
+                    self._wakeup.wait()
+                    row = self._claim_next()
+                api_key = self._secrets.get(row["id"])
+
+            job_id = row["id"]
+            if api_key is None:
+                self._finish(job_id, STATUS_FAILED, error="任务缺少 API Key，请重新提交")
+                continue
+
+            print(f"\n[任务队列] 开始执行任务 {job_id} ({row['ticker']})...")
+            inputs = dict(json.loads(row["params"]), ticker=row["ticker"], api_key=api_key)
+            try:
+                result = self.runner(inputs, lambda: job_id in self._cancel_requested)
+                if result is None:
+                    self._finish(job_id, STATUS_CANCELLED)
+                else:
+                    self._finish(job_id, STATUS_SUCCEEDED, result=result)
+            except Exception as e:
+                print(f"[任务队列] 任务 {job_id} 执行失败: {str(e)}")
+                self._finish(job_id, STATUS_FAILED, error=f"后端分析过程中发生错误：{str(e)}")
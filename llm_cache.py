@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time as std_time
+import llm_client
+from prompt_codec import prepare_prompt
+from telemetry import record_cache
+
+# ==========================================
+# 1. 大模型响应缓存 (按 模型 + 温度 + 完整提示词 内容寻址)
+# ==========================================
+# 输入数据与几分钟前完全相同时（比如同一份季度财报），提示词逐字节一致，直接复用上次的回答，
+# 省掉这一次调用的延迟和 Token 费用。
+# - 缓存持久化在本地 SQLite，进程重启后依然有效
+# - 各节点按数据更新频率设置不同的 TTL（基本面按季度变化，TTL 最长）
+# - 条目数超过上限时按最近访问时间淘汰
+# - 记录每个节点的命中 / 未命中次数
+
+LLM_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_cache.sqlite3")
+)
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+# 各节点的缓存时长（秒），未列出的节点使用 DEFAULT_NODE_TTL；设为 0 表示该节点不缓存
+NODE_TTL = {
+    "tech": 6 * 3600,
+    "fund": 7 * 24 * 3600,
+    "risk": 30 * 60,
+    "news_filter": 30 * 60,
+    "sentiment": 30 * 60,
+    "debate": 30 * 60,
+    "decision": 30 * 60,
+}
+DEFAULT_NODE_TTL = 30 * 60
+
+
+def make_cache_key(model, temperature, prompt):
+    raw = json.dumps([model, temperature, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, node_ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.node_ttl = dict(NODE_TTL if node_ttl is None else node_ttl)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {}  # node -> {"hits": n, "misses": n}
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    node TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def ttl_for(self, node):
+        return self.node_ttl.get(node, DEFAULT_NODE_TTL)
+
+    def _count(self, node, field):
+        self.stats.setdefault(node, {"hits": 0, "misses": 0})[field] += 1
+
+    def get(self, key, node):
+        now = std_time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT content, expires_at FROM llm_cache WHERE key=?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                self._count(node, "misses")
+                return None
+            db.execute("UPDATE llm_cache SET last_access=? WHERE key=?", (now, key))
+            db.commit()
+            self._count(node, "hits")
+            return row[0]
+
+    def put(self, key, node, content, ttl):
+        now = std_time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, node, content, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, node, content, now + ttl, now)
+            )
+            # 先清掉已过期的条目，仍超出上限时按最近访问时间淘汰
+            db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            overflow = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+            db.commit()
+
+    def snapshot(self):
+        with self._lock:
+            return {node: dict(s) for node, s in self.stats.items()}
+
+
+# 进程级共享的响应缓存
+llm_cache = LLMCache()
+
+
+def cached_invoke(llm, prompt, node):
+    """
+    带缓存的 llm.invoke（未命中时经过 llm_client 的全局限流）：命中时直接返回上次的回答文本，未命中时调用大模型并写入缓存。
+    返回值是回答文本（即 response.content）。提示词先经过编码层去缩进并记录 Token 数。
+    """
+    prompt = prepare_prompt(prompt, node)
+    ttl = llm_cache.ttl_for(node)
+    if ttl <= 0:
+        return llm_client.invoke(llm, prompt, node=node).content
+
+    key = make_cache_key(getattr(llm, "model_name", ""), getattr(llm, "temperature", None), prompt)
+    content = llm_cache.get(key, node)
+    if content is not None:
+        record_cache("llm", node, "hit")
+        print(f"   [LLM缓存] {node} 节点命中缓存，跳过大模型调用")
+        return content
+
+    record_cache("llm", node, "miss")
+    content = llm_client.invoke(llm, prompt, node=node).content
+    llm_cache.put(key, node, content, ttl)
+    return content
@@ -0,0 +1,227 @@
+import os
+import re
+import threading
+import time as std_time
+from collections import OrderedDict
+from telemetry import span, record_tokens
+
+# ==========================================
+# 1. 共享大模型客户端工厂
+# ==========================================
+# 所有智能体与图节点都从这里拿 ChatOpenAI 实例：按 (api_key, temperature) 复用同一个客户端，
+# 底层共享一个带连接池的 httpx.Client，不再每次调用都新建客户端、重新握手。
+# langchain_openai / openai / httpx 合计导入约 1 秒，推迟到第一次创建客户端时再导入，
+# 只用到限流、Token 估算的模块（新闻采集器、批量预取等）不必为此付出启动时间。
+
+LLM_MODEL = "deepseek-chat"
+LLM_BASE_URL = "https://api.deepseek.com"
+LLM_REQUEST_TIMEOUT = 120
+LLM_MAX_CONNECTIONS = 32
+# 客户端注册表上限（按 api_key 区分用户，超过后淘汰最久未使用的）
+LLM_REGISTRY_SIZE = 256
+
+# 大模型客户端类，首次使用时才导入 langchain_openai（基准测试的回放器会直接替换成假客户端）
+ChatOpenAI = None
+# 进程级共享的 HTTP 传输层：keep-alive 连接在所有客户端之间复用
+_http_client = None
+_registry = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def chat_model_class():
+    global ChatOpenAI
+    if ChatOpenAI is None:
+        from langchain_openai import ChatOpenAI
+    return ChatOpenAI
+
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+            timeout=LLM_REQUEST_TIMEOUT,
+        )
+    return _http_client
+
+
+def warm_up():
+    """提前导入客户端依赖并创建共享传输层（预启动的服务进程在 fork 前调用）"""
+    import openai  # noqa: F401
+    chat_model_class()
+    with _registry_lock:
+        _get_http_client()
+
+
+def reset_after_fork():
+    """fork 出的子进程不能沿用父进程的连接：丢弃共享传输层与客户端注册表，下次使用时重建"""
+    global _http_client
+    with _registry_lock:
+        _http_client = None
+        _registry.clear()
+
+
+def get_llm(api_key, temperature=0.3):
+    """按 (api_key, temperature) 返回共享的 ChatOpenAI 客户端"""
+    key = (api_key, temperature)
+    with _registry_lock:
+        llm = _registry.get(key)
+        if llm is None:
+            llm = chat_model_class()(
+                model=LLM_MODEL,
+                api_key=api_key,
+                base_url=LLM_BASE_URL,
+                temperature=temperature,
+                http_client=_get_http_client(),
+                # 429 与网络错误由下面的 invoke 统一退避重试，不在客户端内部各自重试
+                max_retries=0,
+            )
+            _registry[key] = llm
+            while len(_registry) > LLM_REGISTRY_SIZE:
+                _registry.popitem(last=False)
+        else:
+            _registry.move_to_end(key)
+        return llm
+
+
+# ==========================================
+# 2. 全局限流 (请求数 + Token 数双令牌桶，遇到 429 自适应降速)
+# ==========================================
+# 各线程、各并发请求共用同一组令牌桶，把突发请求削平成稳定的速率，
+# 避免集中触发服务商限流后又整体空等。收到 429 时按比例降低速率，之后成功调用逐步恢复。
+
+LLM_RPM = float(os.environ.get("LLM_RPM", "120"))
+LLM_TPM = float(os.environ.get("LLM_TPM", "300000"))
+# 预估单次回答的 Token 数，调用前与提示词一起预留额度，调用后按实际用量修正
+COMPLETION_TOKEN_ESTIMATE = 800
+MAX_RATE_LIMIT_RETRIES = 4
+_CJK_RE = re.compile(r'[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """粗略估算 Token 数：中文约 0.6 Token/字，其余字符约 4 字符/Token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) / 4) + 1
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = rate_per_minute
+        self.updated = std_time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.base_rpm = rpm
+        self.base_tpm = tpm
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.scale = 1.0  # 自适应速率系数，429 时下降，成功时缓慢恢复
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled_seconds": 0.0, "rate_limited": 0}
+
+    def acquire(self, token_estimate):
+        while True:
+            with self._lock:
+                now = std_time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(token_estimate, now))
+                if wait <= 0:
+                    self.requests.tokens -= 1
+                    self.tokens.tokens -= token_estimate
+                    self.stats["requests"] += 1
+                    return
+                self.stats["throttled_seconds"] += wait
+            std_time.sleep(wait)
+
+    def settle(self, reserved, actual):
+        """调用结束后按实际 Token 用量修正令牌桶"""
+        if actual:
+            with self._lock:
+                self.tokens.tokens -= actual - reserved
+
+    def _apply_scale(self):
+        self.requests.rate = self.base_rpm * self.scale / 60.0
+        self.tokens.rate = self.base_tpm * self.scale / 60.0
+
+    def on_rate_limited(self):
+        with self._lock:
+            self.scale = max(self.scale * 0.5, 0.1)
+            self.stats["rate_limited"] += 1
+            self._apply_scale()
+
+    def on_success(self):
+        with self._lock:
+            if self.scale < 1.0:
+                self.scale = min(self.scale + 0.05, 1.0)
+                self._apply_scale()
+
+
+rate_limiter = RateLimiter()
+
+
+def _retry_after(error, attempt):
+    """优先使用服务端 Retry-After，否则指数退避"""
+    try:
+        value = float(error.response.headers.get("retry-after"))
+        if value > 0:
+            return value
+    except Exception:
+        pass
+    return min(2 ** attempt, 30)
+
+
+def invoke(llm, prompt, node="llm"):
+    """
+    经过全局限流的 llm.invoke：遇到 429 自动降速并退避重试，网络错误与 5xx 退避重试。
+    node 用于按节点统计耗时与 Token（限流等待与重试退避都计入耗时）
+    """
+    import openai
+
+    reserved = estimate_tokens(prompt) + COMPLETION_TOKEN_ESTIMATE
+    with span("llm", node) as sp:
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            rate_limiter.acquire(reserved)
+            try:
+                response = llm.invoke(prompt)
+            except openai.RateLimitError as e:
+                rate_limiter.on_rate_limited()
+                sp.set(retries=attempt + 1)
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = _retry_after(e, attempt)
+                print(f"   [LLM限流] 触发服务商限流(429)，{delay:.1f}s 后重试，全局速率降至 {rate_limiter.scale:.0%}")
+                std_time.sleep(delay)
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                # 网络抖动与服务端 5xx：不降速，只做指数退避重试
+                sp.set(retries=attempt + 1)
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = min(2 ** attempt, 30)
+                print(f"   [LLM重试] 调用失败({type(e).__name__})，{delay:.1f}s 后重试")
+                std_time.sleep(delay)
+                continue
+            usage = getattr(response, "usage_metadata", None) or {}
+            rate_limiter.settle(reserved, usage.get("total_tokens"))
+            rate_limiter.on_success()
+            # 服务商未返回用量时按字符数估算
+            record_tokens(
+                node,
+                usage.get("input_tokens") or estimate_tokens(prompt),
+                usage.get("output_tokens") or estimate_tokens(getattr(response, "content", "") or ""),
+            )
+            return response
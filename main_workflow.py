@@ -1,12 +1,39 @@
 import os
+import uuid
+import threading
+import time as std_time
 import concurrent.futures
 from typing import TypedDict
-from langchain_openai import ChatOpenAI
+from llm_client import get_llm, estimate_tokens
+from llm_cache import cached_invoke
 from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_stream_writer
 from fund_agent import run_fund_agent
 from tech_agent import run_tech_agent
 from sentiment_agent import run_sentiment_agent
 from risk_agent import run_risk_agent
+from telemetry import traced, submit_in_context
+from signals import parse_verdict, parse_verdicts, consensus, parse_new_objections, STANCE_NAMES, BEARISH
+
+# 辩论上下文的 Token 预算：滚动摘要 + 最新一轮原文超过该值时，才调用大模型压缩摘要
+DEBATE_TOKEN_BUDGET = int(os.environ.get("DEBATE_TOKEN_BUDGET", "1500"))
+# 辩论轮数上限（上下文有界后，可以放心调高）；单次请求可通过 max_debate_rounds 覆盖
+MAX_DEBATE_ROUNDS = int(os.environ.get("MAX_DEBATE_ROUNDS", "3"))
+# 辩论结束原因
+STOP_CONSENSUS = "consensus"
+STOP_NO_NEW_OBJECTIONS = "no_new_objections"
+STOP_ROUND_LIMIT = "round_limit"
+# 每轮辩论发言末尾要求模型自报的新增质疑数，用于判断辩论是否已经收敛
+NEW_OBJECTIONS_INSTRUCTION = "最后单独一行输出：【新增质疑】N（N 为本轮提出的、此前辩论中未出现过的新质疑或新论据数量，没有则为 0）"
+
+# 情绪组（八路爬虫 + 定向搜索 + 两次大模型调用）最慢，放到后台线程里投机执行，
+# 辩论先基于技术/基本面/风控三份报告开始，第一轮结束后再并入情绪面报告。
+_sentiment_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="sentiment")
+_pending_sentiment = {}  # job_id -> (提交时间, Future, 取消事件)
+_pending_lock = threading.Lock()
+# 因取消等原因未被取回的后台情绪任务，超过该秒数后清理
+PENDING_SENTIMENT_TTL = 30 * 60
+SENTIMENT_PLACEHOLDER = "（情绪组仍在抓取全网资讯，报告将在后续轮次补充）"
 
 
 # ==========================================
@@ -21,6 +48,9 @@ class TraderState(TypedDict):
     news_data: str
     risk_data: str
     news_links: list
+    sentiment_job: str
+    sentiment_late: bool
+    risk_veto: bool
     tech_signal: str
     fund_signal: str
     sentiment_signal: str
@@ -29,53 +59,144 @@ class TraderState(TypedDict):
     # --- 【新增】多轮辩论状态 ---
     debate_history: str
     debate_round: int
+    # --- 有界辩论上下文：滚动摘要 + 最新一轮原文（完整 debate_history 只用于前端展示） ---
+    debate_summary: str
+    debate_latest: str
+    debate_pending: str
+    debate_token_budget: int
+    # --- 自适应辩论路由 ---
+    max_debate_rounds: int
+    debate_new_objections: int
+    debate_stop_reason: str
 
     # --- 最终决策 ---
     final_decision: str
-def gather_node(state: TraderState):
-    """【并行节点】利用多线程同时唤醒 4 个部门，大幅提升速度"""
-    print(f"\n[调度中心] 正在并行唤醒四大部门对 {state['ticker']} 进行分析...")
-
-    # 使用线程池并发执行 4 个任务
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-        f_tech = executor.submit(run_tech_agent, state['ticker'], state['api_key'])
-        f_fund = executor.submit(run_fund_agent, state['ticker'], state['api_key'])
-        f_sent = executor.submit(run_sentiment_agent, state['ticker'], state['api_key'])
-        f_risk = executor.submit(run_risk_agent, state['ticker'], state['api_key'])
-
-        # 等待所有线程完成并获取结果
-        res_tech = f_tech.result()
-        res_fund = f_fund.result()
-        res_sent = f_sent.result()
-        res_risk = f_risk.result()
-
-    # 统一合并到状态中
+def emit_event(event: str, data: dict):
+    """向流式接口推送一条进度事件；普通 invoke 调用时 writer 为空操作"""
+    get_stream_writer()({"event": event, "data": data})
+def tech_node(state: TraderState):
+    """【技术组节点】"""
+    res = run_tech_agent(state['ticker'], state['api_key'])
+    emit_event("agent", {"agent": "technical", "signal": res.get("tech_signal", "")})
+    emit_event("chart_data", {"chart_data": res.get("chart_data", [])})
+    return {
+        "technical_data": res.get("technical_data", ""),
+        "tech_signal": res.get("tech_signal", ""),
+        "chart_data": res.get("chart_data", []),
+    }
+def fund_node(state: TraderState):
+    """【基本面组节点】"""
+    res = run_fund_agent(state['ticker'], state['api_key'])
+    emit_event("agent", {"agent": "fundamental", "signal": res.get("fund_signal", "")})
+    return {"fundamental_data": res.get("fundamental_data", ""), "fund_signal": res.get("fund_signal", "")}
+def risk_node(state: TraderState):
+    """【风控组节点】"""
+    res = run_risk_agent(state['ticker'], state['api_key'])
+    emit_event("agent", {"agent": "risk", "signal": res.get("risk_signal", "")})
+    return {"risk_data": res.get("risk_data", ""), "risk_signal": res.get("risk_signal", "")}
+def _cancel_entry(entry):
+    """
+    Future 已经开始运行时 cancel() 不起作用，
+    所以同时置位取消事件，让情绪组在下一个阶段边界处停止，不再继续抓取、不再调用大模型
+    """
+    entry[2].set()
+    entry[1].cancel()
+
+
+def cancel_sentiment(job_id):
+    """中止一个尚未取回的后台情绪任务（风控否决、任务被取消时调用）"""
+    with _pending_lock:
+        entry = _pending_sentiment.pop(job_id or "", None)
+    if entry is not None:
+        _cancel_entry(entry)
+def launch_sentiment_node(state: TraderState):
+    """【情绪组节点】只负责把情绪分析提交到后台线程，立即返回，不阻塞其他三个部门和后续辩论"""
+    print(f"\n[调度中心] 情绪组已转入后台执行，{state['ticker']} 的辩论将优先基于其余三个部门的报告启动...")
+    job_id = uuid.uuid4().hex
+    now = std_time.time()
+    with _pending_lock:
+        for stale_id in [k for k, (t, *_) in _pending_sentiment.items() if now - t > PENDING_SENTIMENT_TTL]:
+            _cancel_entry(_pending_sentiment.pop(stale_id))
+        # 带上当前上下文提交，后台情绪任务的爬虫 / 大模型 span 仍归入本次分析的链路
+        cancel_event = threading.Event()
+        future = submit_in_context(
+            _sentiment_executor, traced("node", "sentiment_agent")(run_sentiment_agent),
+            state['ticker'], state['api_key'], cancel_event
+        )
+        _pending_sentiment[job_id] = (now, future, cancel_event)
+    return {"sentiment_job": job_id}
+def _take_sentiment(job_id, wait):
+    """取回后台情绪任务的结果；wait=False 且尚未完成时返回 None"""
+    with _pending_lock:
+        entry = _pending_sentiment.get(job_id)
+        if entry is None:
+            return None
+        if not wait and not entry[1].done():
+            return None
+        _pending_sentiment.pop(job_id)
+    try:
+        res = entry[1].result()
+    except Exception as e:
+        print(f"[情绪组] 情绪分析失败: {str(e)}")
+        res = {"sentiment_signal": f"情绪面分析失败：{str(e)}"}
+    emit_event("agent", {"agent": "sentiment", "signal": res.get("sentiment_signal", "")})
+    emit_event("news_links", {"news_links": res.get("news_links", [])})
     return {
-        "technical_data": res_tech.get("technical_data", ""),
-        "tech_signal": res_tech.get("tech_signal", ""),
-        "chart_data": res_tech.get("chart_data", []),
-        "fundamental_data": res_fund.get("fundamental_data", ""),
-        "fund_signal": res_fund.get("fund_signal", ""),
-        "news_data": res_sent.get("news_data", ""),
-        "news_links": res_sent.get("news_links", []),
-        "sentiment_signal": res_sent.get("sentiment_signal", ""),
-        "risk_data": res_risk.get("risk_data", ""),
-        "risk_signal": res_risk.get("risk_signal", ""),
+        "news_data": res.get("news_data", ""),
+        "news_links": res.get("news_links", []),
+        "sentiment_signal": res.get("sentiment_signal", ""),
+    }
+def cro_gate_node(state: TraderState):
+    """
+    【CRO 闸门】技术/基本面/风控三部门到齐后执行：
+    风控红灯直接一票否决，跳过情绪组和整场辩论；否则初始化辩论状态，情绪组若恰好已完成则一并并入。
+    """
+    update = {
         "debate_history": "",  # 初始化辩论历史
-        "debate_round": 0  # 初始化辩论轮次
+        "debate_round": 0,  # 初始化辩论轮次
+        "debate_summary": "",
+        "debate_latest": "",
+        "debate_pending": "",
+        "sentiment_late": False,
     }
+    if parse_verdict("risk", state.get("risk_signal", "")) == BEARISH:
+        print(f"\n[调度中心] 风控红灯否决 {state['ticker']}，跳过情绪面与辩论，直接提交 CIO...")
+        cancel_sentiment(state.get("sentiment_job"))
+        update.update({"risk_veto": True, "sentiment_signal": "风控一票否决，未等待情绪面分析", "news_links": []})
+        return update
+
+    sentiment = _take_sentiment(state.get("sentiment_job", ""), wait=False)
+    if sentiment is not None:
+        update.update(sentiment)
+    else:
+        update["sentiment_signal"] = SENTIMENT_PLACEHOLDER
+    update["risk_veto"] = False
+    return update
+def route_after_cro(state: TraderState):
+    """【路由守卫】风控红灯直通 CIO，否则进入辩论"""
+    return "veto" if state.get("risk_veto") else "debate"
+def join_sentiment_node(state: TraderState):
+    """【汇合节点】第一轮辩论结束后等待后台情绪任务完成，并入状态供后续轮次与 CIO 使用"""
+    if state.get("sentiment_signal") != SENTIMENT_PLACEHOLDER:
+        return {}
+    print("\n[调度中心] 正在等待情绪组报告并入辩论...")
+    sentiment = _take_sentiment(state.get("sentiment_job", ""), wait=True)
+    if sentiment is None:
+        sentiment = {"sentiment_signal": "情绪面分析失败"}
+    return dict(sentiment, sentiment_late=True)
 def debate_node(state: TraderState):
     """【辩论节点】负责针对各部门报告进行交叉质询"""
     round_count = state.get("debate_round", 0)
     history = state.get("debate_history", "")
+    summary = state.get("debate_summary", "")
+    latest = state.get("debate_latest", "")
+    # 情绪组报告在上一轮之后才到达时，本轮把它作为新材料补充给与会者
+    late_sentiment = ""
+    if state.get("sentiment_late"):
+        late_sentiment = f"【情绪面（补充报告，上一轮辩论时尚未到达）】{state.get('sentiment_signal', '')}"
     print(f"\n[会议室] 正在进行第 {round_count + 1} 轮多空激辩...")
 
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        api_key=state['api_key'],
-        base_url="https://api.deepseek.com",
-        temperature=0.6  # 稍微调高温度，让辩论思维更发散和敏锐
-    )
+    llm = get_llm(state['api_key'], temperature=0.6)  # 稍微调高温度，让辩论思维更发散和敏锐
 
     if round_count == 0:
         prompt = f"""
@@ -90,12 +211,17 @@ def debate_node(state: TraderState):
                 作为客观且极具批判精神的“魔鬼代言人”，请找出这四份报告中逻辑冲突或过于乐观的地方。
                 请基于数据、历史规律或宏观常识提出尖锐的质疑，开启第一轮辩论。
                 注意：不要给出最终结论，你的目标是“寻找数据漏洞”和“揭示潜在尾部风险”。
+                {NEW_OBJECTIONS_INSTRUCTION}
                 """
     else:
         prompt = f"""
                 针对标的：{state['ticker']} 的投研辩论正在进行。
-                以下是之前的辩论记录：
-                {history}
+                以下是更早轮次的辩论要点摘要：
+                {summary or '（暂无）'}
+
+                以下是上一轮辩论原文：
+                {latest}
+                {late_sentiment}
 
                 【任务】：
                 请针对上一轮的疑点，进行第 {round_count + 1} 轮的反驳。
@@ -103,40 +229,107 @@ def debate_node(state: TraderState):
                 1. 必须使用科学理性的视角，避免情绪化的主观臆断。
                 2. 探讨胜率（Probability of Success）与赔率（Risk-Reward Ratio）。
                 3. 模拟不同流派（如价值投资 vs 趋势跟踪）的严谨交锋。
+                {NEW_OBJECTIONS_INSTRUCTION}
                 """
 
-    response = llm.invoke(prompt)
-    new_text = f"\n\n=== 第 {round_count + 1} 轮辩论 ===\n" + response.content
+    response_text = cached_invoke(llm, prompt, node="debate")
+    new_text = f"\n\n=== 第 {round_count + 1} 轮辩论 ===\n" + response_text
+    emit_event("debate", {"round": round_count + 1, "text": response_text})
 
     return {
         "debate_history": history + new_text,
-        "debate_round": round_count + 1
+        "debate_round": round_count + 1,
+        "debate_latest": new_text,
+        # 上一轮原文交给压缩节点并入滚动摘要
+        "debate_pending": latest,
+        "debate_new_objections": parse_new_objections(response_text),
+        "sentiment_late": False
     }
+def compact_debate_node(state: TraderState):
+    """
+    【压缩节点】把上一轮原文并入滚动摘要，只保留最新一轮原文，
+    保证后续每轮辩论和 CIO 决策的提示词长度有上限，而不是随轮数平方增长。
+    """
+    pending = state.get("debate_pending", "")
+    if not pending:
+        return {}
+    latest = state.get("debate_latest", "")
+    budget = state.get("debate_token_budget") or DEBATE_TOKEN_BUDGET
+    candidate = (state.get("debate_summary", "") + pending).strip()
+
+    # 摘要 + 最新一轮仍在预算内：原文直接保留，不额外调用大模型
+    summary_budget = budget - estimate_tokens(state.get("debate_latest", ""))
+    if estimate_tokens(candidate) <= summary_budget:
+        return {"debate_summary": candidate, "debate_pending": ""}
+
+    print(f"\n[会议室] 辩论上下文超出 {budget} Token 预算，正在压缩历史要点...")
+    llm = get_llm(state['api_key'], temperature=0.1)
+    prompt = f"""
+    你是投研会议的记录员。以下是关于 {state['ticker']} 的辩论记录（含已有摘要）：
+    {candidate}
+
+    【任务】：把它压缩成结构化要点，保留关键数据、论据和结论性分歧，删除重复与修辞。
+    总长度控制在约 {max(summary_budget, 200)} 个 Token 以内。
+
+    【输出格式】：
+    【核心质疑】- 每条一行
+    【反驳与回应】- 每条一行，注明回应的是哪条质疑
+    【未决分歧】- 每条一行
+    """
+    return {"debate_summary": cached_invoke(llm, prompt, node="debate_compact"), "debate_pending": ""}
+def moderate_debate_node(state: TraderState):
+    """
+    【主持人节点】每轮结束后判断辩论是否已经收敛，并记录结束原因：
+    1. 四个部门结论一致（至少进行一轮“魔鬼代言人”质询后）
+    2. 本轮没有提出任何新质疑
+    3. 达到本次请求的轮数上限
+    """
+    round_count = state.get("debate_round", 0)
+    max_rounds = state.get("max_debate_rounds") or MAX_DEBATE_ROUNDS
+    stance = consensus(parse_verdicts(state))
+    new_objections = state.get("debate_new_objections")
+
+    if stance is not None:
+        reason, detail = STOP_CONSENSUS, f"四部门结论一致（{STANCE_NAMES[stance]}）"
+    elif round_count >= 2 and new_objections == 0:
+        reason, detail = STOP_NO_NEW_OBJECTIONS, "本轮没有提出新的质疑"
+    elif round_count >= max_rounds:
+        reason, detail = STOP_ROUND_LIMIT, f"已达到 {max_rounds} 轮上限"
+    else:
+        return {"debate_stop_reason": ""}
+
+    print(f"\n[会议室] 第 {round_count} 轮后结束辩论：{detail}")
+    emit_event("debate_end", {"rounds": round_count, "reason": reason, "detail": detail})
+    return {"debate_stop_reason": reason}
 def should_continue_debate(state: TraderState):
     """【路由守卫】决定是否继续辩论"""
-    # 设定我们只进行 2 轮激辩，防止死循环和过度消耗 Token
-    if state.get("debate_round", 0) < 3:
-        return "continue_debate"
-    else:
+    if state.get("debate_stop_reason"):
         return "make_decision"
+    else:
+        return "continue_debate"
 def decision_node(state: TraderState):
     """【决策节点】CIO 综合所有报告和辩论历史拍板"""
     print("\n[投资委员会] 辩论结束，CIO 正在撰写最终决议...")
+    # 兜底：确保后台情绪任务不会遗留在登记表中，也不会在决议之后继续运行
+    cancel_sentiment(state.get("sentiment_job"))
 
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        api_key=state['api_key'],
-        base_url="https://api.deepseek.com",
-        temperature=0.3
-    )
+    llm = get_llm(state['api_key'], temperature=0.3)
+    extra_reports = ""
+    if state.get("risk_veto"):
+        extra_reports = "【注意】风控官已给出红灯否决，本次未召开辩论会。"
+    elif state.get("sentiment_late"):
+        # 情绪组报告在最后一轮辩论之后才到达，直接呈交 CIO
+        extra_reports = f"【情绪面报告（辩论结束后到达）】：\n    {state.get('sentiment_signal', '')}"
     prompt = f"""
     你是对冲基金的首席投资官(CIO)。现在你要为 {state['ticker']} 做出最终决策。
 
     【核心风控红线】（具有最高优先级）：
     {state.get('risk_signal', '暂无')}
 
-    【前置多轮辩论记录】：
-    {state.get('debate_history', '暂无辩论记录')}
+    【前置多轮辩论记录】（更早轮次为要点摘要，最后一轮为原文）：
+    {state.get('debate_summary', '')}
+    {state.get('debate_latest', '') or '暂无辩论记录'}
+    {extra_reports}
 
     【核心决策原则】：
     1. 风险第一：如果风控报告提示明确的系统性或个体尾部风险，严格执行一票否决。
@@ -150,26 +343,52 @@ def decision_node(state: TraderState):
     # 🛡️ 严格执行计划：(必须包含具体的入场区间、止盈目标位和硬性止损价)
     """
 
-    response = llm.invoke(prompt)
-    return {"final_decision": response.content}
+    response_text = cached_invoke(llm, prompt, node="decision")
+    emit_event("decision", {"decision": response_text})
+    return {"final_decision": response_text}
 workflow = StateGraph(TraderState)
 
-# 1. 添加节点
-workflow.add_node("gather_agents", gather_node)
-workflow.add_node("debate_room", debate_node)
-workflow.add_node("decision_maker", decision_node)
+# 1. 添加节点（每个节点包一层 span，记录耗时并写入本次分析的链路追踪）
+for node_name, node_func in [
+    ("tech_agent", tech_node),
+    ("fund_agent", fund_node),
+    ("risk_agent", risk_node),
+    ("launch_sentiment", launch_sentiment_node),
+    ("cro_gate", cro_gate_node),
+    ("debate_room", debate_node),
+    ("compact_debate", compact_debate_node),
+    ("join_sentiment", join_sentiment_node),
+    ("debate_moderator", moderate_debate_node),
+    ("decision_maker", decision_node),
+]:
+    workflow.add_node(node_name, traced("node", node_name)(node_func))
 
 # 2. 定义边 (Edges)
-workflow.add_edge(START, "gather_agents")  # 起点先让四大部门并行干活
-workflow.add_edge("gather_agents", "debate_room")  # 干完活进入会议室辩论
+# 起点让四个部门并行启动；情绪组转入后台，不拖慢其余三个部门的汇合
+for agent_node in ["tech_agent", "fund_agent", "risk_agent", "launch_sentiment"]:
+    workflow.add_edge(START, agent_node)
+workflow.add_edge(["tech_agent", "fund_agent", "risk_agent", "launch_sentiment"], "cro_gate")
+
+# 风控红灯一票否决直通 CIO，否则进入会议室辩论
+workflow.add_conditional_edges(
+    "cro_gate",
+    route_after_cro,
+    {
+        "veto": "decision_maker",
+        "debate": "debate_room"
+    }
+)
+workflow.add_edge("debate_room", "compact_debate")  # 每轮结束后压缩辩论上下文
+workflow.add_edge("compact_debate", "join_sentiment")  # 第一轮结束后并入情绪组报告
+workflow.add_edge("join_sentiment", "debate_moderator")  # 主持人判断辩论是否收敛
 
 # 3. 定义条件边 (循环辩论核心)
 workflow.add_conditional_edges(
-    "debate_room",
+    "debate_moderator",
     should_continue_debate,
     {
         "continue_debate": "debate_room",  # 条件满足，继续绕回辩论室
-        "make_decision": "decision_maker"  # 条件不满足（满2轮），交给 CIO 决策
+        "make_decision": "decision_maker"  # 已收敛或达到轮数上限，交给 CIO 决策
     }
 )
 
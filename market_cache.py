@@ -0,0 +1,130 @@
+import threading
+import time as std_time
+from collections import OrderedDict
+from telemetry import record_cache
+
+# ==========================================
+# 1. 跨请求共享的市场数据缓存
+# ==========================================
+# 大盘指数 K 线、宏观快讯等数据与具体标的无关，N 个并发分析只需要拉取一次。
+# - 按数据源设置 TTL，过期后下一次访问重新加载
+# - single-flight：同一个 key 同时只有一个线程真正去加载，其余线程等待并共享结果
+# - LRU：超过容量上限时淘汰最久未使用的条目
+
+# 各数据源的缓存时长（秒），未列出的数据源使用 DEFAULT_TTL
+SOURCE_TTL = {
+    "index_bars": 10 * 60,
+    "sina": 60,
+    "eastmoney": 120,
+    "10jqka": 60,
+    "sina_roll": 120,
+    "100ppi": 300,
+    "mysteel": 120,
+    "wscn": 60,
+    # 个股定向搜索命中的文章正文，发布后基本不变
+    "article": 6 * 3600,
+}
+DEFAULT_TTL = 60
+MAX_ENTRIES = 512
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, max_entries=MAX_ENTRIES, source_ttl=None, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.source_ttl = dict(source_ttl or {})
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (过期时间, 值)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0}
+
+    def ttl_for(self, source):
+        return self.source_ttl.get(source, self.default_ttl)
+
+    def get_or_load(self, key, loader, ttl, cache_empty=False):
+        """
+        命中且未过期直接返回；否则由第一个到达的线程执行 loader()，其余线程等待同一结果。
+        loader 返回空结果（如爬虫失败返回 []）时默认不写入缓存，避免一次失败屏蔽整个 TTL 周期。
+        """
+        # cached() 生成的 key 第一项是数据源名，按数据源统计命中情况
+        source = key[0] if isinstance(key, tuple) and key else "default"
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > std_time.monotonic():
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                record_cache("market", source, "hit")
+                return item[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                self.stats["misses"] += 1
+            else:
+                self.stats["shared"] += 1
+        record_cache("market", source, "miss" if leader else "shared")
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+            flight.value = value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and (cache_empty or _non_empty(flight.value)):
+                    self._data[key] = (std_time.monotonic() + ttl, flight.value)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.max_entries:
+                        self._data.popitem(last=False)
+                        self.stats["evictions"] += 1
+            flight.event.set()
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+def _non_empty(value):
+    if value is None:
+        return False
+    empty = getattr(value, "empty", None)  # pandas DataFrame
+    if isinstance(empty, bool):
+        return not empty
+    try:
+        return len(value) > 0
+    except TypeError:
+        return True
+
+
+# 进程级共享缓存实例
+market_cache = TTLCache(source_ttl=SOURCE_TTL)
+
+
+def cached(source, loader, *args, ttl=None, **kwargs):
+    """
+    以 (source, 参数) 为 key 调用 loader(*args, **kwargs) 并缓存结果。
+    注意：返回的是共享对象，调用方不要原地修改（需要修改时先 copy）。
+    """
+    key = (source, args, tuple(sorted(kwargs.items())))
+    ttl = market_cache.ttl_for(source) if ttl is None else ttl
+    return market_cache.get_or_load(key, lambda: loader(*args, **kwargs), ttl)
@@ -0,0 +1,128 @@
+import re
+import numpy as np
+
+# ==========================================
+# 1. 新闻近似去重 (MinHash + LSH 分桶 + 并查集聚类)
+# ==========================================
+# 同一条通稿会被新浪、同花顺、华尔街见闻各推一遍，标题只差几个字，按标题精确去重拦不住。
+# 做法：标题归一化后切成字符 2-gram，计算 MinHash 签名并按段做 LSH 分桶，
+# 只有落在同一桶里的条目才计算真实的 Jaccard 相似度，整体对合并后的快讯流是线性时间。
+# （快讯标题很短，SimHash 的海明距离在这种长度上区分度不够，所以用 MinHash 估计 Jaccard。）
+# 相似的条目用并查集合并成簇并保留每个来源的出处，
+# 簇按“报道来源数”和“最新时间”排序——被多家同时报道的消息排在前面。
+
+SHINGLE_SIZE = 2
+JACCARD_THRESHOLD = 0.55
+# 签名长度 = 分段数 × 每段行数；Jaccard = 0.55 的两条新闻成为候选的概率约 99.7%
+LSH_BANDS = 16
+LSH_ROWS = 2
+NUM_PERM = LSH_BANDS * LSH_ROWS
+# 标题过短（如只有“快讯”二字）时改用摘要开头参与比较
+MIN_TITLE_CHARS = 8
+INTRO_CHARS = 60
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.int64)
+_PERM_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.int64)
+_NOISE_RE = re.compile(r'<[^>]+>|【[^】]{0,8}】|[\s\W_]+', re.U)
+
+
+def normalize(text):
+    """去掉 HTML 标签、短的栏目前缀（如【宏观大势】【快讯】）、空白与标点，英文转小写"""
+    return _NOISE_RE.sub('', text or '').lower()
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(grams):
+    """MinHash 签名（字符串哈希在同一进程内稳定，只用于进程内比较）"""
+    if not grams:
+        return np.full(NUM_PERM, _PRIME, dtype=np.int64)
+    h = np.fromiter((hash(g) & _PRIME for g in grams), dtype=np.int64, count=len(grams))
+    return ((h[:, None] * _PERM_A + _PERM_B) % _PRIME).min(axis=0)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 以较早出现的条目为根，保证簇的输出顺序稳定
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _signature_text(item, title_key, intro_key):
+    title = normalize(item.get(title_key, ""))
+    if len(title) >= MIN_TITLE_CHARS:
+        return title
+    return title + normalize(item.get(intro_key, ""))[:INTRO_CHARS]
+
+
+def cluster_news(items, title_key="title", intro_key="intro", source_key="source", time_key="time_ts"):
+    """
+    把近似重复的新闻聚成簇，返回按（来源数 降序, 最新时间 降序, 首次出现顺序）排序的簇列表：
+    [{"item": 代表条目, "members": [条目, ...], "sources": [来源, ...], "time_ts": 簇内最新时间}, ...]
+    代表条目取簇内摘要信息量最大的一条。
+    """
+    n = len(items)
+    if n == 0:
+        return []
+    grams = [shingles(_signature_text(it, title_key, intro_key)) for it in items]
+    signatures = np.vstack([minhash(g) for g in grams])
+
+    uf = _UnionFind(n)
+    checked = set()
+    for band in range(LSH_BANDS):
+        buckets = {}
+        rows = signatures[:, band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        for i in range(n):
+            if grams[i]:
+                buckets.setdefault(rows[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            for pos, a in enumerate(members):
+                for b in members[pos + 1:]:
+                    if (a, b) in checked:
+                        continue
+                    checked.add((a, b))
+                    if jaccard(grams[a], grams[b]) >= JACCARD_THRESHOLD:
+                        uf.union(a, b)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(uf.find(i), []).append(i)
+
+    clusters = []
+    for root, idx in groups.items():
+        members = [items[i] for i in idx]
+        sources = list(dict.fromkeys(m.get(source_key) or "网络" for m in members))
+        times = [m.get(time_key) for m in members if isinstance(m.get(time_key), (int, float))]
+        rep = max(members, key=lambda m: len(m.get(intro_key, "") or ""))
+        clusters.append({
+            "item": rep,
+            "members": members,
+            "sources": sources,
+            "time_ts": max(times) if times else 0,
+            "_order": root,
+        })
+    clusters.sort(key=lambda c: (-len(c["sources"]), -c["time_ts"], c["_order"]))
+    for c in clusters:
+        del c["_order"]
+    return clusters
@@ -0,0 +1,76 @@
+import os
+import argparse
+import threading
+import time as std_time
+from crawler_pool import fan_out
+from news_store import news_store
+from sentiment_agent import MACRO_SOURCES, MACRO_CRAWL_BUDGET, MACRO_DEADLINES
+
+# ==========================================
+# 1. 后台快讯采集器
+# ==========================================
+# 按固定间隔并发轮询八个宏观快讯数据源（复用 sentiment_agent 里的 fetch_list_* 解析器），
+# 标准化后写入本地新闻库，并记录每个数据源最近一次成功采集的时间。
+# 情绪组在库里数据足够新时直接查库，不再在用户请求里等待爬虫。
+# 运行方式：
+#   python news_ingestor.py                 # 常驻进程，默认每 60 秒一轮
+#   python news_ingestor.py --once          # 只采集一轮（适合挂到 cron）
+#   NEWS_INGESTOR=1 python app.py           # 随 API 服务在后台线程里运行
+
+INGEST_INTERVAL = int(os.environ.get("NEWS_INGEST_INTERVAL", "60"))
+
+_background_thread = None
+_background_lock = threading.Lock()
+
+
+def ingest_once():
+    """采集一轮，返回 {数据源: 新写入条数}；超时或返回为空的数据源记为失败"""
+    start = std_time.monotonic()
+    tasks = [(name, func, args) for name, _, func, args in MACRO_SOURCES]
+    results = fan_out(tasks, budget=MACRO_CRAWL_BUDGET, deadlines=MACRO_DEADLINES)
+    added = {}
+    for name, _, _, _ in MACRO_SOURCES:
+        items = results.get(name)
+        if not items:
+            news_store.record_feed(name, error="超时" if items is None else "返回为空")
+            continue
+        added[name] = news_store.add_items(items)
+        news_store.record_feed(name, count=len(items))
+    print(f"[新闻采集] 本轮 {len(added)}/{len(MACRO_SOURCES)} 个数据源成功，"
+          f"新增 {sum(added.values())} 条，耗时 {std_time.monotonic() - start:.1f}s")
+    return added
+
+
+def run_forever(interval=INGEST_INTERVAL, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        started = std_time.monotonic()
+        try:
+            ingest_once()
+        except Exception as e:
+            print(f"[新闻采集] ⚠️ 本轮采集异常: {e}")
+        stop_event.wait(max(interval - (std_time.monotonic() - started), 1))
+
+
+def start_background_ingestor(interval=INGEST_INTERVAL):
+    """在当前进程里启动后台采集线程（重复调用只启动一次）"""
+    global _background_thread
+    with _background_lock:
+        if _background_thread is None or not _background_thread.is_alive():
+            _background_thread = threading.Thread(
+                target=run_forever, args=(interval,), daemon=True, name="news-ingestor"
+            )
+            _background_thread.start()
+            print(f"[新闻采集] 后台采集线程已启动，间隔 {interval}s")
+    return _background_thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="宏观快讯后台采集器")
+    parser.add_argument("--once", action="store_true", help="只采集一轮后退出")
+    parser.add_argument("--interval", type=int, default=INGEST_INTERVAL, help="轮询间隔（秒）")
+    args = parser.parse_args()
+    if args.once:
+        ingest_once()
+    else:
+        run_forever(args.interval)
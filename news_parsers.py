@@ -0,0 +1,193 @@
+import re
+import bisect
+import hashlib
+import threading
+import functools
+import time as std_time
+from datetime import datetime
+from http_pool import conditional_get
+
+# ==========================================
+# 1. 快讯页面解析器注册表
+# ==========================================
+# 各 HTML 数据源的正则在模块加载时一次性编译，解析函数按数据源名注册。
+# fetch_parsed 统一负责：条件请求（页面未变化时服务端返回 304，不重新下载）、
+# 按响应体摘要缓存解析结果（页面内容没变就不重新解析），以及按数据源规则解码。
+
+TAG_RE = re.compile(r'<[^>]+>')
+PARAGRAPH_RE = re.compile(r'<p.*?>(.*?)</p>', re.S)
+EASTMONEY_ITEM_RE = re.compile(
+    r'<p class="title"[^>]*>.*?<a\s+[^>]*href="(https?://finance\.eastmoney\.com/a/[^"]+)"[^>]*>(.*?)</a>'
+    r'.*?<p class="time">\s*(\d{1,2}月\d{1,2}日\s+\d{2}:\d{2})\s*</p>',
+    re.S
+)
+SINA_ROLL_ITEM_RE = re.compile(
+    r'<a\s+href="([^"]+)"[^>]*target="_blank">([^<]+)</a>.*?\((\d{2}月\d{2}日\s+\d{2}:\d{2})\)', re.S
+)
+PPI_ITEM_RE = re.compile(r'(\d{2}:\d{2}).*?<a[^>]+href="([^"]+)"[^>]*>(.*?)</a>', re.S)
+PPI_DETAIL_RE = re.compile(r'href="([^"]+)"[^>]*>\s*点击详情')
+MONTH_DAY_TIME_RE = re.compile(r'(\d{1,2})月(\d{1,2})日\s+(\d{2}):(\d{2})$')
+
+# 每个数据源最多保留的条数
+MAX_ITEMS = 30
+
+# 数据源名 -> (解析函数, 解码方式)
+PARSERS = {}
+
+
+def register(name, encoding="utf-8"):
+    """
+    注册解析函数：func(html, now, **context) -> [新闻字典, ...]
+    encoding: "utf-8" / "utf-8-ignore" / "apparent"（按内容探测，探测失败时用 gbk）
+    """
+    def decorator(func):
+        PARSERS[name] = (func, encoding)
+        return func
+    return decorator
+
+
+def clean_html(text):
+    if not text: return ""
+    return TAG_RE.sub('', text).strip()
+
+
+def extract_paragraphs(html, min_len=10, max_chars=800):
+    """抽取正文 <p> 段落，去标签后过滤过短的段落"""
+    paragraphs = (clean_html(p) for p in PARAGRAPH_RE.findall(html))
+    return "\n".join(p for p in paragraphs if len(p) > min_len)[:max_chars]
+
+
+@functools.lru_cache(maxsize=512)
+def _day_start_ts(year, month, day):
+    return int(datetime(year, month, day).timestamp())
+
+
+def _clock_ts(year, month, day, hour, minute):
+    """本地时间转时间戳：当天零点（缓存）加时分偏移，替代逐条 strptime；日期非法时退回当前时间"""
+    try:
+        if hour > 23 or minute > 59:
+            raise ValueError
+        return _day_start_ts(year, month, day) + hour * 3600 + minute * 60
+    except ValueError:
+        return int(std_time.time())
+
+
+def _month_day_ts(now, time_str):
+    """解析“10月18日 09:30”这类不带年份的时间，年份取今年"""
+    m = MONTH_DAY_TIME_RE.match(time_str.strip())
+    if not m:
+        return int(std_time.time())
+    month, day, hour, minute = map(int, m.groups())
+    return _clock_ts(now.year, month, day, hour, minute)
+
+
+@register("eastmoney", encoding="utf-8")
+def parse_eastmoney(html, now):
+    res = []
+    for match in EASTMONEY_ITEM_RE.finditer(html):
+        title = clean_html(match.group(2))
+        res.append({
+            "title": title, "intro": title, "url": match.group(1),
+            "time_ts": _month_day_ts(now, match.group(3)), "source": "东财要闻"
+        })
+        if len(res) >= MAX_ITEMS:
+            break
+    return res
+
+
+@register("sina_roll", encoding="apparent")
+def parse_sina_roll(html, now, source_name="新浪期货"):
+    res = []
+    for match in SINA_ROLL_ITEM_RE.finditer(html):
+        url_path, title, time_str = match.groups()
+        title = title.strip()
+        res.append({
+            "title": title, "intro": title, "url": url_path,
+            "time_ts": _month_day_ts(now, time_str), "source": source_name
+        })
+        if len(res) >= MAX_ITEMS:
+            break
+    return res
+
+
+def _absolute_100ppi(url):
+    # 为生意社的残缺相对路径强制补全 https 前缀
+    if url.startswith("http"):
+        return url
+    return f"https://www.100ppi.com{url}" if url.startswith("/") else f"https://www.100ppi.com/{url}"
+
+
+@register("100ppi", encoding="utf-8-ignore")
+def parse_100ppi(html, now):
+    """
+    单遍扫描：条目与“点击详情”链接各用一次 finditer 找出全部位置，
+    再用二分查找把详情链接归并到所在条目，不再对每个条目的切片重复做正则搜索。
+    """
+    items = list(PPI_ITEM_RE.finditer(html))
+    details = [(m.start(), m.group(1)) for m in PPI_DETAIL_RE.finditer(html)]
+    detail_pos = [pos for pos, _ in details]
+    res = []
+    for i, match in enumerate(items):
+        start = match.end()
+        end = items[i + 1].start() if i + 1 < len(items) else len(html)
+        j = bisect.bisect_left(detail_pos, start)
+        final_url = details[j][1] if j < len(details) and detail_pos[j] < end else match.group(2)
+
+        title_text = clean_html(match.group(3))
+        summary_text = clean_html(html[start:end]).replace("点击详情", "").strip()
+        hour, minute = match.group(1).split(":")
+        res.append({
+            "title": title_text,
+            "intro": summary_text if len(summary_text) > 5 else title_text,
+            "url": _absolute_100ppi(final_url),
+            "time_ts": _clock_ts(now.year, now.month, now.day, int(hour), int(minute)),
+            "source": "生意社"
+        })
+    return res
+
+
+# ==========================================
+# 2. 抓取 + 解析结果缓存
+# ==========================================
+_parsed = {}  # (数据源, url, context) -> (响应体摘要, 日期, 解析结果)
+_parsed_lock = threading.Lock()
+parse_stats = {"parsed": 0, "reused": 0, "not_modified": 0}
+
+
+def _decode(resp, encoding):
+    if encoding == "apparent":
+        return resp.content.decode(resp.apparent_encoding or 'gbk', errors='replace')
+    if encoding == "utf-8-ignore":
+        return resp.content.decode('utf-8', errors='ignore')
+    return resp.content.decode(encoding, errors='replace')
+
+
+def parse_html(name, html, now=None, **context):
+    func, _ = PARSERS[name]
+    return func(html, now or datetime.now(), **context)
+
+
+def fetch_parsed(name, url, headers=None, timeout=10, verify=True, **context):
+    """
+    抓取并解析某个已注册的数据源。页面未变化（304 或响应体摘要一致）且仍是同一天时，
+    直接返回上次的解析结果（共享对象，调用方只读）。
+    """
+    func, encoding = PARSERS[name]
+    resp, not_modified = conditional_get(url, headers=headers, timeout=timeout, verify=verify)
+    now = datetime.now()
+    key = (name, url, tuple(sorted(context.items())))
+    digest = hashlib.md5(resp.content).digest()
+    with _parsed_lock:
+        if not_modified:
+            parse_stats["not_modified"] += 1
+        cached_entry = _parsed.get(key)
+        # 时间戳按“今天 / 今年”补全，跨天后需要重新解析
+        if cached_entry and cached_entry[0] == digest and cached_entry[1] == now.date():
+            parse_stats["reused"] += 1
+            return cached_entry[2]
+
+    items = func(_decode(resp, encoding), now, **context)
+    with _parsed_lock:
+        _parsed[key] = (digest, now.date(), items)
+        parse_stats["parsed"] += 1
+    return items
@@ -0,0 +1,273 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+import time as std_time
+import bs_session
+
+# ==========================================
+# 1. 本地新闻库 (SQLite + FTS5 全文索引)
+# ==========================================
+# 后台采集器 (news_ingestor.py) 定时轮询八个快讯源写入这里，情绪组直接查库，
+# 抓取延迟不再出现在用户请求里，历史快讯也不会再随请求结束被丢弃。
+# - news 表按时间、来源建索引；news_mentions 记录每条新闻提到的股票（按股票简称 / 6 位代码识别）
+# - news_fts 为 trigram 分词的 FTS5 全文索引（中文按 3 字切分，可做子串检索）；
+#   当前 SQLite 不支持 FTS5 / trigram 时退化为 LIKE 查询
+# - feed_state 记录每个数据源最近一次成功采集的时间，用来判断库里的数据是否足够新
+
+NEWS_STORE_PATH = os.environ.get(
+    "NEWS_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "news.sqlite3")
+)
+# 最近一次成功采集距今不超过该秒数的数据源视为“新鲜”
+NEWS_FRESHNESS = int(os.environ.get("NEWS_FRESHNESS", "300"))
+# 至少有这么多个数据源新鲜时，情绪组才直接用库里的数据
+NEWS_MIN_FRESH_FEEDS = int(os.environ.get("NEWS_MIN_FRESH_FEEDS", "4"))
+# 股票简称表的刷新间隔（秒）
+STOCK_NAMES_TTL = 24 * 3600
+# 少于 3 个字的简称误匹配太多，不参与识别
+MIN_NAME_CHARS = 3
+_CODE_RE = re.compile(r'(?<!\d)([036]\d{5})(?!\d)')
+
+
+def news_uid(item):
+    raw = f"{item.get('source', '')}|{item.get('title', '')}|{item.get('url', '')}"
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+class NewsStore:
+    def __init__(self, path=NEWS_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.has_fts = False
+        self._names = None  # {code: name}
+        self._names_loaded_at = 0.0
+        self._name_re = None
+        self._name_to_code = {}
+        self._digits_to_code = {}
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS news (
+                    id INTEGER PRIMARY KEY,
+                    uid TEXT UNIQUE NOT NULL,
+                    source TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    intro TEXT,
+                    url TEXT,
+                    time_ts INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_news_time ON news(time_ts);
+                CREATE INDEX IF NOT EXISTS idx_news_source_time ON news(source, time_ts);
+                CREATE TABLE IF NOT EXISTS news_mentions (
+                    news_id INTEGER NOT NULL,
+                    code TEXT NOT NULL,
+                    time_ts INTEGER NOT NULL,
+                    PRIMARY KEY (code, news_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_mentions_code_time ON news_mentions(code, time_ts);
+                CREATE TABLE IF NOT EXISTS feed_state (
+                    feed TEXT PRIMARY KEY,
+                    last_success REAL,
+                    last_count INTEGER,
+                    last_error TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS stock_names (
+                    code TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5("
+                    "title, intro, content='news', content_rowid='id', tokenize='trigram')"
+                )
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                print(f"   [新闻库] 当前 SQLite 不支持 FTS5 trigram，改用 LIKE 检索: {e}")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # ---------- 股票简称识别 ----------
+    def _load_names(self):
+        """读取股票简称表（库中超过一天未刷新时向 baostock 重新拉取），并编译简称匹配正则"""
+        now = std_time.time()
+        if self._names is not None and now - self._names_loaded_at < STOCK_NAMES_TTL:
+            return
+        db = self._db()
+        rows = db.execute("SELECT code, name, updated_at FROM stock_names").fetchall()
+        if not rows or now - min(r[2] for r in rows) > STOCK_NAMES_TTL:
+            fields, data = bs_session.query("query_stock_basic")
+            if fields:
+                idx = {name: i for i, name in enumerate(fields)}
+                fresh = [(r[idx["code"]], r[idx["code_name"]], now) for r in data if r[idx["type"]] == "1"]
+                if fresh:
+                    db.executemany("INSERT OR REPLACE INTO stock_names (code, name, updated_at) VALUES (?, ?, ?)",
+                                   fresh)
+                    db.commit()
+                    rows = fresh
+        self._names = {code: name for code, name, _ in rows}
+        self._names_loaded_at = now
+        self._name_to_code = {name: code for code, name in self._names.items() if len(name) >= MIN_NAME_CHARS}
+        self._digits_to_code = {code.split(".")[-1]: code for code in self._names}
+        names = sorted(self._name_to_code, key=len, reverse=True)
+        self._name_re = re.compile("|".join(map(re.escape, names))) if names else None
+
+    def stock_name(self, code):
+        with self._lock:
+            self._load_names()
+            return self._names.get(code)
+
+    def warm_up(self):
+        """提前加载股票简称表并编译匹配正则（预启动的服务进程在 fork 前调用）"""
+        with self._lock:
+            self._load_names()
+
+    def reset_after_fork(self):
+        """子进程不能沿用父进程打开的 SQLite 连接：丢弃后在下次访问时重新打开，已加载的简称表继续使用"""
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _mentions(self, text):
+        codes = set()
+        if self._name_re is not None:
+            codes.update(self._name_to_code[m] for m in self._name_re.findall(text))
+        codes.update(self._digits_to_code[d] for d in _CODE_RE.findall(text) if d in self._digits_to_code)
+        return codes
+
+    # ---------- 写入 ----------
+    def add_items(self, items, fetched_at=None):
+        """写入一批快讯（按 来源+标题+链接 去重），返回新写入的条数"""
+        fetched_at = fetched_at or std_time.time()
+        added = 0
+        with self._lock:
+            db = self._db()
+            self._load_names()
+            for item in items:
+                title = (item.get("title") or "").strip()
+                if not title:
+                    continue
+                intro = item.get("intro") or item.get("content") or ""
+                time_ts = int(item.get("time_ts") or fetched_at)
+                cur = db.execute(
+                    "INSERT OR IGNORE INTO news (uid, source, title, intro, url, time_ts, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (news_uid(item), item.get("source", ""), title, intro, item.get("url", ""), time_ts, fetched_at)
+                )
+                if cur.rowcount == 0:
+                    continue
+                news_id = cur.lastrowid
+                added += 1
+                if self.has_fts:
+                    db.execute("INSERT INTO news_fts (rowid, title, intro) VALUES (?, ?, ?)", (news_id, title, intro))
+                db.executemany(
+                    "INSERT OR IGNORE INTO news_mentions (news_id, code, time_ts) VALUES (?, ?, ?)",
+                    [(news_id, code, time_ts) for code in self._mentions(title + " " + intro)]
+                )
+            db.commit()
+        return added
+
+    def record_feed(self, feed, count=None, error=None):
+        now = std_time.time()
+        with self._lock:
+            db = self._db()
+            if error is None:
+                db.execute(
+                    "INSERT INTO feed_state (feed, last_success, last_count, last_error, updated_at) "
+                    "VALUES (?, ?, ?, NULL, ?) ON CONFLICT(feed) DO UPDATE SET "
+                    "last_success=excluded.last_success, last_count=excluded.last_count, last_error=NULL, "
+                    "updated_at=excluded.updated_at",
+                    (feed, now, count, now)
+                )
+            else:
+                db.execute(
+                    "INSERT INTO feed_state (feed, last_error, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(feed) DO UPDATE SET last_error=excluded.last_error, updated_at=excluded.updated_at",
+                    (feed, str(error)[:200], now)
+                )
+            db.commit()
+
+    # ---------- 查询 ----------
+    def fresh_feeds(self, max_age=NEWS_FRESHNESS):
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT feed FROM feed_state WHERE last_success >= ?", (std_time.time() - max_age,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def is_fresh(self, max_age=NEWS_FRESHNESS, min_feeds=NEWS_MIN_FRESH_FEEDS):
+        """后台采集器在正常运行时返回 True，此时情绪组可以完全不在请求里抓取"""
+        return len(self.fresh_feeds(max_age)) >= min_feeds
+
+    @staticmethod
+    def _rows_to_items(rows):
+        return [
+            {"title": title, "intro": intro, "source": source, "url": url, "time_ts": time_ts}
+            for title, intro, source, url, time_ts in rows
+        ]
+
+    def recent(self, since_ts, limit=200, source=None):
+        """按时间倒序返回 since_ts 之后的快讯"""
+        sql = "SELECT title, intro, source, url, time_ts FROM news WHERE time_ts >= ?"
+        args = [since_ts]
+        if source:
+            sql += " AND source = ?"
+            args.append(source)
+        sql += " ORDER BY time_ts DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return self._rows_to_items(self._db().execute(sql, args).fetchall())
+
+    def search(self, code=None, keywords=(), since_ts=0, limit=30):
+        """
+        查询与某只股票相关的快讯：提到该股票（简称或代码）的新闻，加上全文命中任一关键词的新闻，
+        按时间倒序返回
+        """
+        with self._lock:
+            db = self._db()
+            ids = set()
+            if code:
+                ids.update(r[0] for r in db.execute(
+                    "SELECT news_id FROM news_mentions WHERE code=? AND time_ts >= ? ORDER BY time_ts DESC LIMIT ?",
+                    (code, since_ts, limit)
+                ))
+            for kw in keywords:
+                if not kw:
+                    continue
+                if self.has_fts and len(kw) >= 3:
+                    phrase = '"' + kw.replace('"', '""') + '"'
+                    rows = db.execute(
+                        "SELECT news.id FROM news_fts JOIN news ON news.id = news_fts.rowid "
+                        "WHERE news_fts MATCH ? AND news.time_ts >= ? ORDER BY news.time_ts DESC LIMIT ?",
+                        (phrase, since_ts, limit)
+                    )
+                else:
+                    pattern = f"%{kw}%"
+                    rows = db.execute(
+                        "SELECT id FROM news WHERE (title LIKE ? OR intro LIKE ?) AND time_ts >= ? "
+                        "ORDER BY time_ts DESC LIMIT ?",
+                        (pattern, pattern, since_ts, limit)
+                    )
+                ids.update(r[0] for r in rows)
+            if not ids:
+                return []
+            marks = ",".join("?" * len(ids))
+            rows = db.execute(
+                f"SELECT title, intro, source, url, time_ts FROM news WHERE id IN ({marks}) "
+                f"ORDER BY time_ts DESC LIMIT ?",
+                (*ids, limit)
+            ).fetchall()
+        return self._rows_to_items(rows)
+
+
+# 进程内共享的新闻库
+news_store = NewsStore()
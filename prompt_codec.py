@@ -0,0 +1,164 @@
+import math
+import threading
+from llm_client import estimate_tokens
+
+# ==========================================
+# 1. 提示词编码层 (紧凑表格 + 精度控制 + 各节点 Token 预算)
+# ==========================================
+# DataFrame.to_string() 为了对齐会补大量空格、浮点数带满精度，K 线表一半以上的 Token 都是空白。
+# 这里统一把喂给大模型的数据编码成紧凑的 TSV：不补齐、按列控制小数位、数值过大时换算单位；
+# 每个节点的数据段有 Token 预算，超出时优先丢弃最旧的行 / 最不重要的条目，
+# 所有提示词在发送前去掉缩进，并按节点统计 Token 数。
+
+# 各节点“数据段”的 Token 预算（不含指令模板），超出后按行截断
+PROMPT_BUDGETS = {
+    "tech": 700,
+    "fund": 700,
+    "risk": 700,
+    "news_filter": 2000,
+    "sentiment": 1200,
+}
+DEFAULT_PROMPT_BUDGET = 1500
+TRUNCATED_NOTE = "…(超出 Token 预算，已省略 {n} 行)"
+
+
+def budget_for(node):
+    return PROMPT_BUDGETS.get(node, DEFAULT_PROMPT_BUDGET)
+
+
+def format_number(value, digits=2):
+    """按指定小数位输出并去掉多余的 0，NaN / None 输出空字符串"""
+    if value is None:
+        return ""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if math.isnan(value):
+        return ""
+    text = f"{value:.{digits}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def encode_table(columns, precision=None, scale=None, sep="\t", budget=None, keep="tail"):
+    """
+    把列数据编码成紧凑表格（默认 TSV，首行为表头）。
+    columns: {列名: 序列} 或 DataFrame；precision: {列名: 小数位}，未指定的数值列保留 2 位；
+    scale: {列名: (除数, 新列名)}，如成交量换算为“万股”；
+    budget: Token 预算，超出时按 keep 丢弃行（tail 保留最新的行，head 保留最前面的行）。
+    """
+    precision = precision or {}
+    scale = scale or {}
+    names = list(columns.keys() if isinstance(columns, dict) else columns.columns)
+    header = [scale[n][1] if n in scale else n for n in names]
+    cols = []
+    for n in names:
+        values = list(columns[n])
+        if values and all(isinstance(v, str) or v is None for v in values):
+            cols.append(["" if v is None else v for v in values])
+            continue
+        divisor, digits = scale[n][0] if n in scale else 1, precision.get(n, 2)
+        cols.append([format_number(_scaled(v, divisor), digits) for v in values])
+    body = fit_lines([sep.join(row) for row in zip(*cols)], budget, keep=keep)
+    return sep.join(header) + ("\n" + body if body else "")
+
+
+def _scaled(value, divisor):
+    try:
+        return float(value) / divisor
+    except (TypeError, ValueError):
+        return value
+
+
+def fit_lines(lines, budget, keep="tail"):
+    """在 Token 预算内尽量多保留行；keep=tail 时保留末尾（最新）的行"""
+    if budget is None:
+        return "\n".join(lines)
+    ordered = list(reversed(lines)) if keep == "tail" else list(lines)
+    kept, used = [], 0
+    for line in ordered:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    dropped = len(lines) - len(kept)
+    if keep == "tail":
+        kept.reverse()
+    if dropped:
+        note = TRUNCATED_NOTE.format(n=dropped)
+        kept = [note] + kept if keep == "tail" else kept + [note]
+    return "\n".join(kept)
+
+
+def fit_items(items, render, budget):
+    """
+    按顺序渲染条目（如新闻），直到用完 Token 预算；items 应已按重要性排序。
+    返回 (文本, 实际使用的条目数)
+    """
+    parts, used = [], 0
+    for item in items:
+        text = render(len(parts) + 1, item)
+        cost = estimate_tokens(text)
+        if parts and used + cost > budget:
+            break
+        parts.append(text)
+        used += cost
+    return "\n".join(parts), len(parts)
+
+
+def clip(text, max_chars):
+    """截断过长的摘要，保留开头"""
+    text = (text or "").strip()
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def compact_text(text):
+    """去掉每行的缩进与行尾空白，连续空行合并为一行（提示词模板里的缩进对模型没有意义）"""
+    out, blank = [], False
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            if not blank and out:
+                out.append("")
+            blank = True
+            continue
+        out.append(line)
+        blank = False
+    return "\n".join(out).strip()
+
+
+# ==========================================
+# 2. 各节点提示词 Token 统计
+# ==========================================
+class PromptStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {}  # node -> {"calls", "tokens", "max_tokens", "last_tokens"}
+
+    def record(self, node, prompt):
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            s = self.stats.setdefault(node, {"calls": 0, "tokens": 0, "max_tokens": 0, "last_tokens": 0})
+            s["calls"] += 1
+            s["tokens"] += tokens
+            s["max_tokens"] = max(s["max_tokens"], tokens)
+            s["last_tokens"] = tokens
+        return tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {node: dict(s, avg_tokens=round(s["tokens"] / s["calls"])) for node, s in self.stats.items()}
+
+
+prompt_stats = PromptStats()
+
+
+def prepare_prompt(prompt, node):
+    """发送前的统一处理：去缩进并记录该节点的提示词 Token 数"""
+    prompt = compact_text(prompt)
+    tokens = prompt_stats.record(node, prompt)
+    print(f"   [Prompt] {node} 节点提示词约 {tokens} tokens")
+    return prompt
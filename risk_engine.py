@@ -0,0 +1,252 @@
+import os
+import json
+import datetime
+import threading
+import numpy as np
+from bar_store import load_bars
+
+# ==========================================
+# 1. 量化风控引擎
+# ==========================================
+# 基于本地 K 线仓库中的多年日线（只在首次使用时下载，之后每天增量追加），用 NumPy 计算：
+# 年化已实现波动率、相对上证指数的 Beta、最大回撤、历史模拟法 VaR / CVaR，
+# 以及候选标的与当前持仓组合的相关性。持仓从本地 JSON 文件读取（见 portfolio.example.json）。
+# 收益率统一使用交易所给出的 pctChg（按除权后的昨收计算），不受不复权价格跳空的影响。
+
+INDEX_CODE = "sh.000001"
+RISK_LOOKBACK_DAYS = int(os.environ.get("RISK_LOOKBACK_DAYS", str(3 * 365)))
+TRADING_DAYS_PER_YEAR = 252
+# 近期波动率窗口（交易日）
+RECENT_VOL_WINDOW = 20
+VAR_CONFIDENCES = (0.95, 0.99)
+# 计算 Beta / 相关性所需的最少重叠交易日
+MIN_OVERLAP_DAYS = 60
+PORTFOLIO_PATH = os.environ.get(
+    "PORTFOLIO_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "portfolio.json")
+)
+
+
+def lookback_start(days=RISK_LOOKBACK_DAYS):
+    return datetime.datetime.now() - datetime.timedelta(days=days)
+
+
+def returns_from_bars(df):
+    """日 K 线 -> (日期数组, 日收益率数组)，剔除停牌等缺失涨跌幅的日期"""
+    if df is None or df.empty:
+        return np.array([], dtype=str), np.array([], dtype="f8")
+    dates = df["date"].to_numpy(dtype=str)
+    rets = df["pctChg"].to_numpy(dtype="f8") / 100.0
+    mask = ~np.isnan(rets)
+    return dates[mask], rets[mask]
+
+
+def align_returns(dates_a, rets_a, dates_b, rets_b):
+    """按交易日取交集对齐两条收益率序列"""
+    _, ia, ib = np.intersect1d(dates_a, dates_b, assume_unique=True, return_indices=True)
+    return rets_a[ia], rets_b[ib]
+
+
+# ==========================================
+# 2. 风险指标 (纯 NumPy)
+# ==========================================
+def annualized_volatility(rets):
+    if len(rets) < 2:
+        return np.nan
+    return float(np.std(rets, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+
+def beta(rets, market_rets):
+    if len(rets) < MIN_OVERLAP_DAYS:
+        return np.nan
+    market_var = np.var(market_rets, ddof=1)
+    if market_var == 0:
+        return np.nan
+    return float(np.cov(rets, market_rets, ddof=1)[0, 1] / market_var)
+
+
+def correlation(rets_a, rets_b):
+    if len(rets_a) < MIN_OVERLAP_DAYS or np.std(rets_a) == 0 or np.std(rets_b) == 0:
+        return np.nan
+    return float(np.corrcoef(rets_a, rets_b)[0, 1])
+
+
+def drawdowns(rets):
+    """返回 (最大回撤, 当前距高点回撤)，均为正数比例"""
+    if len(rets) == 0:
+        return np.nan, np.nan
+    wealth = np.cumprod(1.0 + rets)
+    peak = np.maximum.accumulate(np.maximum(wealth, 1.0))
+    dd = 1.0 - wealth / peak
+    return float(dd.max()), float(dd[-1])
+
+
+def historical_var_cvar(rets, confidence):
+    """历史模拟法单日 VaR / CVaR（预期损失），返回正数比例"""
+    if len(rets) < MIN_OVERLAP_DAYS:
+        return np.nan, np.nan
+    var = -np.quantile(rets, 1.0 - confidence)
+    tail = rets[rets <= -var]
+    cvar = -tail.mean() if len(tail) else var
+    return float(var), float(cvar)
+
+
+def series_profile(rets):
+    """单条收益率序列的风险画像"""
+    max_dd, current_dd = drawdowns(rets)
+    profile = {
+        "days": int(len(rets)),
+        "vol_annual": annualized_volatility(rets),
+        "vol_recent_annual": annualized_volatility(rets[-RECENT_VOL_WINDOW:]),
+        "max_drawdown": max_dd,
+        "current_drawdown": current_dd,
+        "ret_5d": float(np.prod(1.0 + rets[-5:]) - 1.0) if len(rets) else np.nan,
+        "extreme_drops_3d": int(np.sum(rets[-3:] < -0.05)),
+    }
+    for c in VAR_CONFIDENCES:
+        profile[f"var_{int(c * 100)}"], profile[f"cvar_{int(c * 100)}"] = historical_var_cvar(rets, c)
+    return profile
+
+
+# ==========================================
+# 3. 持仓文件
+# ==========================================
+class PortfolioFile:
+    """按文件修改时间缓存的持仓读取器，文件更新后下一次读取自动生效"""
+
+    def __init__(self, path=PORTFOLIO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._data = None
+
+    def load(self):
+        """返回持仓字典；文件不存在或格式错误时返回 None"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                self._mtime, self._data = None, None
+                return None
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    data["positions"] = [p for p in data.get("positions", []) if p.get("code")]
+                    self._data = data
+                except Exception as e:
+                    print(f"   [风控引擎] 持仓文件 {self.path} 解析失败: {e}")
+                    self._data = None
+                self._mtime = mtime
+            return self._data
+
+
+portfolio_file = PortfolioFile()
+
+
+def portfolio_exposure(code, candidate_rets, candidate_dates, portfolio, start_date):
+    """
+    计算候选标的与现有持仓的相关性：逐只持仓的相关系数，以及与按权重合成的组合收益的相关系数。
+    持仓停牌日的收益按 0 计入组合。
+    """
+    holdings = [p for p in portfolio.get("positions", []) if p["code"] != code and p.get("weight_pct", 0) > 0]
+    result = {"per_holding": [], "portfolio_corr": np.nan}
+    if not holdings or len(candidate_rets) == 0:
+        return result
+
+    port_rets = np.zeros(len(candidate_dates))
+    for p in holdings:
+        try:
+            dates, rets = returns_from_bars(load_bars(p["code"], start_date))
+        except Exception as e:
+            print(f"   [风控引擎] 读取持仓 {p['code']} K 线失败: {e}")
+            continue
+        a, b = align_returns(candidate_dates, candidate_rets, dates, rets)
+        result["per_holding"].append({
+            "code": p["code"], "name": p.get("name", ""), "weight_pct": p["weight_pct"], "corr": correlation(a, b)
+        })
+        idx = np.searchsorted(dates, candidate_dates)
+        hit = (idx < len(dates)) & (dates[np.minimum(idx, len(dates) - 1)] == candidate_dates)
+        port_rets[hit] += rets[idx[hit]] * p["weight_pct"] / 100.0
+    result["portfolio_corr"] = correlation(candidate_rets, port_rets)
+    result["per_holding"].sort(key=lambda h: -np.nan_to_num(h["corr"], nan=-2))
+    return result
+
+
+# ==========================================
+# 4. 对外接口
+# ==========================================
+def compute_risk_profile(code, index_bars, portfolio=None, days=RISK_LOOKBACK_DAYS):
+    """
+    计算标的完整风险画像。index_bars 为上证指数日线（由调用方走共享缓存获取）。
+    返回 {"stock": .., "index": .., "beta": .., "index_corr": .., "exposure": .., "holding": ..}
+    """
+    start_date = lookback_start(days)
+    stock_dates, stock_rets = returns_from_bars(load_bars(code, start_date))
+    index_dates, index_rets = returns_from_bars(index_bars)
+    s, m = align_returns(stock_dates, stock_rets, index_dates, index_rets)
+
+    profile = {
+        "stock": series_profile(stock_rets),
+        "index": series_profile(index_rets),
+        "beta": beta(s, m),
+        "index_corr": correlation(s, m),
+        "exposure": None,
+        "holding": None,
+    }
+    if portfolio:
+        profile["exposure"] = portfolio_exposure(code, stock_rets, stock_dates, portfolio, start_date)
+        profile["holding"] = next((p for p in portfolio.get("positions", []) if p["code"] == code), None)
+    return profile
+
+
+def _pct(value, digits=2):
+    return "无数据" if value is None or np.isnan(value) else f"{value * 100:.{digits}f}%"
+
+
+def _num(value, digits=2):
+    return "无数据" if value is None or np.isnan(value) else f"{value:.{digits}f}"
+
+
+def format_account_status(portfolio, profile):
+    if not portfolio:
+        return f"- 未找到持仓文件 ({portfolio_file.path})，账户仓位与安全垫未知，请按最保守口径审查"
+
+    positions = portfolio.get("positions", [])
+    total = sum(p.get("weight_pct", 0) for p in positions)
+    lines = [f"- 当前账户总仓位: {total:g}% (共 {len(positions)} 只持仓)"]
+    if "drawdown_limit_pct" in portfolio:
+        cushion = portfolio["drawdown_limit_pct"] - portfolio.get("current_drawdown_pct", 0)
+        lines.append(f"- 距离风控清盘线: 还有 {cushion:g}% 的安全垫")
+    if "max_single_position_pct" in portfolio:
+        lines.append(f"- 单票最大允许仓位: {portfolio['max_single_position_pct']:g}%")
+    holding = profile.get("holding")
+    lines.append(f"- 该标的当前持仓: {holding['weight_pct']:g}%" if holding else "- 该标的当前持仓: 无")
+
+    exposure = profile.get("exposure") or {}
+    if exposure.get("per_holding"):
+        lines.append(f"- 与现有组合收益的相关系数: {_num(exposure['portfolio_corr'])} (大于 0.7 视为集中度风险)")
+        top = ", ".join(f"{h['name'] or h['code']}({h['weight_pct']:g}%) {_num(h['corr'])}"
+                        for h in exposure["per_holding"][:3])
+        lines.append(f"- 相关性最高的持仓: {top}")
+    return "\n        ".join(lines)
+
+
+def format_risk_report(profile, portfolio):
+    st, ix = profile["stock"], profile["index"]
+    years = st["days"] / TRADING_DAYS_PER_YEAR
+    return f"""
+        【1. 宏观系统性风险】
+        - 上证指数近5日累计涨跌幅: {_pct(ix['ret_5d'])} (若小于 -3% 视为大盘环境恶劣)
+        - 上证指数近{RECENT_VOL_WINDOW}日年化波动率: {_pct(ix['vol_recent_annual'])}，当前距高点回撤: {_pct(ix['current_drawdown'])}
+
+        【2. 标的资产风险敞口】(基于近 {years:.1f} 年 {st['days']} 个交易日)
+        - 年化已实现波动率: {_pct(st['vol_annual'])}，近{RECENT_VOL_WINDOW}日年化波动率: {_pct(st['vol_recent_annual'])} (若大于 45% 视为高波动极高风险)
+        - 相对上证指数 Beta: {_num(profile['beta'])}，相关系数: {_num(profile['index_corr'])} (Beta 大于 1.3 视为系统性敞口过高)
+        - 最大回撤: {_pct(st['max_drawdown'])}，当前距高点回撤: {_pct(st['current_drawdown'])}
+        - 单日 VaR(95%): {_pct(st['var_95'])}，CVaR(95%): {_pct(st['cvar_95'])}
+        - 单日 VaR(99%): {_pct(st['var_99'])}，CVaR(99%): {_pct(st['cvar_99'])} (若 95% VaR 大于 4% 视为尾部风险偏高)
+        - 近3日极端下跌次数(跌幅>5%): {st['extreme_drops_3d']} 次
+
+        【3. 账户合规与风控限制】
+        {format_account_status(portfolio, profile)}
+        """
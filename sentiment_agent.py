@@ -1,14 +1,19 @@
-import os
-import re
+import threading
 import time as std_time
 from datetime import datetime
-import requests
+from functools import partial
 import urllib3
-from duckduckgo_search import DDGS
-from langchain_openai import ChatOpenAI
-os.environ['HTTP_PROXY'] = 'http://127.0.0.1:7890'
-os.environ['HTTPS_PROXY'] = 'http://127.0.0.1:7890'
-os.environ['ALL_PROXY'] = 'socks5://127.0.0.1:7890'
+from llm_client import get_llm
+from llm_cache import cached_invoke
+from prompt_codec import fit_items, fit_lines, clip, budget_for
+from market_cache import cached
+from crawler_pool import fan_out
+from http_pool import http_get, PROXY_URL
+from news_parsers import clean_html, extract_paragraphs, fetch_parsed
+from news_dedup import cluster_news
+from news_store import news_store
+from telemetry import traced
+# 代理改由 QUANT_PROXY 显式开启（见 http_pool），导入本模块不再改写进程的代理环境变量
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 URL_SINA_GLOBAL = "https://zhibo.sina.com.cn/api/zhibo/feed?zhibo_id=152&tag_id=0&page=1&page_size=30"
 URL_EASTMONEY_NEWS = "https://finance.eastmoney.com/yaowen.html"
@@ -18,6 +23,22 @@ URL_SINA_HIGHLIGHTS = "https://finance.sina.com.cn/roll/c/56988.shtml"
 URL_100PPI = "https://www.100ppi.com/qb/"
 URL_MYSTEEL = "https://openapi.mysteel.com/without_sign/newsflash/flashnews/query_by_tags.htm"
 URL_WSCN = "https://api-one-wscn.awtmt.com/apiv1/content/lives?channel=global-channel&client=pc&limit=20"
+# 宏观快讯整轮并发抓取的总预算（秒），到点后只使用已返回的数据源
+MACRO_CRAWL_BUDGET = 16
+# 个股新闻摘要喂给大模型时保留的最大字数
+NEWS_SNIPPET_CHARS = 160
+# 从本地新闻库读取宏观快讯 / 个股相关快讯的回看窗口（秒）与条数上限
+MACRO_LOOKBACK = 24 * 3600
+MACRO_STORE_LIMIT = 240
+STOCK_NEWS_LOOKBACK = 3 * 24 * 3600
+STOCK_NEWS_LIMIT = 8
+# 个股定向搜索阶段的总预算（秒）：多个查询变体并发检索，剩余时间用于并发抓取文章正文
+TARGETED_SEARCH_BUDGET = 15
+SEARCH_VARIANT_DEADLINE = 10
+SEARCH_MAX_RESULTS = 6
+# 抓取正文的文章数上限，以及正文喂给大模型时保留的最大字数
+ARTICLE_FETCH_LIMIT = 4
+ARTICLE_SNIPPET_CHARS = 400
 def get_headers(referer="https://www.baidu.com", source="default"):
     base_ua = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     high_version_ua = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36 Edg/143.0.0.0'
@@ -42,9 +63,6 @@ def get_headers(referer="https://www.baidu.com", source="default"):
         return {'User-Agent': high_version_ua, 'Referer': 'https://wallstreetcn.com/',
                 'Origin': 'https://wallstreetcn.com', 'Connection': 'keep-alive'}
     return {'User-Agent': base_ua, 'Referer': referer, 'Accept': '*/*', 'Connection': 'keep-alive'}
-def clean_html(text):
-    if not text: return ""
-    return re.sub(r'<[^>]+>', '', text).strip()
 def find_news_list_recursively(data):
     if isinstance(data, list):
         if len(data) > 0 and isinstance(data[0], dict):
@@ -63,9 +81,10 @@ def find_news_list_recursively(data):
                 if res: return res
     return []
 # --- 各大网站爬虫模块 ---
+@traced("crawler", "sina", empty_is_error=True)
 def fetch_list_sina():
     try:
-        resp = requests.get(URL_SINA_GLOBAL, headers=get_headers(), timeout=10, verify=False)
+        resp = http_get(URL_SINA_GLOBAL, headers=get_headers(), timeout=10, verify=False)
         res = []
         for i in resp.json().get('result', {}).get('data', {}).get('feed', {}).get('list', []):
             # 默认兜底新浪7x24主页
@@ -80,9 +99,10 @@ def fetch_list_sina():
         return res
     except:
         return []
+@traced("crawler", "10jqka", empty_is_error=True)
 def fetch_list_10jqka():
     try:
-        resp = requests.get(URL_10JQKA_REALTIME, headers=get_headers(source="10jqka"), timeout=10)
+        resp = http_get(URL_10JQKA_REALTIME, headers=get_headers(source="10jqka"), timeout=10)
         res = []
         for i in find_news_list_recursively(resp.json())[:30]:
             # 默认兜底同花顺快讯主页
@@ -97,9 +117,10 @@ def fetch_list_10jqka():
         return res
     except:
         return []
+@traced("crawler", "wscn", empty_is_error=True)
 def fetch_list_wscn():
     try:
-        resp = requests.get(URL_WSCN, headers=get_headers(source="wscn"), timeout=10)
+        resp = http_get(URL_WSCN, headers=get_headers(source="wscn"), timeout=10)
         res = []
         for item in resp.json().get('data', {}).get('items', []):
             content = item.get('content_text', '').strip()
@@ -131,94 +152,33 @@ def fetch_list_wscn():
         return res
     except:
         return []
+@traced("crawler", "eastmoney", empty_is_error=True)
 def fetch_list_eastmoney():
     try:
-        headers = get_headers(source="eastmoney")
-        resp = requests.get(URL_EASTMONEY_NEWS, headers=headers, timeout=10, verify=False)
-        resp.encoding = 'utf-8'
-        pattern = re.compile(
-            r'<p class="title"[^>]*>.*?<a\s+[^>]*href="(https?://finance\.eastmoney\.com/a/[^"]+)"[^>]*>(.*?)</a>.*?<p class="time">\s*(\d{1,2}月\d{1,2}日\s+\d{2}:\d{2})\s*</p>',
-            re.S
-        )
-        matches = list(pattern.finditer(resp.text))
-        res = []
-        current_year = datetime.now().year
-        for match in matches:
-            title = clean_html(match.group(2)).strip()
-            time_str = match.group(3)
-            try:
-                ts = int(datetime.strptime(f"{current_year}年{time_str}", "%Y年%m月%d日 %H:%M").timestamp())
-            except:
-                ts = int(std_time.time())
-            res.append({"title": title, "intro": title, "url": match.group(1), "time_ts": ts, "source": "东财要闻"})
-        return res[:30]
+        return fetch_parsed("eastmoney", URL_EASTMONEY_NEWS, headers=get_headers(source="eastmoney"), timeout=10,
+                            verify=False)
     except Exception as e:
         return []
+@traced("crawler", "sina_roll", empty_is_error=True)
 def parse_sina_roll_page(url, source_name):
     try:
-        resp = requests.get(url, headers=get_headers(source="sina_html"), timeout=10)
-        resp.encoding = resp.apparent_encoding if resp.apparent_encoding else 'gbk'
-        pattern = re.compile(
-            r'<a\s+href="([^"]+)"[^>]*target="_blank">([^<]+)</a>.*?\((\d{2}月\d{2}日\s+\d{2}:\d{2})\)', re.S)
-        matches = pattern.findall(resp.text)
-        res = []
-        current_year = datetime.now().year
-        for url_path, title, time_str in matches[:30]:
-            try:
-                ts = int(datetime.strptime(f"{current_year}年{time_str}", "%Y年%m月%d日 %H:%M").timestamp())
-            except:
-                ts = int(std_time.time())
-            res.append(
-                {"title": title.strip(), "intro": title.strip(), "url": url_path, "time_ts": ts, "source": source_name})
-        return res
+        return fetch_parsed("sina_roll", url, headers=get_headers(source="sina_html"), timeout=10,
+                            source_name=source_name)
     except:
         return []
+@traced("crawler", "100ppi", empty_is_error=True)
 def fetch_list_100ppi():
+    # 不再拼接 _t 时间戳：固定的 URL 才能命中 ETag / Last-Modified 条件请求
     try:
-        t_param = int(std_time.time() * 1000)
-        target_url = f"{URL_100PPI}?_t={t_param}"
-        resp = requests.get(target_url, headers=get_headers(source="100ppi"), timeout=15, verify=False)
-        html = resp.content.decode('utf-8', errors='ignore')
-        item_pattern = re.compile(r'(\d{2}:\d{2}).*?<a[^>]+href="([^"]+)"[^>]*>(.*?)</a>', re.S)
-        matches = list(item_pattern.finditer(html))
-        res = []
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        for i, match in enumerate(matches):
-            try:
-                time_str = match.group(1)
-                initial_url = match.group(2)
-                raw_title_html = match.group(3)
-                start_pos = match.end()
-                end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(html)
-                content_block = html[start_pos:end_pos]
-
-                # 获取点击详情的真实链接
-                detail_match = re.search(r'href="([^"]+)"[^>]*>\s*点击详情', content_block)
-                final_url = detail_match.group(1) if detail_match else initial_url
-
-                # 【修复点】：为生意社的残缺相对路径强制补全 https 前缀
-                if not final_url.startswith("http"):
-                    final_url = f"https://www.100ppi.com{final_url}" if final_url.startswith(
-                        "/") else f"https://www.100ppi.com/{final_url}"
-
-                title_text = clean_html(raw_title_html).strip()
-                summary_text = clean_html(content_block).replace("点击详情", "").strip()
-                intro = summary_text if len(summary_text) > 5 else title_text
-                try:
-                    ts = int(datetime.strptime(f"{today_str} {time_str}:00", "%Y-%m-%d %H:%M:%S").timestamp())
-                except:
-                    ts = int(std_time.time())
-                res.append({"title": title_text, "intro": intro, "url": final_url, "time_ts": ts, "source": "生意社"})
-            except:
-                continue
-        return res
+        return fetch_parsed("100ppi", URL_100PPI, headers=get_headers(source="100ppi"), timeout=15, verify=False)
     except:
         return []
+@traced("crawler", "mysteel", empty_is_error=True)
 def fetch_list_mysteel():
     try:
         params = {"advertisementFlag": "0", "keyword": "", "pageNo": "1", "pageSize": "30", "sortByScore": "false",
                   "columnIds": "[[2,84,584]]"}
-        resp = requests.get(URL_MYSTEEL, headers=get_headers(source="mysteel"), params=params, timeout=10)
+        resp = http_get(URL_MYSTEEL, headers=get_headers(source="mysteel"), params=params, timeout=10)
         items = find_news_list_recursively(resp.json())
         res = []
         for item in items[:30]:
@@ -239,24 +199,49 @@ def fetch_list_mysteel():
         return res
     except:
         return []
+# 八个宏观快讯数据源：(名称, 缓存数据源名, 抓取函数, 参数)，请求内抓取与后台采集器 (news_ingestor.py) 共用
+MACRO_SOURCES = [
+    ("sina", "sina", fetch_list_sina, ()),
+    ("eastmoney", "eastmoney", fetch_list_eastmoney, ()),
+    ("10jqka", "10jqka", fetch_list_10jqka, ()),
+    ("sina_roll_futures", "sina_roll", parse_sina_roll_page, (URL_SINA_ROLL_FUTURES, "新浪期货-滚动")),
+    ("sina_highlights", "sina_roll", parse_sina_roll_page, (URL_SINA_HIGHLIGHTS, "新浪期货-要闻")),
+    ("100ppi", "100ppi", fetch_list_100ppi, ()),
+    ("mysteel", "mysteel", fetch_list_mysteel, ()),
+    ("wscn", "wscn", fetch_list_wscn, ()),
+]
+# 单个数据源的截止时间覆盖（秒）
+MACRO_DEADLINES = {"100ppi": 16}
 # ==========================================
 # 3. 定向搜索与深度抓取 (DuckSearch)
 # ==========================================
+@traced("crawler", "article", empty_is_error=True)
 def fetch_url_content_realtime(url, source="default"):
     if not url or not url.startswith("http"): return ""
     try:
-        resp = requests.get(url, headers=get_headers(url, source=source), timeout=10, verify=False)
+        resp = http_get(url, headers=get_headers(url, source=source), timeout=10, verify=False)
         resp.encoding = resp.apparent_encoding or 'utf-8'
-        paragraphs = re.findall(r'<p.*?>(.*?)</p>', resp.text, re.S)
-        return "\n".join([clean_html(p) for p in paragraphs if len(clean_html(p)) > 10])[:800]
+        return extract_paragraphs(resp.text)
     except:
         return ""
+# DuckDuckGo 客户端类，首次搜索时才导入（基准测试的回放器会直接替换成假客户端）
+DDGS = None
+
+
+def ddgs_class():
+    global DDGS
+    if DDGS is None:
+        from duckduckgo_search import DDGS
+    return DDGS
+
+
+@traced("search", "duckduckgo")
 def search_web_context(query, max_results=5):
     """使用 DuckDuckGo 进行全网定向搜索"""
     print(f"   [DuckSearch] 正在全网检索关键词: '{query}'")
     results = []
     try:
-        with DDGS(timeout=15) as ddgs:
+        with ddgs_class()(timeout=15, proxy=PROXY_URL) as ddgs:
             results = list(ddgs.text(query, region='wt-wt', safesearch='off', timelimit='w', max_results=max_results))
     except Exception as e:
         print(f"   ⚠️ 搜索警告: {e}")
@@ -283,6 +268,91 @@ def search_web_context(query, max_results=5):
             "time": published
         })
     return context_str, raw_news_list
+def search_query_variants(ticker, name=None):
+    """个股定向搜索的查询变体：代码、公司简称、公司简称 + 公告"""
+    stock_code = ticker.split('.')[-1] if '.' in ticker else ticker
+    variants = [("code", f"{stock_code} 股票 突发 最新消息 涨跌原因")]
+    if name:
+        variants += [("name", f"{name} 最新消息"), ("notice", f"{name} 公告")]
+    return variants
+def enrich_with_articles(news_list, budget, limit=ARTICLE_FETCH_LIMIT):
+    """
+    并发抓取排在前面的几篇文章正文，写入 body 字段；所有抓取共用同一个截止时间，
+    超时的文章保留搜索摘要。正文按 URL 走跨请求缓存，同一篇文章不会重复下载
+    """
+    targets = [news for news in news_list if news.get("url", "").startswith("http")][:limit]
+    if not targets or budget <= 0:
+        return 0
+    tasks = [(news["url"], cached, ("article", fetch_url_content_realtime, news["url"])) for news in targets]
+    bodies = fan_out(tasks, budget=budget, default_deadline=budget)
+    enriched = 0
+    for news in targets:
+        body = bodies.get(news["url"])
+        if body and len(body) > len(news.get("content", "")):
+            news["body"] = body
+            enriched += 1
+    return enriched
+def targeted_search(ticker, name=None, budget=TARGETED_SEARCH_BUDGET):
+    """
+    多个查询变体并发检索（按 URL 去重合并），再在剩余预算内并发抓取靠前文章的正文。
+    返回清洗后的个股新闻列表
+    """
+    start = std_time.monotonic()
+    variants = search_query_variants(ticker, name)
+    tasks = [(key, search_web_context, (query, SEARCH_MAX_RESULTS)) for key, query in variants]
+    results = fan_out(tasks, budget=min(SEARCH_VARIANT_DEADLINE, budget), default_deadline=SEARCH_VARIANT_DEADLINE)
+
+    raw_news, seen_urls = [], set()
+    for key, _ in variants:
+        for news in results.get(key, ("", []))[1]:
+            url = news.get("url")
+            if url and url in seen_urls:
+                continue
+            seen_urls.add(url)
+            raw_news.append(news)
+    # 合并本地新闻库中提到该股票的快讯
+    raw_news += load_stock_news(ticker, name)
+
+    cleaned = filter_and_clean_news(raw_news, max_count=8)
+    enriched = enrich_with_articles(cleaned, budget - (std_time.monotonic() - start))
+    print(f"   [定向搜索] {len(results)}/{len(variants)} 个查询返回，保留 {len(cleaned)} 条，"
+          f"补全正文 {enriched} 篇，耗时 {std_time.monotonic() - start:.1f}s")
+    return cleaned
+def fetch_macro_news(ttl=None):
+    """
+    并发抓取八个宏观快讯数据源并按时间倒序合并。
+    宏观快讯与标的无关，走跨请求共享缓存：并发分析只触发一轮抓取；
+    ttl 可覆盖默认缓存时长（批量模式用较长的 ttl 预热，整批分析共用同一轮抓取结果）。
+    """
+    load = partial(cached, ttl=ttl)
+    # 八个数据源并发抓取，整体耗时受最慢单源和总预算约束，超时的数据源直接放弃
+    macro_tasks = [(name, load, (source, func, *args)) for name, source, func, args in MACRO_SOURCES]
+    macro_results = fan_out(macro_tasks, budget=MACRO_CRAWL_BUDGET, deadlines=MACRO_DEADLINES)
+    raw_macro_news = []
+    for name, _, _ in macro_tasks:
+        raw_macro_news += macro_results.get(name, [])
+    raw_macro_news.sort(key=lambda x: x.get('time_ts', 0), reverse=True)
+    return raw_macro_news
+def load_macro_news():
+    """
+    优先从本地新闻库读取宏观快讯（后台采集器在跑时只需一次毫秒级查询）；
+    库里的数据不够新时退回请求内并发抓取，抓到的结果在后台写入新闻库
+    """
+    if news_store.is_fresh():
+        print("   [新闻库] 后台采集器数据新鲜，直接读取本地快讯库")
+        return news_store.recent(int(std_time.time()) - MACRO_LOOKBACK, limit=MACRO_STORE_LIMIT)
+    print("   [爬虫集群] 正在拉取 新浪/同花顺/华尔街见闻 实时滚动快讯...")
+    raw_macro_news = fetch_macro_news()
+    threading.Thread(target=news_store.add_items, args=(raw_macro_news,), daemon=True).start()
+    return raw_macro_news
+def load_stock_news(ticker, name=None):
+    """从本地新闻库查询近几天提到该股票（简称 / 代码）的快讯"""
+    try:
+        return news_store.search(code=ticker, keywords=[name] if name else [],
+                                 since_ts=int(std_time.time()) - STOCK_NEWS_LOOKBACK, limit=STOCK_NEWS_LIMIT)
+    except Exception as e:
+        print(f"   ⚠️ 新闻库查询失败: {e}")
+        return []
 # ==========================================
 # 4. 智能体核心逻辑
 # ==========================================
@@ -308,14 +378,15 @@ def llm_pre_process_news(raw_text_block, ticker, llm):
     """
 
     # 调用大模型进行预处理
-    response = llm.invoke(prompt)
-    return response.content
+    response_text = cached_invoke(llm, prompt, node="news_filter")
+    return response_text
 def filter_and_clean_news(raw_news_list, company_keyword=None, max_count=10):
     """
-    【数据清洗管道】负责过滤爬虫抓取到的噪音数据，并保留时间字段
+    【数据清洗管道】负责过滤爬虫抓取到的噪音数据，并保留时间字段；
+    多个来源转载的同一条消息按近似重复聚成一簇，只保留一条并记录全部出处，
+    被越多来源报道、越新的消息排在越前面
     """
-    cleaned_news = []
-    seen_titles = set()
+    candidates = []
 
     for news in raw_news_list:
         title = news.get("title", "") or news.get("name", "")
@@ -332,76 +403,88 @@ def filter_and_clean_news(raw_news_list, company_keyword=None, max_count=10):
         else:
             time_str = raw_time or "近期"
 
-        if not title or title in seen_titles:
+        if not title:
             continue
         if len(content) < 15 and len(title) < 5:
             continue
         if company_keyword and (company_keyword not in title and company_keyword not in content):
             continue
 
-        seen_titles.add(title)
-
         # 统一标准化格式并保留源链接（新增 time 字段）
-        cleaned_news.append({
+        candidates.append({
             "title": title,
             "content": content,
             "url": url,
             "source": source,
-            "time": time_str  # 解决前端 undefined 的问题
+            "time": time_str,  # 解决前端 undefined 的问题
+            "time_ts": news.get("time_ts") if isinstance(news.get("time_ts"), (int, float)) else None
         })
 
+    cleaned_news = []
+    for cluster in cluster_news(candidates, intro_key="content"):
+        item = {k: v for k, v in cluster["item"].items() if k != "time_ts"}
+        item["sources"] = cluster["sources"]
+        item["source_count"] = len(cluster["sources"])
+        cleaned_news.append(item)
         if len(cleaned_news) >= max_count:
             break
 
     return cleaned_news
-def run_sentiment_agent(ticker: str, api_key: str) -> dict:
+def render_specific_news(i, news):
+    """个股新闻喂给大模型的一行：抓到正文的用正文开头，否则用搜索摘要"""
+    if news.get("body"):
+        return f"【新闻 {i}】{news['title']}｜{clip(news['body'], ARTICLE_SNIPPET_CHARS)}"
+    return f"【新闻 {i}】{news['title']}｜{clip(news['content'], NEWS_SNIPPET_CHARS)}"
+def _cancelled(cancel_event, ticker, stage):
+    """后台运行时由调度方在风控否决、任务取消或超时清理时置位，在阶段边界处检查，避免继续抓取和消耗 Token"""
+    if cancel_event is not None and cancel_event.is_set():
+        print(f"[情绪组] {ticker} 的情绪分析已取消，{stage}后停止")
+        return True
+    return False
+
+
+def _cancelled_result():
+    return {"news_data": "", "news_links": [], "sentiment_signal": "情绪面分析已取消"}
+
+
+def run_sentiment_agent(ticker: str, api_key: str, cancel_event=None) -> dict:
+    """cancel_event: 可选的 threading.Event，置位后在下一个阶段边界处中止并返回空报告"""
     print(f"\n[情绪组] 正在全网搜集 {ticker} 的新闻资讯与散户舆情...")
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        api_key=api_key,
-        base_url="https://api.deepseek.com",
-        temperature=0.3
-    )
+    llm = get_llm(api_key, temperature=0.3)
 
     # ==========================================
     # 步骤 A: 抓取全网最新宏观快讯
     # ==========================================
-    print("   [爬虫集群] 正在拉取 新浪/同花顺/华尔街见闻 实时滚动快讯...")
-    raw_macro_news = (
-            fetch_list_sina() +
-            fetch_list_eastmoney() +
-            fetch_list_10jqka() +
-            parse_sina_roll_page(URL_SINA_ROLL_FUTURES, "新浪期货-滚动") +
-            parse_sina_roll_page(URL_SINA_HIGHLIGHTS, "新浪期货-要闻") +
-            fetch_list_100ppi() +
-            fetch_list_mysteel() +
-            fetch_list_wscn()
-    )
-    # 假设你的原始数据里有 time_ts 这个字段用于排序
-    raw_macro_news.sort(key=lambda x: x.get('time_ts', 0), reverse=True)
+    raw_macro_news = load_macro_news()
+    if _cancelled(cancel_event, ticker, "宏观快讯"):
+        return _cancelled_result()
 
     # 清洗宏观新闻 (不需要传入 ticker 作为过滤词，以保留大盘政策信息)
     cleaned_macro = filter_and_clean_news(raw_macro_news, max_count=15)
-    macro_text = ""
-    for item in cleaned_macro:
-        macro_text += f"[{item['source']}] {item['title']}\n"
 
     # ==========================================
     # 步骤 B: 针对标的定向搜索 (DuckDuckGo)
     # ==========================================
-    stock_code = ticker.split('.')[-1] if '.' in ticker else ticker
-    search_query = f"{stock_code} 股票 突发 最新消息 涨跌原因"
-    print(f"   [定向搜索] 正在通过 DuckDuckGo 深度挖掘: {search_query}")
-
-    # 假设 search_web_context 返回 (纯文本摘要, 原始字典列表)
-    _, raw_specific_news = search_web_context(search_query, max_results=8)
-
-    # 清洗微观情报
-    # 清洗微观情报
-    cleaned_specific = filter_and_clean_news(raw_specific_news, max_count=8)
-    specific_news_text = ""
-    for i, news in enumerate(cleaned_specific, 1):
-        specific_news_text += f"【新闻 {i}】标题：{news['title']}\n摘要：{news['content']}\n\n"
+    try:
+        company_name = news_store.stock_name(ticker)
+    except Exception:
+        company_name = None
+    print(f"   [定向搜索] 正在通过 DuckDuckGo 并发深度挖掘: {ticker} {company_name or ''}")
+    cleaned_specific = targeted_search(ticker, company_name)
+    # 之后第一步就是大模型预处理，这里同时是第一次大模型调用之前的检查点
+    if _cancelled(cancel_event, ticker, "定向搜索"):
+        return _cancelled_result()
+
+    # 按 Token 预算拼装喂给过滤器的情报：个股新闻占六成预算（正文 / 摘要截断），宏观快讯只保留标题
+    filter_budget = budget_for("news_filter")
+    specific_news_text, _ = fit_items(
+        cleaned_specific,
+        render_specific_news,
+        int(filter_budget * 0.6)
+    )
+    macro_text, _ = fit_items(
+        cleaned_macro, lambda i, item: f"[{'/'.join(item['sources'])}] {item['title']}", int(filter_budget * 0.4)
+    )
 
     # ==========================================
     # 步骤 B.5: 组装展示给前端的新闻列表并增加标识
@@ -451,7 +534,7 @@ def run_sentiment_agent(ticker: str, api_key: str) -> dict:
         你是资深的量化对冲基金舆情分析师。
         以下是我为你提供经过严格预清洗和标签化的关于标的 {ticker} 的核心高价值情报：
 
-        {cleaned_and_tagged_news}
+        {fit_lines(cleaned_and_tagged_news.splitlines(), budget_for("sentiment"), keep="head")}
     【任务要求】
     1. 结合宏观大势和微观个股情报，分析整体情绪。
     2. 忽略中性的日常公告，请像猎犬一样精准定位对股价有实质性影响的事件。
@@ -462,12 +545,14 @@ def run_sentiment_agent(ticker: str, api_key: str) -> dict:
     【潜在情绪风险】(当前是否存在舆论上的隐患、“买预期，卖事实”的风险或系统性大盘风险？)
     """
 
-    response = llm.invoke(prompt)
+    if _cancelled(cancel_event, ticker, "情报预处理"):
+        return _cancelled_result()
+    response_text = cached_invoke(llm, prompt, node="sentiment")
 
     return {
         "news_data": specific_news_text + "\n" + macro_text,
         "news_links": final_news_links,
-        "sentiment_signal": response.content
+        "sentiment_signal": response_text
     }
 # ==========================================
 # 5. 独立测试入口
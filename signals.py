@@ -0,0 +1,59 @@
+import re
+
+# ==========================================
+# 1. 各部门结论解析
+# ==========================================
+# 把四个部门报告里的结论行（【观点】/【情绪观点】/【风控决议】）统一归一成 看多 / 看空 / 中性，
+# 供辩论路由判断是否已经达成一致。风控绿灯视为不反对看多，黄灯视为中性，红灯视为看空（一票否决）。
+
+BULLISH = "bullish"
+BEARISH = "bearish"
+NEUTRAL = "neutral"
+
+# 部门 -> (结论标签, [(关键词, 归一后的立场), ...])
+VERDICT_RULES = {
+    "tech": ("【观点】", [("看涨", BULLISH), ("看跌", BEARISH), ("震荡", NEUTRAL), ("观望", NEUTRAL)]),
+    "fund": ("【观点】", [("看好", BULLISH), ("看空", BEARISH), ("中性", NEUTRAL)]),
+    "sentiment": ("【情绪观点】", [("看涨", BULLISH), ("看跌", BEARISH), ("震荡", NEUTRAL), ("中性", NEUTRAL)]),
+    "risk": ("【风控决议】", [("绿灯", BULLISH), ("红灯", BEARISH), ("黄灯", NEUTRAL)]),
+}
+STANCE_NAMES = {BULLISH: "看多", BEARISH: "看空", NEUTRAL: "中性"}
+
+_NEW_OBJECTIONS_RE = re.compile(r'【新增质疑】\s*[:：]?\s*(\d+)')
+
+
+def parse_verdict(kind, text):
+    """
+    解析某个部门报告的结论，返回 bullish / bearish / neutral；
+    找不到结论行或结论行里同时出现多种立场（如照抄了模板“看涨/看跌”）时返回 None。
+    """
+    label, rules = VERDICT_RULES[kind]
+    if not text or label not in text:
+        return None
+    line = text.split(label, 1)[1].split("\n", 1)[0]
+    stances = {stance for word, stance in rules if word in line}
+    return stances.pop() if len(stances) == 1 else None
+
+
+def parse_verdicts(state):
+    """从工作流状态中解析四个部门的立场"""
+    return {
+        "tech": parse_verdict("tech", state.get("tech_signal", "")),
+        "fund": parse_verdict("fund", state.get("fund_signal", "")),
+        "sentiment": parse_verdict("sentiment", state.get("sentiment_signal", "")),
+        "risk": parse_verdict("risk", state.get("risk_signal", "")),
+    }
+
+
+def consensus(verdicts):
+    """四个部门立场完全一致时返回该立场，否则返回 None"""
+    stances = set(verdicts.values())
+    if len(stances) == 1 and None not in stances:
+        return stances.pop()
+    return None
+
+
+def parse_new_objections(text):
+    """解析辩论发言末尾的【新增质疑】N，没有该行时返回 None"""
+    matches = _NEW_OBJECTIONS_RE.findall(text or "")
+    return int(matches[-1]) if matches else None
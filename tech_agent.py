@@ -1,52 +1,83 @@
-import os
-import baostock as bs
-import pandas as pd
 import datetime
-from langchain_openai import ChatOpenAI
+from llm_client import get_llm
+from llm_cache import cached_invoke
 import numpy as np  # 新增 numpy 用于处理 NaN
+from bar_store import load_bars
+from indicators import compute_indicators
+from prompt_codec import encode_table, budget_for
+
+# K 线图展示的自然日窗口
+KLINE_DAYS = 100
+# 额外多取的历史用于指标预热（MACD 的慢线与信号线需要几十根 K 线才收敛）
+INDICATOR_WARMUP_DAYS = 120
+CHART_FIELDS = ('date', 'open', 'close', 'low', 'high', 'MA5', 'MA20')
+
+
+def _round_or_none(values, digits=2):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def format_indicator_snapshot(latest, close):
+    """把最新一根 K 线上的扩展指标整理成给大模型看的几行文字"""
+    def fmt(name, digits=2):
+        v = latest[name]
+        return "无" if np.isnan(v) else f"{v:.{digits}f}"
+    boll_pos = "无"
+    width = latest['BOLL_UP'] - latest['BOLL_LOW']
+    if not np.isnan(width) and width > 0:
+        boll_pos = f"{(close - latest['BOLL_LOW']) / width:.0%}"
+    return (
+        f"MACD: DIF {fmt('DIF', 3)} / DEA {fmt('DEA', 3)} / 柱 {fmt('MACD', 3)}\n"
+        f"    RSI14: {fmt('RSI14', 1)}\n"
+        f"    布林带(20,2): 上轨 {fmt('BOLL_UP')} / 中轨 {fmt('BOLL_MID')} / 下轨 {fmt('BOLL_LOW')}，收盘价位于通道 {boll_pos}\n"
+        f"    ATR14: {fmt('ATR14')}\n"
+        f"    OBV: {fmt('OBV', 0)}\n"
+        f"    成交量均线: VOL_MA5 {fmt('VOL_MA5', 0)} / VOL_MA20 {fmt('VOL_MA20', 0)}"
+    )
 
 
 # ==========================================
 # 2. 数据获取与处理
 # ==========================================
-def get_k_data_with_indicators(code="sh.600000", days=100):
-    bs.login()
+def get_k_data_with_indicators(code="sh.600000", days=KLINE_DAYS):
     end_date = datetime.datetime.now()
     start_date = end_date - datetime.timedelta(days=days)
+    warmup_start = start_date - datetime.timedelta(days=INDICATOR_WARMUP_DAYS)
+
+    # 从本地 K 线仓库读取，只有缺失的日期段才会向 baostock 补拉
+    df = load_bars(code, warmup_start, end_date)
+    if df.empty:
+        return "暂无 K 线数据", [], ""
+
+    # 在整段历史上一次性计算全部指标（1 × N 的 NumPy 面板），再截取展示窗口
+    panel = {f: df[f].to_numpy(dtype="f8") for f in ('open', 'high', 'low', 'close', 'volume')}
+    ind = {name: values[0] for name, values in compute_indicators(panel).items()}
+    shown = np.flatnonzero(df['date'].to_numpy(dtype=str) >= start_date.strftime("%Y-%m-%d"))
+    if shown.size == 0:
+        shown = np.arange(len(df))
+
+    # 【新增】直接由列数组拼出前端 ECharts 画图用的字典列表，NaN 转成 None 便于序列化
+    columns = {
+        'date': df['date'].to_numpy(dtype=str)[shown].tolist(),
+        'open': _round_or_none(panel['open'][shown]),
+        'close': _round_or_none(panel['close'][shown]),
+        'low': _round_or_none(panel['low'][shown]),
+        'high': _round_or_none(panel['high'][shown]),
+        'MA5': _round_or_none(ind['MA5'][shown]),
+        'MA20': _round_or_none(ind['MA20'][shown]),
+    }
+    chart_data = [dict(zip(CHART_FIELDS, row)) for row in zip(*(columns[f] for f in CHART_FIELDS))]
 
-    rs = bs.query_history_k_data_plus(
-        code,
-        "date,open,high,low,close,volume,pctChg,turn",
-        start_date=start_date.strftime("%Y-%m-%d"),
-        end_date=end_date.strftime("%Y-%m-%d"),
-        frequency="d",
-        adjustflag="3"
-    )
-
-    data_list = []
-    while (rs.error_code == '0') & rs.next():
-        data_list.append(rs.get_row_data())
-    bs.logout()
-
-    if not data_list:
-        return "暂无 K 线数据", []
-
-    df = pd.DataFrame(data_list, columns=rs.fields)
-    numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'pctChg', 'turn']
-    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric)
-
-    df['MA5'] = df['close'].rolling(window=5).mean().round(2)
-    df['MA20'] = df['close'].rolling(window=20).mean().round(2)
-
-    # 替换 NaN 为 None，方便后续转换为 JSON 给前端
-    df = df.replace({np.nan: None})
-
-    # 【新增】将完整数据转换为字典列表，专供前端 ECharts 画图使用
-    chart_data = df[['date', 'open', 'close', 'low', 'high', 'MA5', 'MA20']].to_dict(orient='records')
-
-    # 只取最近 15 天的数据喂给大模型
-    recent_data = df.tail(15)
-    return recent_data.to_string(index=False), chart_data
+    # 只取最近 15 天的数据喂给大模型：紧凑 TSV、按列控制精度，超出 Token 预算时丢弃较早的行
+    recent_idx = shown[-15:]
+    recent_data = {'date': df['date'].to_numpy(dtype=str)[recent_idx]}
+    for f in ('open', 'high', 'low', 'close', 'volume', 'pctChg', 'turn'):
+        recent_data[f] = df[f].to_numpy(dtype="f8")[recent_idx]
+    recent_data['MA5'] = ind['MA5'][recent_idx]
+    recent_data['MA20'] = ind['MA20'][recent_idx]
+    k_data_text = encode_table(recent_data, scale={'volume': (1e4, 'volume(万股)')}, budget=budget_for("tech"))
+    snapshot = format_indicator_snapshot({name: values[-1] for name, values in ind.items()}, panel['close'][-1])
+    return k_data_text, chart_data, snapshot
 
 
 # ==========================================
@@ -54,33 +85,31 @@ def get_k_data_with_indicators(code="sh.600000", days=100):
 # ==========================================
 def run_tech_agent(ticker: str, api_key: str) -> dict:
     print(f"[技术组] 正在获取并分析 {ticker} 的量价走势与均线系统...")
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        api_key=api_key,
-        base_url="https://api.deepseek.com",
-        temperature=0.3
-    )
+    llm = get_llm(api_key, temperature=0.3)
 
-    # 【修改点】接收两个返回值
-    k_data_text, chart_data = get_k_data_with_indicators(ticker)
+    # 【修改点】接收三个返回值
+    k_data_text, chart_data, indicator_text = get_k_data_with_indicators(ticker)
 
     prompt = f"""
-    你是资深技术分析师。以下是该股票最近 15 个交易日的日 K 线数据（包含 MA5 和 MA20 均线）：
+    你是资深技术分析师。以下是该股票最近 15 个交易日的日 K 线数据（TSV 格式，包含 MA5 和 MA20 均线）：
     {k_data_text}
 
-    请根据价格走势、成交量变化以及均线系统进行技术面分析。
+    最新交易日的扩展技术指标：
+    {indicator_text}
+
+    请根据价格走势、成交量变化、均线系统以及 MACD / RSI / 布林带 / ATR / OBV 等指标进行技术面分析。
     输出格式要求：
     【观点】看涨/看跌/震荡观望
-    【形态与指标】(简述均线状态、支撑位或阻力位、量价配合情况)
+    【形态与指标】(简述均线与 MACD 状态、RSI 超买超卖、布林带位置、支撑位或阻力位、量价配合情况)
     【操作建议】(短期内的交易倾向)
     """
 
-    response = llm.invoke(prompt)
+    response_text = cached_invoke(llm, prompt, node="tech")
 
     # 【修改点】在返回字典中新增 chart_data
     return {
         "technical_data": k_data_text,
-        "tech_signal": response.content,
+        "tech_signal": response_text,
         "chart_data": chart_data
     }
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+import uuid
+import bisect
+import threading
+import functools
+import contextvars
+import time as std_time
+
+# ==========================================
+# 1. 耗时 / Token / 缓存指标
+# ==========================================
+# 爬虫、baostock 查询、大模型调用和 LangGraph 节点都包在 span 里：
+# - 进程级指标：按 (类型, 名称) 统计耗时直方图与错误数，按节点统计 Token，按缓存层统计命中 / 未命中，
+#   由 app.py 的 /metrics 以 Prometheus 文本格式导出
+# - 单次分析的链路追踪：通过 contextvar 挂在当前请求上，跨线程提交任务时用 submit_in_context 复制上下文，
+#   分析结束后随 JSON 响应一起返回，可以直接看出十几个串行 / 并行环节里哪一段最慢
+
+METRIC_PREFIX = "quant"
+# 直方图分桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 单次链路最多记录的 span 数，防止异常循环把响应撑大
+MAX_TRACE_SPANS = 500
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # (kind, name) -> _Histogram
+        self.errors = {}  # (kind, name) -> n
+        self.tokens = {}  # (node, "prompt" / "completion") -> n
+        self.cache = {}  # (layer, name, result) -> n
+
+    def observe(self, kind, name, seconds, error=False):
+        with self._lock:
+            hist = self.latency.get((kind, name))
+            if hist is None:
+                hist = self.latency[(kind, name)] = _Histogram()
+            hist.observe(seconds)
+            if error:
+                self.errors[(kind, name)] = self.errors.get((kind, name), 0) + 1
+
+    def add_tokens(self, node, prompt_tokens, completion_tokens):
+        with self._lock:
+            for kind, n in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+                self.tokens[(node, kind)] = self.tokens.get((node, kind), 0) + int(n or 0)
+
+    def count_cache(self, layer, name, result):
+        with self._lock:
+            key = (layer, name, result)
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def render_prometheus(self):
+        """导出 Prometheus 文本格式 (text/plain; version=0.0.4)"""
+        with self._lock:
+            latency = {k: (list(h.buckets), h.sum, h.count) for k, h in self.latency.items()}
+            errors, tokens, cache = dict(self.errors), dict(self.tokens), dict(self.cache)
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_duration_seconds 各环节（爬虫 / baostock / 大模型 / 工作流节点）耗时",
+            f"# TYPE {METRIC_PREFIX}_span_duration_seconds histogram",
+        ]
+        for (kind, name), (buckets, total, count) in sorted(latency.items()):
+            labels = f'kind="{_escape(kind)}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{METRIC_PREFIX}_span_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{METRIC_PREFIX}_span_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [f"# HELP {METRIC_PREFIX}_span_errors_total 各环节失败次数",
+                  f"# TYPE {METRIC_PREFIX}_span_errors_total counter"]
+        for (kind, name), n in sorted(errors.items()):
+            lines.append(f'{METRIC_PREFIX}_span_errors_total{{kind="{_escape(kind)}",name="{_escape(name)}"}} {n}')
+
+        lines += [f"# HELP {METRIC_PREFIX}_llm_tokens_total 大模型调用消耗的 Token（按节点）",
+                  f"# TYPE {METRIC_PREFIX}_llm_tokens_total counter"]
+        for (node, kind), n in sorted(tokens.items()):
+            lines.append(f'{METRIC_PREFIX}_llm_tokens_total{{node="{_escape(node)}",type="{kind}"}} {n}')
+
+        lines += [f"# HELP {METRIC_PREFIX}_cache_requests_total 各缓存层的命中情况",
+                  f"# TYPE {METRIC_PREFIX}_cache_requests_total counter"]
+        for (layer, name, result), n in sorted(cache.items()):
+            lines.append(
+                f'{METRIC_PREFIX}_cache_requests_total{{layer="{_escape(layer)}",name="{_escape(name)}",'
+                f'result="{result}"}} {n}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# 进程级共享的指标
+metrics = Metrics()
+# 其他模块自己维护的统计（如 http_pool 的连接复用），导出时现取
+_collectors = []
+
+
+def register_collector(func):
+    """
+    注册额外的指标来源，随 /metrics 一起导出。
+    func() 返回 [(指标名, 类型, 说明, [(标签字典, 值), ...]), ...]，指标名不含 quant_ 前缀
+    """
+    _collectors.append(func)
+    return func
+
+
+def _render_collectors():
+    lines = []
+    for func in list(_collectors):
+        for name, kind, help_text, samples in func():
+            lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} {kind}"]
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+# ==========================================
+# 2. 单次分析的链路追踪
+# ==========================================
+class Trace:
+    def __init__(self, label=""):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.label = label
+        self.started = std_time.perf_counter()
+        self.started_at = std_time.time()
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            if len(self.spans) < MAX_TRACE_SPANS:
+                self.spans.append(record)
+            else:
+                self.dropped += 1
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+            dropped = self.dropped
+        return {
+            "trace_id": self.trace_id,
+            "label": self.label,
+            "started_at": round(self.started_at, 3),
+            "total_ms": round((std_time.perf_counter() - self.started) * 1000, 1),
+            "spans": spans,
+            "dropped_spans": dropped,
+        }
+
+
+_current_trace = contextvars.ContextVar("quant_trace", default=None)
+_current_span = contextvars.ContextVar("quant_span", default=None)
+
+
+class trace_run:
+    """
+    为一次分析开启链路追踪：
+        with trace_run(ticker) as trace:
+            result = agent_app.invoke(inputs)
+        payload["trace"] = trace.to_dict()
+    """
+
+    def __init__(self, label=""):
+        self.trace = Trace(label)
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        return False
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """向线程池提交任务并带上当前上下文（链路追踪与父 span），替代 executor.submit"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+class Span:
+    __slots__ = ("kind", "name", "span_id", "attrs", "status", "_start", "_token")
+
+    def __init__(self, kind, name, **attrs):
+        self.kind = kind
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.attrs = attrs
+        self.status = "ok"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, reason):
+        self.status = "error"
+        self.attrs["error"] = str(reason)[:200]
+
+    def __enter__(self):
+        self._start = std_time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = std_time.perf_counter()
+        _current_span.reset(self._token)
+        parent = _current_span.get()
+        if exc_type is not None:
+            self.fail(f"{exc_type.__name__}: {exc}")
+        metrics.observe(self.kind, self.name, end - self._start, error=self.status == "error")
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add({
+                "id": self.span_id,
+                "parent": parent.span_id if parent is not None else None,
+                "kind": self.kind,
+                "name": self.name,
+                "start_ms": round((self._start - trace.started) * 1000, 1),
+                "duration_ms": round((end - self._start) * 1000, 1),
+                "status": self.status,
+                "thread": threading.current_thread().name,
+                **self.attrs,
+            })
+        return False
+
+
+def span(kind, name, **attrs):
+    """with span("baostock", "query_history_k_data_plus") as sp: ... 记录耗时，异常时计为错误并继续抛出"""
+    return Span(kind, name, **attrs)
+
+
+def traced(kind, name=None, empty_is_error=False):
+    """
+    函数装饰器版本的 span。
+    empty_is_error: 爬虫函数内部吞掉异常返回空列表 / 空字符串，打开后空结果也计为失败
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(kind, span_name) as sp:
+                result = func(*args, **kwargs)
+                if empty_is_error and not result:
+                    sp.fail("empty result")
+                return result
+        return wrapper
+    return decorator
+
+
+def record_tokens(node, prompt_tokens, completion_tokens):
+    metrics.add_tokens(node, prompt_tokens, completion_tokens)
+    sp = _current_span.get()
+    if sp is not None:
+        sp.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def record_cache(layer, name, result):
+    """result: "hit" / "miss" / "shared"（等待其他线程的同一次加载）"""
+    metrics.count_cache(layer, name, result)
+
+
+def render_prometheus():
+    return metrics.render_prometheus() + _render_collectors()